@@ -0,0 +1,279 @@
+"""A local stand-in for the mist.io API used to benchmark the blueprint.
+
+The fake API keeps clouds, machines, scripts and jobs in memory. Creating a
+machine or running a script starts a job, whose log entries become visible
+after a configurable delay, the same way the blueprint's lifecycle operations
+expect them to show up in mist.io.
+
+Every request is counted per route, so that the number of API calls and the
+polling volume of a workflow may be measured. Latency may be added to each
+request and failures may be injected, both in the API itself and in the
+scripts run on the fake machines.
+
+"""
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import collections
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+
+PHASE_TIMINGS = 'system:2,apt:95,runtime:6,reset:3,images:40,kubeadm:55,cni:4'
+
+
+class FakeMist(object):
+    """The in-memory state and behaviour of the fake mist.io API.
+
+    :param latency: seconds added to every request
+    :param machine_delay: seconds it takes for a machine to be provisioned
+    :param script_delay: seconds it takes for a script to finish
+    :param api_failure_rate: fraction of requests failing with HTTP 500
+    :param script_failure_rate: fraction of scripts finishing with an error
+
+    """
+
+    def __init__(self, latency=0.0, machine_delay=1.0, script_delay=1.0,
+                 api_failure_rate=0.0, script_failure_rate=0.0,
+                 provider='fake'):
+        self.latency = latency
+        self.machine_delay = machine_delay
+        self.script_delay = script_delay
+        self.api_failure_rate = api_failure_rate
+        self.script_failure_rate = script_failure_rate
+        self.provider = provider
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.clouds = {}
+        self.machines = {}
+        self.scripts = {}
+        self.jobs = collections.defaultdict(list)
+
+    def add_cloud(self, cloud_id=None):
+        cloud_id = cloud_id or uuid.uuid4().hex
+        self.clouds[cloud_id] = {
+            'id': cloud_id, 'title': 'fake-%s' % cloud_id[:6],
+            'provider': self.provider, 'enabled': True,
+        }
+        return cloud_id
+
+    def reset_counters(self):
+        with self.lock:
+            self.counters.clear()
+
+    def log_event(self, job_id, delay=0, **event):
+        """Add a log entry to a job, which shows up after `delay` seconds."""
+        event.update({'job_id': job_id, 'time': time.time() + delay})
+        event.setdefault('error', False)
+        with self.lock:
+            self.jobs[job_id].append(event)
+
+    # API handlers.
+
+    def list_clouds(self, body, query):
+        return list(self.clouds.values())
+
+    def list_machines(self, body, query, cloud_id):
+        return [machine for machine in self.machines.values()
+                if machine['cloud'] == cloud_id]
+
+    def create_machine(self, body, query, cloud_id):
+        job_id = body.get('job_id') or uuid.uuid4().hex
+        quantity = int(body.get('quantity') or 1)
+        names = [body.get('name') or 'machine'] * quantity
+        if quantity > 1:
+            names = ['%s-%d' % (name, i + 1) for i, name in enumerate(names)]
+        for name in names:
+            machine_id = uuid.uuid4().hex
+            index = len(self.machines) + 1
+            self.machines[machine_id] = {
+                'id': machine_id, 'machine_id': machine_id, 'name': name,
+                'cloud': cloud_id, 'state': 'running',
+                'private_ips': ['10.0.%d.%d' % (index // 250, index % 250)],
+                'public_ips': ['198.51.%d.%d' % (index // 250, index % 250)],
+                'extra': {},
+            }
+            for action in ('machine_creation_finished',
+                           'post_deploy_finished'):
+                self.log_event(job_id, delay=self.machine_delay,
+                               action=action, machine_id=machine_id,
+                               external_id=machine_id, machine_name=name,
+                               cloud_id=cloud_id)
+        return {'job_id': job_id}
+
+    def machine_action(self, body, query, cloud_id, machine_id):
+        if body.get('action') == 'destroy':
+            self.machines.pop(machine_id, None)
+        return {}
+
+    def list_scripts(self, body, query):
+        return list(self.scripts.values())
+
+    def add_script(self, body, query):
+        script_id = uuid.uuid4().hex
+        self.scripts[script_id] = {
+            'id': script_id, 'name': body.get('name'),
+            'script': body.get('script', ''),
+        }
+        return {'id': script_id}
+
+    def remove_script(self, body, query, script_id):
+        self.scripts.pop(script_id, None)
+        return {}
+
+    def run_script(self, body, query, script_id):
+        job_id = uuid.uuid4().hex
+        machine_id = body.get('machine_id') or body.get('machine_uuid')
+        params = (body.get('params') or body.get('script_params') or '')
+        script = self.scripts.get(script_id, {}).get('script', '')
+        stdout = ''
+        if 'phase-timings' in script:
+            stdout = 'phase-timings %s\n' % PHASE_TIMINGS
+        elif 'drain-status' in script:
+            hostnames = params.replace("'", '').split()[1:]
+            stdout = ''.join('drain-status %s ok\n' % hostname
+                             for hostname in hostnames)
+        elif 'node-metrics' in script:
+            stdout = 'pending-pods 0 0 0\n' + ''.join(
+                'node-metrics %s 1 1 1000 2000 %d %d\n' % (
+                    machine['name'].lower(), 2 ** 30, 2 ** 32
+                ) for machine in list(self.machines.values())
+            )
+        elif 'node-load' in script:
+            hostnames = params.replace("'", '').split()
+            stdout = ''.join('node-load %s %d 0 0 %d %d\n' % (
+                hostname, i, i * 100, i * 2 ** 27
+            ) for i, hostname in enumerate(hostnames))
+        error = random.random() < self.script_failure_rate
+        self.log_event(job_id, action='script_started',
+                       external_id=machine_id)
+        self.log_event(job_id, delay=self.script_delay,
+                       action='script_finished', external_id=machine_id,
+                       machine_id=machine_id, stdout=stdout,
+                       error='Injected failure' if error else False)
+        return {'job_id': job_id}
+
+    def get_job(self, body, query, job_id):
+        now = time.time()
+        with self.lock:
+            logs = [event for event in self.jobs.get(job_id, [])
+                    if event['time'] <= now]
+        return {'job_id': job_id, 'logs': logs}
+
+    def signal_job(self, body, query, job_id):
+        event = dict((key, value[0]) for key, value in query.items())
+        event['error'] = event.get('error') not in (None, '0')
+        self.log_event(job_id, **event)
+        return {}
+
+    ROUTES = (
+        ('GET', r'/api/v1/clouds$', 'list_clouds'),
+        ('GET', r'/api/v1/clouds/([^/]+)/machines$', 'list_machines'),
+        ('POST', r'/api/v1/clouds/([^/]+)/machines$', 'create_machine'),
+        ('POST', r'/api/v1/clouds/([^/]+)/machines/([^/]+)$',
+         'machine_action'),
+        ('GET', r'/api/v1/scripts$', 'list_scripts'),
+        ('POST', r'/api/v1/scripts$', 'add_script'),
+        ('DELETE', r'/api/v1/scripts/([^/]+)$', 'remove_script'),
+        ('POST', r'/api/v1/scripts/([^/]+)$', 'run_script'),
+        ('GET', r'/api/v1/jobs/([^/]+)$', 'get_job'),
+        ('DELETE', r'/api/v1/jobs/([^/]+)$', 'signal_job'),
+    )
+
+    def handle(self, method, path, body):
+        """Dispatch a request. Returns the HTTP status and response body."""
+        url = urlparse(path)
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.match(pattern, url.path)
+            if method == route_method and match:
+                break
+        else:
+            handler, match = 'unknown %s %s' % (method, url.path), None
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters[handler] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if match is None:
+            return 404, {'error': 'Not found'}
+        if random.random() < self.api_failure_rate:
+            return 500, {'error': 'Injected failure'}
+        return 200, getattr(self, handler)(body, parse_qs(url.query),
+                                           *match.groups())
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(fake, host='127.0.0.1', port=0):
+    """Serve the fake API in a background thread.
+
+    Returns the server, whose `server_address` holds the actual port.
+
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            try:
+                body = json.loads(body) if body else {}
+            except ValueError:
+                body = dict((key, value[0]) for key, value in
+                            parse_qs(body.decode('utf-8')).items())
+            status, response = fake.handle(self.command, self.path, body)
+            response = json.dumps(response).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+
+    server = _ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--machine-delay', type=float, default=1.0)
+    parser.add_argument('--script-delay', type=float, default=1.0)
+    parser.add_argument('--api-failure-rate', type=float, default=0.0)
+    parser.add_argument('--script-failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeMist(latency=args.latency, machine_delay=args.machine_delay,
+                    script_delay=args.script_delay,
+                    api_failure_rate=args.api_failure_rate,
+                    script_failure_rate=args.script_failure_rate)
+    print('Cloud: %s' % fake.add_cloud())
+    server = serve(fake, port=args.port)
+    print('Serving fake mist.io API on http://%s:%d' % server.server_address)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print(json.dumps(fake.counters, indent=2, sort_keys=True))
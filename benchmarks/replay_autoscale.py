@@ -0,0 +1,66 @@
+"""Replay recorded cluster metrics through the autoscale decision logic.
+
+Reads one JSON object per line, each one holding the `time` the metrics were
+recorded at, in seconds, and the `metrics`, either as parsed by
+`k8s.autoscale.parse_metrics` or as the raw output of cluster-metrics.sh.
+The metrics stored in the master's runtime properties by the
+`autoscale_cluster` workflow, i.e. `autoscale_metrics`, may be used as is.
+
+The number of workers starts off at `--workers` and follows each decision,
+as if every scaling operation succeeded right away.
+
+Example:
+
+    python benchmarks/replay_autoscale.py metrics.jsonl --max-workers 20
+
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from k8s.autoscale import DEFAULT_POLICY
+from k8s.autoscale import decide
+from k8s.autoscale import parse_metrics
+
+
+def replay(records, workers, policy):
+    """Return the decision taken for each one of the recorded metrics."""
+    state, decisions = None, []
+    for record in records:
+        metrics = record.get('metrics')
+        if metrics is not None and not isinstance(metrics, dict):
+            metrics = parse_metrics(metrics)
+        decision, state = decide(metrics, workers, policy, state,
+                                 record.get('time', 0))
+        decision['time'] = record.get('time', 0)
+        decisions.append(decision)
+        workers += decision['delta']
+    return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='the JSON lines file of the metrics')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='the initial number of workers')
+    for key, value in sorted(DEFAULT_POLICY.items()):
+        parser.add_argument('--%s' % key.replace('_', '-'),
+                            type=type(value), default=value)
+    args = parser.parse_args()
+    policy = dict((key, getattr(args, key)) for key in DEFAULT_POLICY)
+
+    with open(args.path) as fobj:
+        records = [json.loads(line) for line in fobj if line.strip()]
+    for decision in replay(records, args.workers, policy):
+        print('%10s %8d %8.3f %8d %+6d  %s' % (
+            decision['time'], decision['workers'], decision['utilization'],
+            decision['pending_pods'], decision['delta'], decision['reason']
+        ))
+
+
+if __name__ == '__main__':
+    main()
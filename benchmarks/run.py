@@ -0,0 +1,146 @@
+"""Benchmark the blueprint's workflows against a fake mist.io API.
+
+Installs the blueprint with `cfy local`, scales the cluster up by N workers
+and back down again, for each N given. All requests are served by the fake
+API of `fake_mist.py`, which is started in-process. For each workflow, the
+wall-clock time, the total number of API calls and the number of job-log
+polls are reported.
+
+Example:
+
+    python benchmarks/run.py --workers 1 10 50 200 --threads 10
+
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mist import FakeMist
+from fake_mist import serve
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cfy(workdir, *args):
+    """Run a `cfy local` command inside `workdir`."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT, env.get('PYTHONPATH')])
+    )
+    with open(os.path.join(workdir, 'cfy.log'), 'a') as log:
+        log.write('\n$ cfy local %s\n' % ' '.join(args))
+        log.flush()
+        subprocess.check_call(('cfy', 'local') + args, cwd=workdir, env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+
+
+def measure(fake, workdir, workflow, parameters=None, threads=1):
+    """Execute a workflow and return its wall-clock time and API usage."""
+    args = ['execute', '-w', workflow, '--task-thread-pool-size', str(threads)]
+    if parameters:
+        args += ['-p', json.dumps(parameters)]
+    fake.reset_counters()
+    started = time.time()
+    cfy(workdir, *args)
+    counters = dict(fake.counters)
+    return {
+        'workflow': workflow,
+        'seconds': round(time.time() - started, 2),
+        'api_calls': counters.pop('requests', 0),
+        'polls': counters.get('get_job', 0),
+        'calls': counters,
+    }
+
+
+def benchmark(fake, uri, workers, threads=1, max_parallel=10):
+    """Run install, scale_cluster_up and scale_cluster_down for N workers."""
+    cloud_id = fake.add_cloud()
+    machine = {
+        'cloud_id': cloud_id, 'key_id': 'key', 'image_id': 'image',
+        'size_id': 'size', 'location_id': 'location',
+    }
+    workdir = tempfile.mkdtemp(prefix='k8s-benchmark-')
+    inputs = os.path.join(workdir, 'inputs.json')
+    with open(inputs, 'w') as fobj:
+        json.dump({
+            'mist_uri': uri, 'mist_token': 'benchmark',
+            'mist_machine_master': machine, 'mist_machine_worker': machine,
+        }, fobj)
+    try:
+        cfy(workdir, 'init', '-p', os.path.join(ROOT, 'blueprint.yaml'),
+            '-i', inputs)
+        results = [
+            measure(fake, workdir, 'install', threads=threads),
+            measure(fake, workdir, 'scale_cluster_up', {
+                'mist_machine_worker_list': [dict(machine, quantity=workers)],
+                'max_parallel': max_parallel,
+            }, threads=threads),
+            measure(fake, workdir, 'scale_cluster_down', {
+                'delta': workers,
+            }, threads=threads),
+        ]
+    except subprocess.CalledProcessError as exc:
+        sys.exit('%s, see %s' % (exc, os.path.join(workdir, 'cfy.log')))
+    shutil.rmtree(workdir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 10, 50, 200],
+                        help='the numbers of workers to scale up/down by')
+    parser.add_argument('--threads', type=int, default=10,
+                        help='the --task-thread-pool-size of `cfy local`')
+    parser.add_argument('--max-parallel', type=int, default=10,
+                        help='the max_parallel input of scale_cluster_up')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds added to every API request')
+    parser.add_argument('--machine-delay', type=float, default=2.0,
+                        help='seconds it takes for a machine to be created')
+    parser.add_argument('--script-delay', type=float, default=5.0,
+                        help='seconds it takes for a script to finish')
+    parser.add_argument('--api-failure-rate', type=float, default=0.0,
+                        help='fraction of API requests failing with 500')
+    parser.add_argument('--script-failure-rate', type=float, default=0.0,
+                        help='fraction of scripts finishing with an error')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args()
+
+    fake = FakeMist(latency=args.latency, machine_delay=args.machine_delay,
+                    script_delay=args.script_delay,
+                    api_failure_rate=args.api_failure_rate,
+                    script_failure_rate=args.script_failure_rate)
+    server = serve(fake)
+    uri = 'http://%s:%d' % server.server_address
+
+    results = {}
+    for workers in args.workers:
+        results[workers] = benchmark(fake, uri, workers, args.threads,
+                                     args.max_parallel)
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    print('%8s  %-20s %10s %10s %10s' % ('workers', 'workflow', 'seconds',
+                                          'api calls', 'polls'))
+    for workers in args.workers:
+        for result in results[workers]:
+            print('%8d  %-20s %10.2f %10d %10d' % (
+                workers, result['workflow'], result['seconds'],
+                result['api_calls'], result['polls']
+            ))
+
+
+if __name__ == '__main__':
+    main()
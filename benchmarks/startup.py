@@ -0,0 +1,164 @@
+"""Benchmark the startup cost of the blueprint's operations.
+
+For each script of tasks/, a fresh interpreter loads the script the way the
+script plugin does, i.e. it compiles and executes it, without running its
+`__main__` block, and reports the time it took, the number of modules it
+imported and which of the heavy modules, e.g. the mist.io client, were
+among them.
+
+Then, the time to the first mist.io API call is measured against the fake
+API of `fake_mist.py`, both in a fresh interpreter, as when each operation
+runs in a process of its own, and for each subsequent call in the same
+process, as when operations run in a long-lived worker, which keeps the
+connection to mist.io.
+
+Run it at an earlier commit in order to compare.
+
+Example:
+
+    python benchmarks/startup.py --runs 5
+
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_mist import FakeMist
+from fake_mist import serve
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules, which are worth importing only when they are actually used.
+HEAVY_MODULES = ('requests', 'mistclient', 'plugin.connection',
+                 'plugin.server')
+
+LOAD_SCRIPT = '''
+import sys
+import json
+import time
+started = time.time()
+before = set(sys.modules)
+with open(sys.argv[1]) as fobj:
+    code = compile(fobj.read(), sys.argv[1], 'exec')
+exec(code, {'__name__': '__benchmark__', '__file__': sys.argv[1]})
+print(json.dumps({
+    'seconds': time.time() - started,
+    'modules': len(set(sys.modules) - before),
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES, )
+
+API_SCRIPT = '''
+import sys
+import json
+import time
+started = time.time()
+from cloudify.mocks import MockCloudifyContext
+from cloudify.state import current_ctx
+current_ctx.set(MockCloudifyContext(node_id='kube_master', properties={
+    'mist_config': {'mist_uri': sys.argv[1], 'mist_token': 'benchmark'},
+}))
+from k8s import metadata
+metadata.get_provider(sys.argv[2])
+first = time.time() - started
+calls = []
+for i in range(int(sys.argv[3])):
+    metadata._cache.clear()
+    started = time.time()
+    metadata.get_provider(sys.argv[2])
+    calls.append(time.time() - started)
+print(json.dumps({'first': first, 'warm': sum(calls) / len(calls)}))
+'''
+
+
+def run(*args):
+    """Run a fresh interpreter and return its result and wall-clock time."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT, env.get('PYTHONPATH')])
+    )
+    started = time.time()
+    output = subprocess.check_output((sys.executable, ) + args, cwd=ROOT,
+                                     env=env)
+    seconds = time.time() - started
+    lines = output.decode('utf-8').strip().splitlines()
+    return json.loads(lines[-1]) if lines else {}, seconds
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def measure_load(path, runs):
+    """Measure the time it takes to load an operation's script."""
+    results = [run('-c', LOAD_SCRIPT, path) for _ in range(runs)]
+    return {
+        'seconds': median([result['seconds'] for result, _ in results]),
+        'process': median([seconds for _, seconds in results]),
+        'modules': results[-1][0]['modules'],
+        'heavy': results[-1][0]['heavy'],
+    }
+
+
+def measure_api(uri, cloud_id, runs, calls):
+    """Measure the time to the first and to subsequent API calls."""
+    results = [run('-c', API_SCRIPT, uri, cloud_id, str(calls))
+               for _ in range(runs)]
+    return {
+        'first': median([result['first'] for result, _ in results]),
+        'warm': median([result['warm'] for result, _ in results]),
+        'process': median([seconds for _, seconds in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5,
+                        help='the number of fresh interpreters per '
+                             'measurement, of which the median is reported')
+    parser.add_argument('--calls', type=int, default=10,
+                        help='the number of API calls made by each '
+                             'interpreter after the first one')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args()
+
+    interpreter = median([run('-c', 'pass')[1] for _ in range(args.runs)])
+    results = {'interpreter': interpreter, 'operations': {}}
+    for path in sorted(glob.glob(os.path.join(ROOT, 'tasks', '*.py'))):
+        name = os.path.basename(path)[:-3]
+        results['operations'][name] = measure_load(path, args.runs)
+
+    fake = FakeMist()
+    server = serve(fake)
+    results['api'] = measure_api('http://%s:%d' % server.server_address,
+                                 fake.add_cloud(), args.runs, args.calls)
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    print('Interpreter startup: %.3fs' % interpreter)
+    print('%-16s %10s %10s %8s  %s' % ('operation', 'load', 'process',
+                                       'modules', 'heavy modules'))
+    for name, result in sorted(results['operations'].items()):
+        print('%-16s %9.3fs %9.3fs %8d  %s' % (
+            name, result['seconds'], result['process'], result['modules'],
+            ', '.join(result['heavy']) or '-'
+        ))
+    print('First API call: %.3fs in a fresh interpreter (%.3fs including '
+          'startup), %.3fs per call in a long-lived one' % (
+              results['api']['first'], results['api']['process'],
+              results['api']['warm']))
+
+
+if __name__ == '__main__':
+    main()
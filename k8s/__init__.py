@@ -0,0 +1 @@
+"""Helpers shared by the blueprint's lifecycle operations and workflows."""
@@ -0,0 +1,167 @@
+"""The decision logic of the `autoscale_cluster` workflow.
+
+The functions of this module are pure. They neither access cloudify's
+context, nor the mist.io API, so that decisions may be replayed offline
+against recorded metrics.
+
+"""
+import math
+
+
+DEFAULT_POLICY = {
+    # The bounds of the number of workers.
+    'min_workers': 1,
+    'max_workers': 10,
+    # Scale up, if the utilization of the cluster's ready workers rises above
+    # `scale_up_threshold`, and scale down, if it drops below
+    # `scale_down_threshold`. The cluster is sized so that its utilization
+    # lands halfway in-between.
+    'scale_up_threshold': 0.8,
+    'scale_down_threshold': 0.4,
+    # The number of consecutive evaluations with a utilization below
+    # `scale_down_threshold`, before scaling down.
+    'scale_down_rounds': 3,
+    # The minimum number of seconds between two scaling operations.
+    'cooldown': 600,
+    # The maximum number of workers added or removed at once.
+    'max_step': 10,
+}
+
+DEFAULT_STATE = {
+    'last_scaled': None,
+    'low_rounds': 0,
+}
+
+
+def parse_metrics(text):
+    """Parse the output of cluster-metrics.sh.
+
+    Returns a dict of the pending pods, i.e. the pods, which do not fit on
+    any node for lack of resources, their requested cpu in millicores and
+    memory in bytes, the pods, which may not be scheduled for other reasons,
+    and the metrics of each node. Returns None, if the output is incomplete.
+
+    """
+    metrics = {'nodes': {}, 'unschedulable_pods': 0}
+    for line in (text or '').splitlines():
+        parts = line.split()
+        if not parts or not all(part.isdigit() for part in parts[2:]):
+            continue
+        if parts[0] == 'pending-pods' and len(parts) == 4:
+            metrics.update(zip(('pending_pods', 'pending_cpu_millis',
+                                'pending_memory_bytes'), map(int, parts[1:])))
+        elif parts[0] == 'unschedulable-pods' and len(parts) == 2:
+            metrics['unschedulable_pods'] = int(parts[1])
+        elif parts[0] == 'node-metrics' and len(parts) == 8:
+            metrics['nodes'][parts[1]] = dict(zip(
+                ('worker', 'ready', 'cpu_millis', 'cpu_allocatable',
+                 'memory_bytes', 'memory_allocatable'), map(int, parts[2:])
+            ))
+    if 'pending_pods' not in metrics:
+        return None
+    return metrics
+
+
+def utilization(metrics):
+    """Return the utilization of the cluster's ready workers.
+
+    The utilization is the largest of the ratios of requested to allocatable
+    cpu and memory.
+
+    """
+    workers = [node for node in metrics['nodes'].values()
+               if node['worker'] and node['ready']]
+    ratios = [0.0]
+    for requested, allocatable in (('cpu_millis', 'cpu_allocatable'),
+                                   ('memory_bytes', 'memory_allocatable')):
+        total = sum(node[allocatable] for node in workers)
+        if total:
+            ratios.append(float(sum(node[requested] for node in workers)) /
+                          total)
+    return max(ratios)
+
+
+def pending_capacity(metrics, target):
+    """Return the number of workers required to fit all pending pods."""
+    workers = [node for node in metrics['nodes'].values()
+               if node['worker'] and node['ready']]
+    needed = 1
+    if workers:
+        for pending, resource in (('pending_cpu_millis', 'cpu_allocatable'),
+                                  ('pending_memory_bytes',
+                                   'memory_allocatable')):
+            per_node = float(sum(node[resource] for node in workers)) / \
+                len(workers)
+            if per_node:
+                needed = max(needed, int(math.ceil(
+                    metrics[pending] / (per_node * target))))
+    return needed
+
+
+def decide(metrics, workers, policy=None, state=None, now=0):
+    """Decide by how many workers the cluster should be scaled.
+
+    `metrics` are the cluster's metrics, as returned by `parse_metrics`, and
+    `workers` is the current number of workers. `state` is the state returned
+    by the previous decision, if any, and `now` is the current timestamp.
+
+    Returns the decision, i.e. a dict of the delta, positive to scale up and
+    negative to scale down, and the reason behind it, along with the new
+    state to be passed to the next decision.
+
+    """
+    policy = dict(DEFAULT_POLICY, **(policy or {}))
+    state = dict(DEFAULT_STATE, **(state or {}))
+    target = (policy['scale_up_threshold'] +
+              policy['scale_down_threshold']) / 2.0
+    usage = utilization(metrics) if metrics else 0.0
+    decision = {
+        'delta': 0,
+        'reason': 'within thresholds',
+        'workers': workers,
+        'utilization': round(usage, 3),
+        'pending_pods': metrics.get('pending_pods', 0) if metrics else 0,
+    }
+    if metrics and metrics.get('unschedulable_pods'):
+        # More workers of the same spec would not fit these pods either.
+        decision['unschedulable_pods'] = metrics['unschedulable_pods']
+
+    if workers < policy['min_workers'] or workers > policy['max_workers']:
+        # Bounds are enforced regardless of metrics and cooldown.
+        desired = min(max(workers, policy['min_workers']),
+                      policy['max_workers'])
+        decision['reason'] = 'out of bounds'
+    elif not metrics:
+        desired = workers
+        decision['reason'] = 'no metrics'
+    elif metrics['pending_pods']:
+        desired = workers + pending_capacity(metrics, target)
+        decision['reason'] = 'pending pods'
+    elif usage > policy['scale_up_threshold']:
+        desired = int(math.ceil(workers * usage / target))
+        decision['reason'] = 'utilization above threshold'
+    elif usage < policy['scale_down_threshold']:
+        state['low_rounds'] += 1
+        desired = workers
+        decision['reason'] = 'utilization below threshold for %d round(s)' % (
+            state['low_rounds'])
+        if state['low_rounds'] >= policy['scale_down_rounds']:
+            desired = int(math.ceil(workers * usage / target))
+    else:
+        desired = workers
+    if usage >= policy['scale_down_threshold']:
+        state['low_rounds'] = 0
+
+    desired = min(max(desired, policy['min_workers']), policy['max_workers'])
+    delta = max(min(desired - workers, policy['max_step']),
+                -policy['max_step'])
+    if delta and decision['reason'] != 'out of bounds' and \
+            state['last_scaled'] is not None and \
+            now - state['last_scaled'] < policy['cooldown']:
+        decision['reason'] += ', cooling down'
+        delta = 0
+    if delta:
+        state['last_scaled'] = now
+        state['low_rounds'] = 0
+    decision['delta'] = delta
+    return decision, state
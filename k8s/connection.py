@@ -0,0 +1,109 @@
+import threading
+import contextlib
+import collections
+
+from cloudify import ctx
+
+
+# Process-wide counters of the calls made to the mist.io API, broken down by
+# method, as well as of the HTTP requests made over the shared session.
+counters = collections.Counter()
+
+_lock = threading.Lock()
+_connections = {}
+_session = None
+
+
+class _CountingProxy(object):
+    """Count calls to the wrapped object's methods."""
+
+    def __init__(self, obj, prefix):
+        self._obj = obj
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            with _lock:
+                counters['%s.%s' % (self._prefix, name)] += 1
+            return attr(*args, **kwargs)
+        return wrapper
+
+
+class _Connection(_CountingProxy):
+
+    def __init__(self, conn):
+        super(_Connection, self).__init__(conn, 'connection')
+        self.client = _CountingProxy(conn.client, 'client')
+
+
+def get_connection():
+    """Return the process-wide connection to the node's mist.io account.
+
+    The MistConnectionClient is created lazily, the first time it's needed,
+    and is then shared by all operations running in the same process, so
+    that authentication and TLS setup is not repeated by each one of them.
+    The mist.io client is imported at that point, too, so that operations,
+    which never call the mist.io API, do not pay for importing it.
+
+    """
+    mist_config = ctx.node.properties['mist_config']
+    key = (mist_config['mist_uri'], mist_config['mist_token'])
+    with _lock:
+        if key not in _connections:
+            # Imported here, since it pulls in the whole mist.io client.
+            from plugin.connection import MistConnectionClient
+            counters['connections'] += 1
+            _connections[key] = _Connection(MistConnectionClient())
+        return _connections[key]
+
+
+def get_session():
+    """Return the process-wide HTTP session, which keeps connections alive.
+
+    The session is used for requests made directly to the mist.io API, e.g.
+    when polling for job events.
+
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            # Imported here, along with the session, for the same reason.
+            import requests
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4,
+                                                    pool_maxsize=32)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session.hooks['response'].append(_count_response)
+        return _session
+
+
+def _count_response(response, *args, **kwargs):
+    with _lock:
+        counters['http_requests'] += 1
+
+
+@contextlib.contextmanager
+def track_api_usage():
+    """Log the mist.io API calls made while in this context.
+
+    NOTE that the counters are process-wide. When operations run in parallel,
+    the calls of concurrent operations are included, too.
+
+    """
+    with _lock:
+        before = counters.copy()
+    try:
+        yield
+    finally:
+        with _lock:
+            usage = counters.copy()
+        usage.subtract(before)
+        ctx.logger.info('mist.io API usage: %s', ', '.join(
+            '%s=%d' % (key, value) for key, value in sorted(usage.items())
+            if value
+        ) or 'none')
@@ -0,0 +1,161 @@
+import os
+import binascii
+
+from cloudify import ctx
+
+from k8s.connection import get_connection
+from k8s.machines import create_machines
+from k8s.machines import destroy_machine
+from k8s.tuning import get_tuning_args
+
+
+# The port each API server binds to, and the port of the load balanced
+# endpoint of a highly available control plane.
+API_SERVER_PORT = 443
+ENDPOINT_PORT = 6443
+
+
+def get_control_plane(instance=None):
+    """Return the additional control plane machines of the master.
+
+    A highly available control plane consists of the master, which
+    initializes the cluster, and of `master_count - 1` additional machines,
+    which join the cluster as control plane nodes. The latter are created
+    along with the master and are kept in its runtime properties.
+
+    """
+    instance = instance or ctx.instance
+    return instance.runtime_properties.get('control_plane', [])
+
+
+def create_control_plane(spec):
+    """Create the additional control plane machines, based on `spec`."""
+    count = ctx.node.properties.get('master_count', 1) - 1
+    if count < 1:
+        return
+    ctx.logger.info('Creating %d additional control plane machine(s)', count)
+    ctx.instance.runtime_properties['control_plane'] = create_machines(
+        spec, count, role='master')
+
+
+def destroy_control_plane():
+    """Destroy the additional control plane machines, if any."""
+    for machine in get_control_plane():
+        destroy_machine(machine['cloud_id'], machine['machine_id'])
+    ctx.instance.runtime_properties['control_plane'] = []
+
+
+def get_ipv4(ips):
+    """Return the first IPv4 address of `ips`, if any."""
+    ips = [ip for ip in ips if ':' not in ip]
+    return ips[0] if ips else ''
+
+
+def set_api_endpoint():
+    """Decide on the endpoint of the cluster's API.
+
+    A single master is reached directly. A highly available control plane is
+    reached through haproxy, which runs on each control plane node, at the
+    virtual IP given by `api_vip`, which keepalived moves between them.
+
+    The `api_endpoint` is used by nodes to join the cluster, while the
+    `server_endpoint` is used to access the cluster from the outside.
+
+    """
+    properties = ctx.instance.runtime_properties
+    if not get_control_plane():
+        properties.update({
+            'api_endpoint': '%s:%s' % (properties['master_ip'],
+                                       API_SERVER_PORT),
+            'server_endpoint': properties['server_ip'],
+        })
+        return
+    endpoint = '%s:%s' % (ctx.node.properties['api_vip'], ENDPOINT_PORT)
+    properties.update({
+        'api_endpoint': endpoint,
+        'server_endpoint': endpoint,
+    })
+
+
+def get_api_endpoint(master):
+    """Return the host and port of the API, which nodes join."""
+    endpoint = master.runtime_properties.get('api_endpoint') or '%s:%s' % (
+        master.runtime_properties.get('master_ip', ''), API_SERVER_PORT)
+    host, _, port = endpoint.rpartition(':')
+    return host, port
+
+
+def get_join_args(master):
+    """Return the arguments of deploy-node.sh required to join the cluster.
+
+    Nodes join the cluster through its API endpoint and pull images through
+    the image mirror run by the master.
+
+    """
+    host, port = get_api_endpoint(master)
+    arguments = "-m '%s' " % host
+    arguments += "-p '%s' " % port
+    arguments += "-i '%s' " % master.runtime_properties['master_ip']
+    return arguments
+
+
+def get_control_plane_args():
+    """Return the arguments of deploy-node.sh for the control plane.
+
+    These are the endpoint, the certificate key, which encrypts the control
+    plane's certificates, the IPs of all control plane nodes, and the virtual
+    IP, if any. The certificate key is generated once.
+
+    """
+    properties = ctx.instance.runtime_properties
+    if not get_control_plane():
+        return ''
+    if not properties.get('certificate_key'):
+        properties['certificate_key'] = binascii.hexlify(os.urandom(32))
+    ips = [properties['master_ip']] + [
+        get_ipv4(machine['private_ips'] + machine['public_ips'])
+        for machine in get_control_plane()
+    ]
+    arguments = "-e '%s' " % properties['api_endpoint']
+    arguments += "-k '%s' " % properties['certificate_key']
+    arguments += "-c '%s' " % ','.join(ips)
+    if ctx.node.properties.get('api_vip'):
+        arguments += "-v '%s' " % ctx.node.properties['api_vip']
+    return arguments
+
+
+def start_control_plane(script_id, resume=False):
+    """Start installing kubernetes on the additional control plane machines.
+
+    The machines join the cluster through its endpoint, once the master is
+    up. The installation's log entry to wait for is stored along with each
+    machine.
+
+    """
+    machines = get_control_plane()
+    if not machines:
+        return
+    conn = get_connection()
+    for machine in machines:
+        params = "-n '%s' " % machine['machine_name']
+        params += "-t '%s' " % ctx.instance.runtime_properties['master_token']
+        params += get_join_args(ctx.instance)
+        params += get_control_plane_args()
+        params += get_tuning_args()
+        params += "-r 'control-plane'"
+        if resume:
+            params += " -R"
+        job = conn.client.run_script(
+            script_id=script_id, su=True, machine_id=machine['machine_id'],
+            cloud_id=machine['cloud_id'], script_params=params,
+        )
+        machine['install_event'] = {
+            'job_id': job['job_id'],
+            'job_kwargs': {
+                'action': 'script_finished',
+                'external_id': machine['machine_id'],
+            },
+        }
+    ctx.instance.runtime_properties['control_plane'] = machines
+    ctx.logger.info('Kubernetes installation on %d control plane machine(s) '
+                    'started', len(machines))
@@ -0,0 +1,244 @@
+import time
+import logging
+import threading
+
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from k8s.connection import get_session
+
+
+# The poller thread runs outside of any operation's context.
+log = logging.getLogger(__name__)
+
+
+class JobError(NonRecoverableError):
+    """Raised when a job's log entry indicates an error.
+
+    The log entry is kept in `event`, so that callers may inspect the job's
+    output, if any.
+
+    """
+
+    def __init__(self, message, event=None):
+        super(JobError, self).__init__(message)
+        self.event = event or {}
+
+
+class WaitTimeout(NonRecoverableError):
+    """Raised when a job's log entry does not show up in time."""
+
+
+class _Waiter(object):
+
+    def __init__(self, job_id, job_kwargs):
+        self.job_id = job_id
+        self.job_kwargs = job_kwargs
+        self.event = None
+        self.done = threading.Event()
+
+    def match(self, log):
+        return all(log.get(k) == v for k, v in self.job_kwargs.items())
+
+
+class EventWaiter(object):
+    """Wait for mist.io job events on behalf of many concurrent operations.
+
+    Instead of each operation polling the mist.io API for its own job, a
+    single poller thread fetches the logs of all outstanding jobs in rounds,
+    over a shared HTTP session, and routes each log entry to the operations
+    waiting for it. Jobs waited upon by multiple operations are only fetched
+    once per round.
+
+    NOTE that each round still makes one request per outstanding job, since
+    mist.io's jobs API returns the logs of a single job, while its logs API
+    filters by a single `job_id`, too. There is no way to fetch the logs of
+    several jobs at once, short of fetching all of the account's logs.
+
+    The polling interval is adaptive. It starts at `min_interval` and backs
+    off up to `max_interval` for as long as no new events show up. It is reset
+    as soon as an event arrives or a new operation starts waiting.
+
+    """
+
+    def __init__(self, uri, token, min_interval=2, max_interval=30,
+                 session=None):
+        self.uri = uri.rstrip('/')
+        self.token = token
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.session = session or get_session()
+        self.requests = 0
+        self._waiters = []
+        self._lock = threading.Condition()
+        self._thread = None
+        self._interval = min_interval
+
+    def wait(self, job_id, job_kwargs, timeout=1800):
+        """Wait for the job's log entry, which matches `job_kwargs`.
+
+        Returns the matching log entry. Raises a JobError, if the log entry
+        indicates an error, or a WaitTimeout, if `timeout` seconds go by.
+
+        """
+        waiter = _Waiter(job_id, job_kwargs)
+        with self._lock:
+            self._waiters.append(waiter)
+            self._interval = self.min_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll)
+                self._thread.daemon = True
+                self._thread.start()
+            self._lock.notify()
+        try:
+            if not waiter.done.wait(timeout):
+                raise WaitTimeout(
+                    'Timed out waiting for %s of job %s' % (job_kwargs, job_id)
+                )
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        if waiter.event.get('error'):
+            raise JobError(
+                'Job %s failed: %s' % (job_id, waiter.event['error']),
+                waiter.event
+            )
+        return waiter.event
+
+    def find(self, job_id, job_kwargs):
+        """Return the job's log entry, which matches `job_kwargs`, if any.
+
+        Unlike `wait`, the job's logs are fetched just once. Raises a
+        JobError, if the log entry indicates an error.
+
+        """
+        matcher = _Waiter(job_id, job_kwargs)
+        for entry in self.fetch_logs(job_id):
+            if matcher.match(entry):
+                if entry.get('error'):
+                    raise JobError(
+                        'Job %s failed: %s' % (job_id, entry['error']), entry
+                    )
+                return entry
+        return None
+
+    def fetch_logs(self, job_id):
+        """Return the log entries of the specified job."""
+        self.requests += 1
+        response = self.session.get(
+            '%s/api/v1/jobs/%s' % (self.uri, job_id),
+            headers={'Authorization': self.token},
+        )
+        response.raise_for_status()
+        return response.json().get('logs', [])
+
+    def _poll(self):
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._thread = None
+                    return
+                waiters = list(self._waiters)
+            found = False
+            for job_id in set(waiter.job_id for waiter in waiters):
+                try:
+                    logs = self.fetch_logs(job_id)
+                except Exception as exc:
+                    log.debug('Failed to fetch job %s: %r', job_id, exc)
+                    continue
+                for waiter in waiters:
+                    if waiter.job_id != job_id:
+                        continue
+                    for entry in logs:
+                        if waiter.match(entry):
+                            waiter.event = entry
+                            waiter.done.set()
+                            found = True
+                            break
+            with self._lock:
+                for waiter in waiters:
+                    if waiter.done.is_set() and waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                if found:
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self._interval * 2,
+                                         self.max_interval)
+                if self._waiters:
+                    self._lock.wait(self._interval)
+
+
+_waiters = {}
+_waiters_lock = threading.Lock()
+
+
+def get_event_waiter(uri, token):
+    """Return the process-wide EventWaiter for the given mist.io account."""
+    with _waiters_lock:
+        if (uri, token) not in _waiters:
+            _waiters[(uri, token)] = EventWaiter(uri, token)
+        return _waiters[(uri, token)]
+
+
+def wait_for_event(job_id, job_kwargs, timeout=1800):
+    """Wait for a job's log entry, which matches `job_kwargs`.
+
+    This is a drop-in replacement of `plugin.utils.wait_for_event`, which
+    uses the process-wide EventWaiter of the node's mist.io account, so that
+    all operations running in the same process share a single poller.
+
+    """
+    mist_config = ctx.node.properties['mist_config']
+    ctx.logger.info('Waiting for event %s of job %s', job_kwargs, job_id)
+    waiter = get_event_waiter(mist_config['mist_uri'],
+                              mist_config['mist_token'])
+    return waiter.wait(job_id, job_kwargs, timeout=timeout)
+
+
+def wait_for_events(job_id, job_kwargs, count, timeout=1800):
+    """Wait for `count` log entries of a job, which match `job_kwargs`.
+
+    This is meant for jobs that act on multiple machines at once, e.g. bulk
+    machine creation, which log the same action once per machine. The job's
+    logs are fetched over the shared session of the node's EventWaiter, with
+    the same adaptive polling interval.
+
+    Returns the list of matching log entries. Raises a NonRecoverableError,
+    if any of them indicates an error or if `timeout` seconds go by.
+
+    """
+    mist_config = ctx.node.properties['mist_config']
+    ctx.logger.info('Waiting for %d event(s) %s of job %s', count, job_kwargs,
+                    job_id)
+    waiter = get_event_waiter(mist_config['mist_uri'],
+                              mist_config['mist_token'])
+    matcher = _Waiter(job_id, job_kwargs)
+    deadline = time.time() + timeout
+    interval = waiter.min_interval
+    events = []
+    while True:
+        try:
+            logs = waiter.fetch_logs(job_id)
+        except Exception as exc:
+            ctx.logger.debug('Failed to fetch job %s: %r', job_id, exc)
+            logs = []
+        matched = [entry for entry in logs if matcher.match(entry)]
+        for entry in matched:
+            if entry.get('error'):
+                raise JobError(
+                    'Job %s failed: %s' % (job_id, entry['error']), entry
+                )
+        if len(matched) >= count:
+            return matched[:count]
+        if time.time() > deadline:
+            raise NonRecoverableError(
+                'Timed out waiting for %d x %s of job %s, got %d' % (
+                    count, job_kwargs, job_id, len(matched))
+            )
+        if len(matched) > len(events):
+            interval = waiter.min_interval
+        else:
+            interval = min(interval * 2, waiter.max_interval)
+        events = matched
+        time.sleep(interval)
@@ -0,0 +1,60 @@
+# The load of each node, as reported by node-load.sh, in order.
+FIELDS = (
+    'pods',
+    'pdb_blocked',
+    'local_storage',
+    'cpu_millis',
+    'memory_bytes',
+)
+
+# The cost of draining a node for each unit of its load. Pods blocked by a
+# pod disruption budget may stall the drain and pods with local storage lose
+# their data, thus they cost more than any other pod. Requested resources
+# add to the cost, since they have to be rescheduled on the remaining nodes.
+WEIGHTS = {
+    'pods': 1.0,
+    'pdb_blocked': 10.0,
+    'local_storage': 5.0,
+    'cpu_millis': 1.0 / 1000,
+    'memory_bytes': 1.0 / 2 ** 30,
+}
+
+
+def parse_node_load(text):
+    """Parse the output of node-load.sh.
+
+    Returns a dict of hostnames to their load, i.e. a dict of each one of
+    the FIELDS to its value.
+
+    """
+    node_load = {}
+    for line in (text or '').splitlines():
+        parts = line.split()
+        if len(parts) != len(FIELDS) + 2 or parts[0] != 'node-load':
+            continue
+        if all(part.isdigit() for part in parts[2:]):
+            node_load[parts[1]] = dict(zip(FIELDS, map(int, parts[2:])))
+    return node_load
+
+
+def drain_cost(load):
+    """Return the cost of draining a node with the given load."""
+    return round(sum(WEIGHTS[key] * load.get(key, 0) for key in FIELDS), 2)
+
+
+def rank_nodes(hostnames, node_load):
+    """Rank nodes by the cost of draining them, cheapest first.
+
+    Returns a list of dicts, one per hostname, with the node's load and its
+    cost. Nodes of unknown load come last, in the order given.
+
+    """
+    ranking = []
+    for hostname in hostnames:
+        load = node_load.get(hostname)
+        entry = {'hostname': hostname, 'cost': None}
+        if load is not None:
+            entry.update(load, cost=drain_cost(load))
+        ranking.append(entry)
+    return sorted(ranking, key=lambda entry: (entry['cost'] is None,
+                                              entry['cost']))
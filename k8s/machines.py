@@ -0,0 +1,124 @@
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from plugin.utils import generate_name
+from plugin.utils import get_stack_name
+
+from k8s.connection import get_session
+from k8s.events import wait_for_events
+from k8s.events import get_event_waiter
+
+
+def mist_request(method, path, **kwargs):
+    """Make a request to the mist.io API over the shared HTTP session."""
+    mist_config = ctx.node.properties['mist_config']
+    response = get_session().request(
+        method, '%s/api/v1/%s' % (mist_config['mist_uri'].rstrip('/'), path),
+        headers={'Authorization': mist_config['mist_token']}, **kwargs
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def create_machines(spec, quantity, role='worker'):
+    """Create `quantity` identical machines with a single request.
+
+    The machines are provisioned by mist.io in parallel as part of the same
+    job. Once all of them are up, they are looked up with a single request
+    to get their names and IPs.
+
+    Returns a list of dicts, one per machine, to be passed to the create
+    operation of a node instance, which adopts the machine. Raises a
+    NonRecoverableError, destroying the machines, if any of them may not be
+    identified or looked up, or if the job fails or times out.
+
+    """
+    cloud_id = spec['cloud_id']
+    name = generate_name(get_stack_name(), role)
+    ctx.logger.info('Creating %d %s machine(s) named %s', quantity, role,
+                    name)
+    job = mist_request('POST', 'clouds/%s/machines' % cloud_id, json={
+        'name': name,
+        'key': spec.get('key_id', ''),
+        'image': spec.get('image_id', ''),
+        'size': spec.get('size_id', ''),
+        'location': spec.get('location_id', ''),
+        'networks': spec.get('networks', []),
+        'quantity': quantity,
+        'async': True,
+    })
+    try:
+        events = wait_for_events(
+            job_id=job['job_id'],
+            job_kwargs={'action': 'post_deploy_finished'},
+            count=quantity,
+        )
+        machine_ids = [event.get('machine_id') or event.get('external_id')
+                       for event in events]
+        machines = dict(
+            (machine.get('machine_id') or machine.get('id'), machine)
+            for machine in mist_request('GET',
+                                        'clouds/%s/machines' % cloud_id)
+        )
+
+        # Each machine needs a name of its own, since it becomes the name of
+        # its kubernetes node. Fail, instead of falling back to the shared
+        # name.
+        errors = []
+        if not all(machine_ids):
+            errors.append('%d event(s) of job %s name no machine' % (
+                machine_ids.count(None) + machine_ids.count(''),
+                job['job_id']))
+        unlisted = [machine_id for machine_id in machine_ids if machine_id and
+                    not machines.get(machine_id, {}).get('name')]
+        if unlisted:
+            errors.append('machine(s) %s are not listed by cloud %s' % (
+                ', '.join(unlisted), cloud_id))
+        if errors:
+            raise NonRecoverableError('Failed to look up the %d machine(s) '
+                                      'created: %s' % (quantity,
+                                                       '; '.join(errors)))
+    except Exception:
+        # The machines, which did come up, are not known to any node instance
+        # and would outlive the deployment.
+        for machine_id in get_job_machines(job['job_id']):
+            destroy_machine(cloud_id, machine_id)
+        raise
+    return [
+        {
+            'cloud_id': cloud_id,
+            'machine_id': machine_id,
+            'machine_name': machines[machine_id]['name'],
+            'private_ips': machines[machine_id].get('private_ips', []),
+            'public_ips': machines[machine_id].get('public_ips', []),
+            'job_id': job['job_id'],
+        } for machine_id in machine_ids
+    ]
+
+
+def get_job_machines(job_id):
+    """Return the IDs of the machines named by any log entry of a job."""
+    mist_config = ctx.node.properties['mist_config']
+    waiter = get_event_waiter(mist_config['mist_uri'],
+                              mist_config['mist_token'])
+    try:
+        logs = waiter.fetch_logs(job_id)
+    except Exception as exc:
+        ctx.logger.warn('Failed to look up the machines of job %s: %r',
+                        job_id, exc)
+        return []
+    machine_ids = []
+    for entry in logs:
+        machine_id = entry.get('machine_id') or entry.get('external_id')
+        if machine_id and machine_id not in machine_ids:
+            machine_ids.append(machine_id)
+    return machine_ids
+
+
+def destroy_machine(cloud_id, machine_id):
+    """Destroy a machine, logging any error raised."""
+    try:
+        mist_request('POST', 'clouds/%s/machines/%s' % (cloud_id, machine_id),
+                     json={'action': 'destroy'})
+    except Exception as exc:
+        ctx.logger.warn('Failed to destroy machine %s: %r', machine_id, exc)
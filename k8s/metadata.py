@@ -0,0 +1,152 @@
+import time
+import threading
+
+from cloudify import ctx
+
+from k8s.connection import get_connection
+
+
+# How long metadata looked up from the mist.io API is cached in-process.
+TTL = 300
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def _get_cached(key):
+    with _lock:
+        expires, value = _cache.get(key, (0, None))
+    return value if expires > time.time() else None
+
+
+def _set_cached(key, value):
+    with _lock:
+        _cache[key] = (time.time() + TTL, value)
+
+
+def store_metadata(provider):
+    """Store the metadata of the node instance's cloud and machine.
+
+    This is meant to be called at create time, once the machine has been
+    provisioned, so that later lifecycle operations read the cloud provider,
+    the machine's ID and its IPs from the instance's runtime properties,
+    instead of looking them up again through the mist.io API.
+
+    """
+    runtime_properties = ctx.instance.runtime_properties
+    info = runtime_properties.get('info', {})
+    runtime_properties['mist_metadata'] = {
+        'provider': provider,
+        'cloud_id': runtime_properties['cloud_id'],
+        'machine_id': runtime_properties['machine_id'],
+        'private_ips': info.get('private_ips', []),
+        'public_ips': info.get('public_ips', []),
+    }
+
+
+def get_metadata(instance=None):
+    """Return the cached metadata of `instance`, if any."""
+    instance = instance or ctx.instance
+    return instance.runtime_properties.get('mist_metadata', {})
+
+
+def get_provider(cloud_id):
+    """Return the provider of the specified cloud."""
+    metadata = get_metadata()
+    if metadata.get('cloud_id') == cloud_id:
+        return metadata['provider']
+    return get_cloud(cloud_id).provider
+
+
+def get_cloud(cloud_id, conn=None):
+    """Return the specified cloud.
+
+    `conn` may be given, in order to look the cloud up outside of the thread
+    of an operation, e.g. in a thread of its own.
+
+    """
+    cloud = _get_cached(('cloud', cloud_id))
+    if cloud is None:
+        cloud = (conn or get_connection()).get_cloud(cloud_id)
+        _set_cached(('cloud', cloud_id), cloud)
+    return cloud
+
+
+def get_machine_ref(instance=None):
+    """Return the (cloud_id, machine_id) pair of `instance`'s machine.
+
+    The machine's metadata is read from `instance`'s runtime properties. The
+    machine is only looked up, if the metadata is missing, e.g. in case of a
+    node provisioned by an earlier version of this blueprint.
+
+    """
+    instance = instance or ctx.instance
+    metadata = get_metadata(instance)
+    if metadata.get('machine_id'):
+        return metadata['cloud_id'], metadata['machine_id']
+    key = ('machine', instance.runtime_properties['cloud_id'],
+           instance.runtime_properties['machine_id'])
+    ref = _get_cached(key)
+    if ref is None:
+        machine = get_connection().get_machine(cloud_id=key[1],
+                                               machine_id=key[2])
+        ref = machine.cloud.id, machine.id
+        _set_cached(key, ref)
+    return ref
+
+
+def invalidate(instance=None):
+    """Drop the cached metadata of `instance`.
+
+    This is meant to be called when an operation on the machine fails, so
+    that a retry looks the machine up again. Metadata stored in the runtime
+    properties of instances other than the current one is left untouched.
+
+    """
+    instance = instance or ctx.instance
+    with _lock:
+        for key in list(_cache):
+            if key[0] == 'machine' and key[1:] == (
+                    instance.runtime_properties.get('cloud_id'),
+                    instance.runtime_properties.get('machine_id')):
+                del _cache[key]
+    if instance.id == ctx.instance.id:
+        instance.runtime_properties.pop('mist_metadata', None)
+
+
+def get_size(cloud_id, size_id):
+    """Return the size `size_id` of the specified cloud, if found.
+
+    The size is a dict, which includes its number of `cpus` and its `ram` in
+    MB, as far as they are reported by the cloud.
+
+    """
+    for size in list_resources(cloud_id, 'sizes'):
+        if size.get('id') == size_id:
+            return size
+    return None
+
+
+def list_resources(cloud_id, kind, conn=None):
+    """Return the resources of the given kind of the specified cloud.
+
+    `kind` is one of "sizes", "images", "locations" or "networks". Like the
+    rest of the metadata, the resources are cached, so that they are listed
+    once for all machines of the same cloud.
+
+    """
+    key = (kind, cloud_id)
+    resources = _get_cached(key)
+    if resources is None:
+        resources = getattr(get_cloud(cloud_id, conn), kind)
+        _set_cached(key, resources)
+    return resources
+
+
+def list_keys(conn=None):
+    """Return the keys of the mist.io account, which are cached as well."""
+    keys = _get_cached(('keys', ))
+    if keys is None:
+        keys = (conn or get_connection()).client.keys()
+        _set_cached(('keys', ), keys)
+    return keys
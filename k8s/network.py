@@ -0,0 +1,48 @@
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+
+# The pod networks deploy-node.sh may install. Flannel is rendered from the
+# manifest vendored in deploy-node.sh, while weave's manifest is fetched from
+# weave's service at install time.
+CNI_PLUGINS = ('flannel', 'weave')
+
+
+def get_network_args():
+    """Return the arguments of deploy-node.sh for the master's pod network.
+
+    These are the CNI to install, the pods' IP range, and the MTU of the
+    pods' interfaces, if set.
+
+    """
+    cni = ctx.node.properties.get('cni') or 'flannel'
+    if cni not in CNI_PLUGINS:
+        raise NonRecoverableError('CNI %s is not supported. Choose one of %s'
+                                  % (cni, ', '.join(CNI_PLUGINS)))
+    arguments = "-N '%s' " % cni
+    if ctx.node.properties.get('pod_cidr'):
+        arguments += "-P '%s' " % ctx.node.properties['pod_cidr']
+    if ctx.node.properties.get('cni_mtu'):
+        arguments += "-M '%d' " % ctx.node.properties['cni_mtu']
+    return arguments
+
+
+def parse_throughput(text):
+    """Parse the output of network-throughput.sh.
+
+    Returns a dict of the measured pod-to-pod throughput, in bits and in
+    megabits per second, and of the nodes it was measured between, or None,
+    if the output is incomplete.
+
+    """
+    for line in (text or '').splitlines():
+        parts = line.split()
+        if len(parts) == 4 and parts[0] == 'network-throughput' and \
+                parts[1].isdigit():
+            return {
+                'bits_per_second': int(parts[1]),
+                'mbps': round(int(parts[1]) / 1e6, 1),
+                'server_node': parts[2],
+                'client_node': parts[3],
+            }
+    return None
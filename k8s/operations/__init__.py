@@ -0,0 +1 @@
+"""The blueprint's operations, run by the scripts of tasks/."""
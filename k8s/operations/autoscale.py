@@ -0,0 +1,52 @@
+import json
+import time
+
+from cloudify import ctx
+
+from k8s.autoscale import decide
+from k8s.autoscale import parse_metrics
+from k8s.connection import track_api_usage
+from k8s.metadata import get_machine_ref
+from k8s.scripts import run_script
+
+
+def get_cluster_metrics():
+    """Get the pending pods and the utilization of all nodes at once.
+
+    Runs cluster-metrics.sh on the kubernetes master, which queries all
+    nodes and pods of the cluster in a single run.
+
+    Returns the metrics, as parsed by `k8s.autoscale.parse_metrics`, or None
+    if they could not be retrieved.
+
+    """
+    cloud_id, machine_id = get_machine_ref()
+    event = run_script(cloud_id=cloud_id, machine_id=machine_id,
+                       name='cluster-metrics.sh')
+    return parse_metrics((event or {}).get('stdout', ''))
+
+
+def autoscale(workers, policy=None, **kwargs):
+    """Decide by how many workers the cluster should be scaled.
+
+    This operation runs on the kubernetes master on behalf of the autoscale
+    workflow. The state of the previous decisions, which is required for the
+    cooldown and the hysteresis, is kept in the master's runtime properties,
+    along with the latest metrics and decision, so that it persists across
+    executions of the workflow.
+
+    """
+    with track_api_usage():
+        metrics = get_cluster_metrics()
+        decision, state = decide(
+            metrics, workers, policy=policy,
+            state=ctx.instance.runtime_properties.get('autoscale_state'),
+            now=int(time.time()),
+        )
+        ctx.logger.info('Autoscale decision: %s', json.dumps(decision))
+        ctx.instance.runtime_properties.update({
+            'autoscale_state': state,
+            'autoscale_metrics': metrics,
+            'autoscale_decision': decision,
+        })
+        ctx.returns(decision)
@@ -0,0 +1,308 @@
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from plugin import constants
+
+from plugin.utils import random_string
+
+from k8s.connection import get_connection
+from k8s.connection import track_api_usage
+from k8s.events import JobError
+from k8s.events import wait_for_event
+from k8s.control_plane import get_join_args
+from k8s.control_plane import start_control_plane
+from k8s.control_plane import get_control_plane
+from k8s.control_plane import get_control_plane_args
+from k8s.metadata import invalidate
+from k8s.metadata import get_provider
+from k8s.metadata import get_machine_ref
+from k8s.network import get_network_args
+from k8s.tuning import get_tuning_args
+from k8s.output import explain_failure
+from k8s.timings import parse_timings
+from k8s.scripts import get_script
+from k8s.scripts import get_script_id
+from k8s.scripts import follow_bootstrap
+from k8s.scripts import get_master_instance
+from k8s.scripts import register_scripts
+
+
+def remove_kubernetes_script():
+    """Attempt to remove the kubernetes installation script.
+
+    This method tries to remove the installation script after each kubernetes
+    node has been provisioned, in case it was uploaded just for this node, to
+    prevent multiple scripts from accumulating in the user's account. Scripts
+    in the cluster's script registry are shared and are not removed.
+
+    If an error is raised, it's logged and the workflow execution is carried
+    on.
+
+    """
+    script_id = ctx.instance.runtime_properties.pop('script_id', '')
+    if script_id and script_id != get_script_id('deploy-node.sh'):
+        try:
+            get_connection().client.remove_script(script_id)
+        except Exception as exc:
+            ctx.logger.warn('Failed to remove installation script: %r', exc)
+
+
+def prepare_kubernetes_script():
+    """Get the kubernetes installation script, uploading it if missing.
+
+    This method is executed at the very beginning, in a pre-configuration
+    phase, to make sure that the kubernetes installation script has been
+    uploaded to mist.io.
+
+    This method is meant to be invoked early on by:
+
+        configure_kubernetes_master()
+        configure_kubernetes_worker()
+
+    The script registered for the cluster by the kubernetes master is used,
+    if available. Otherwise, a fresh copy of the script is uploaded.
+
+    The script_id inside each instance's runtime properties is used later
+    on in order to configure kubernetes on the provisioned machines.
+
+    """
+    script_id = get_script_id('deploy-node.sh')
+    if script_id:
+        ctx.logger.info('Kubernetes installation script already exists')
+    else:
+        ctx.logger.info('Uploading fresh kubernetes installation script')
+        # If the script has not been registered, perhaps because the master
+        # has been configured by an earlier version of this blueprint, load
+        # the script from file, upload it to mist.io, and run it over ssh.
+        script = get_connection().client.add_script(
+            name='install_kubernetes_%s' % random_string(length=4),
+            script=get_script('deploy-node.sh')[0],
+            location_type='inline', exec_type='executable'
+        )
+        script_id = script['id']
+    ctx.instance.runtime_properties['script_id'] = script_id
+
+
+def is_resumed():
+    """Return whether a previous attempt to install kubernetes has failed.
+
+    This is the case, if the configure operation is being retried, or if the
+    installation has already been started by an earlier execution. The
+    installation script then resumes the bootstrap, skipping the phases,
+    which have already completed on the machine.
+
+    """
+    return bool(ctx.operation.retry_number or
+                ctx.instance.runtime_properties.get('install_event'))
+
+
+def configure_kubernetes_master():
+    """Configure the kubernetes master.
+
+    Sets up the master node and stores the necessary settings inside the node
+    instance's runtime properties, which are required by worker nodes in order
+    to join the kubernetes cluster.
+
+    """
+    ctx.logger.info('Setting up kubernetes master node')
+    prepare_kubernetes_script()
+
+    cloud_id, machine_id = get_machine_ref()
+
+    # Token for secure master-worker communication. The token is kept, when
+    # resuming, since it identifies the bootstrap being resumed.
+    resume = is_resumed()
+    if not (resume and ctx.instance.runtime_properties.get('master_token')):
+        token = '%s.%s' % (random_string(length=6), random_string(length=16))
+        ctx.instance.runtime_properties['master_token'] = token.lower()
+
+    # Store kubernetes dashboard credentials in runtime properties.
+    ctx.instance.runtime_properties.update({
+        'auth_user': ctx.node.properties['auth_user'],
+        'auth_pass': ctx.node.properties['auth_pass'] or random_string(10),
+    })
+
+    ctx.logger.info('Installing kubernetes on master node')
+
+    # Prepare script parameters.
+    params = "-n '%s' " % ctx.instance.runtime_properties['machine_name']
+    params += "-t '%s' " % ctx.instance.runtime_properties['master_token']
+    params += get_control_plane_args()
+    params += get_network_args()
+    params += get_tuning_args()
+    params += "-r 'master'"
+    if resume:
+        params += " -R"
+
+    # Run the script.
+    script = get_connection().client.run_script(
+        script_id=ctx.instance.runtime_properties['script_id'], su=True,
+        machine_id=machine_id,
+        cloud_id=cloud_id,
+        script_params=params,
+    )
+    ctx.instance.runtime_properties['job_id'] = script['job_id']
+
+    # Start installing the rest of the control plane, if highly available.
+    start_control_plane(ctx.instance.runtime_properties['script_id'], resume)
+
+
+def configure_kubernetes_worker():
+    """Configure a new kubernetes node.
+
+    Configures a new worker node and connects it to the kubernetes master,
+    or to the load balanced endpoint of a highly available control plane.
+
+    """
+    # Get master node from relationships schema.
+    master = get_master_instance()
+    ctx.instance.runtime_properties.update({
+        'master_ip': master.runtime_properties.get('master_ip', ''),
+        'master_token': master.runtime_properties.get('master_token', ''),
+    })
+
+    ctx.logger.info('Setting up kubernetes worker')
+    prepare_kubernetes_script()
+
+    cloud_id, machine_id = get_machine_ref()
+
+    ctx.logger.info('Configuring kubernetes node')
+
+    # Prepare script parameters.
+    params = get_join_args(master)
+    params += "-n '%s' " % ctx.instance.runtime_properties['machine_name']
+    params += "-t '%s' " % ctx.instance.runtime_properties['master_token']
+    params += get_tuning_args()
+    params += "-r 'node'"
+    if is_resumed():
+        params += " -R"
+
+    # Run the script.
+    script = get_connection().client.run_script(
+        script_id=ctx.instance.runtime_properties['script_id'], su=True,
+        machine_id=machine_id,
+        cloud_id=cloud_id,
+        script_params=params,
+    )
+    ctx.instance.runtime_properties['job_id'] = script['job_id']
+
+
+def wait_for_master():
+    """Wait for kubernetes to be installed on the master.
+
+    The master's configure operation only starts the installation, so that
+    worker nodes may be provisioned and prepared in the meantime. Workers
+    wait for the master's installation to finish in order to report its
+    failure, if any, while their own installation script waits for the
+    master's API server to come up before joining the cluster.
+
+    """
+    master = get_master_instance()
+    install_event = master.runtime_properties.get('install_event')
+    if not install_event:
+        return
+    installations = [('master', install_event)] + [
+        (machine['machine_name'], machine['install_event'])
+        for machine in get_control_plane(master)
+        if machine.get('install_event')
+    ]
+    for name, event in installations:
+        ctx.logger.info('Waiting for kubernetes to be installed on %s', name)
+        try:
+            wait_for_event(**event)
+        except JobError as exc:
+            raise NonRecoverableError(
+                'Kubernetes installation on %s %s' % (name, explain_failure(
+                    (exc.event.get('stdout') or '').splitlines(),
+                    exc.event['error']))
+            )
+        except Exception as exc:
+            raise NonRecoverableError(
+                'Kubernetes installation on %s failed: %s' % (name, exc)
+            )
+
+
+def wait_for_installation(**kwargs):
+    """Wait for kubernetes to be installed on the control plane.
+
+    This operation runs on a node of its own, which only depends on the
+    master, so that it runs along with the workers, once the master's
+    configure operation has started the installation. That way, a failed
+    installation of the master fails the install workflow, even if there
+    are no workers to report it.
+
+    """
+    with track_api_usage():
+        wait_for_master()
+        ctx.logger.info('Kubernetes installation on master succeeded')
+
+
+def configure(**kwargs):
+    """Setup kubernetes on the machines defined by the blueprint."""
+    with track_api_usage():
+        # Register the scripts shared by all nodes of the cluster.
+        if ctx.node.properties['master']:
+            register_scripts()
+
+        # Start the installation, unless already in progress by cloud-init.
+        provider = get_provider(ctx.instance.runtime_properties['cloud_id'])
+        if provider in constants.CLOUD_INIT_PROVIDERS:
+            install_event = {
+                'job_id': ctx.instance.runtime_properties['job_id'],
+                'job_kwargs': {
+                    'action': 'cloud_init_finished',
+                    'machine_name': ctx.instance.runtime_properties[
+                        'machine_name'],
+                },
+            }
+        elif not ctx.node.properties['configured']:
+            if not ctx.node.properties['master']:
+                configure_kubernetes_worker()
+            else:
+                configure_kubernetes_master()
+            install_event = {
+                'job_id': ctx.instance.runtime_properties['job_id'],
+                'job_kwargs': {
+                    'action': 'script_finished',
+                    'external_id': ctx.instance.runtime_properties[
+                        'machine_id'],
+                },
+            }
+        else:
+            ctx.logger.info('Kubernetes already configured')
+            install_event = None
+
+        # Do not wait for the master's installation to finish. Workers, as
+        # well as the kube_installation node, wait for it, before waiting for
+        # their own installation.
+        if install_event:
+            ctx.instance.runtime_properties['install_event'] = install_event
+        if install_event and ctx.node.properties['master']:
+            ctx.logger.info('Kubernetes installation on master started')
+        elif install_event:
+            try:
+                wait_for_master()
+                # Follow the installation script's output, failing fast on
+                # known errors, unless it is run by cloud-init.
+                if provider in constants.CLOUD_INIT_PROVIDERS:
+                    event = wait_for_event(**install_event)
+                else:
+                    cloud_id, machine_id = get_machine_ref()
+                    event = follow_bootstrap(
+                        cloud_id, machine_id, interval=ctx.node.properties.get(
+                            'bootstrap_log_interval', 120),
+                        **install_event)
+            except Exception:
+                remove_kubernetes_script()
+                invalidate()
+                raise
+            else:
+                remove_kubernetes_script()
+            ctx.logger.info('Kubernetes installation succeeded!')
+
+            # Store the duration of each bootstrap phase, as reported by
+            # either the script's output or the cloud-init signal.
+            timings = parse_timings(event.get('stdout') or
+                                    event.get('timings'))
+            ctx.logger.info('Bootstrap timings: %s', timings)
+            ctx.instance.runtime_properties['bootstrap_timings'] = timings
@@ -0,0 +1,318 @@
+import os
+import gzip
+import base64
+import StringIO
+
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from plugin import constants
+from plugin.utils import random_string
+from plugin.utils import generate_name
+from plugin.utils import get_stack_name
+from plugin.utils import is_resource_external
+
+from k8s.control_plane import get_join_args
+from k8s.control_plane import set_api_endpoint
+from k8s.control_plane import create_control_plane
+from k8s.metadata import get_provider
+from k8s.metadata import store_metadata
+from k8s.network import get_network_args
+from k8s.preflight import check_specs
+from k8s.tuning import get_tuning_args
+from k8s.tuning import store_tuning_profile
+from k8s.scripts import get_script
+
+
+# The maximum size of user-data, in bytes, accepted by each cloud provider.
+USER_DATA_LIMITS = {
+    'ec2': 16 * 1024,
+    'azure_arm': 64 * 1024,
+    'gce': 256 * 1024,
+    'openstack': 64 * 1024,
+    'digitalocean': 64 * 1024,
+    'linode': 16 * 1024,
+}
+DEFAULT_USER_DATA_LIMIT = 16 * 1024
+
+# The parameters of a machine's spec, which are required in order to create
+# an identical one.
+MACHINE_SPEC_KEYS = (
+    'cloud_id', 'key_id', 'size_id', 'image_id', 'location_id', 'networks',
+)
+
+
+def compress(content):
+    """Return `content`, gzip-compressed and base64-encoded."""
+    buf = StringIO.StringIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as fobj:
+        fobj.write(content)
+    return base64.b64encode(buf.getvalue())
+
+
+def compress_script(name):
+    """Return the gzip-compressed, base64-encoded content of a script."""
+    return compress(get_script(name)[0])
+
+
+def prepare_cloud_init(provider):
+    """Render the cloud-init script.
+
+    This method is executed if the cloud provider is included in the
+    CLOUD_INIT_PROVIDERS in order to prepare the cloud-init that is
+    used to install kubernetes on each of the provisioned VMs at boot
+    time.
+
+    This method, based on each node's type, is meant to invoke:
+
+        get_master_init_args()
+        get_worker_init_args()
+
+    in order to get the arguments required by the kubernetes installation
+    script.
+
+    The cloud-init.yml is just a wrapper around the deploy-node.sh, which
+    is provided as a parameter at VM provision time. In return, we avoid
+    the extra step of uploading an extra script and executing it over SSH.
+
+    The deploy-node.sh is inlined in the cloud-init, compressed, so that VMs
+    start installing kubernetes right away, without fetching it at boot time.
+    The rendered cloud-init must not exceed the provider's user-data limit.
+
+    """
+    if ctx.node.properties['master']:
+        arguments = get_master_init_args()
+    else:
+        arguments = get_worker_init_args()
+
+    ctx.logger.debug('Will run deploy-node.sh with: %s', arguments)
+    ctx.instance.runtime_properties['cloud_init_arguments'] = arguments
+
+    ctx.logger.debug('Current runtime: %s', ctx.instance.runtime_properties)
+
+    ctx.logger.info('Rendering cloud-init.yml')
+
+    # Render into a temporary file of its own, since operations of several
+    # nodes may run in the same process.
+    path = ctx.download_resource_and_render(
+        os.path.join('cloud-init', 'cloud-init.yml'),
+        template_variables={'deploy_node': compress_script('deploy-node.sh')}
+    )
+    with open(path) as fobj:
+        cloud_init = fobj.read()
+    os.remove(path)
+
+    limit = USER_DATA_LIMITS.get(provider, DEFAULT_USER_DATA_LIMIT)
+    if len(cloud_init) > limit:
+        raise NonRecoverableError(
+            'cloud-init is %d bytes, exceeding the %d bytes of user-data '
+            'allowed by %s' % (len(cloud_init), limit, provider)
+        )
+    ctx.instance.runtime_properties['cloud_init'] = cloud_init
+
+
+def adopt_machine(machine):
+    """Use a machine, which has already been provisioned, for this node.
+
+    The scale up workflow creates identical worker machines in bulk, through
+    the kubernetes master, and then passes each one of them to the create
+    operation of a new node instance. The machine's details are stored the
+    same way as if the machine had been created by this operation.
+
+    """
+    ctx.logger.info('Using machine %s created in bulk', machine['machine_id'])
+    ctx.instance.runtime_properties.update({
+        'job_id': machine['job_id'],
+        'cloud_id': machine['cloud_id'],
+        'machine_id': machine['machine_id'],
+        'machine_name': machine['machine_name'],
+        'info': {
+            'private_ips': machine['private_ips'],
+            'public_ips': machine['public_ips'],
+        },
+    })
+
+
+def get_master_init_args():
+    """Return the arguments required to install the kubernetes master."""
+
+    ctx.logger.info('Preparing cloud-init for kubernetes master')
+
+    # Token for secure master-worker communication.
+    token = '%s.%s' % (random_string(length=6), random_string(length=16))
+    ctx.instance.runtime_properties['master_token'] = token.lower()
+
+    # Store kubernetes dashboard credentials in runtime properties.
+    ctx.instance.runtime_properties.update({
+        'auth_user': ctx.node.properties['auth_user'],
+        'auth_pass': ctx.node.properties['auth_pass'] or random_string(10),
+    })
+
+    arguments = "-n '%s' " % ctx.instance.runtime_properties['machine_name']
+    arguments += "-t '%s' " % ctx.instance.runtime_properties['master_token']
+    arguments += get_network_args()
+    arguments += get_tuning_args()
+    arguments += "-r 'master'"
+
+    return arguments
+
+
+def get_worker_init_args():
+    """Return the arguments required to install a kubernetes worker."""
+
+    ctx.logger.info('Preparing cloud-init for kubernetes worker')
+
+    # Get master node from relationships schema.
+    master = ctx.instance.relationships[0]._target.instance
+    ctx.instance.runtime_properties.update({
+        'master_ip': master.runtime_properties.get('master_ip', ''),
+        'master_token': master.runtime_properties.get('master_token', ''),
+    })
+
+    arguments = "-n '%s' " % ctx.instance.runtime_properties['machine_name']
+    arguments += get_join_args(master)
+    arguments += "-t '%s' " % master.runtime_properties['master_token']
+    arguments += get_tuning_args()
+    arguments += "-r 'node'"
+
+    return arguments
+
+
+def create(machine=None, **kwargs):
+    """Create the nodes on which to install kubernetes.
+
+    Besides creating the nodes, this method also decides the way kubernetes
+    will be configured on each of the nodes.
+
+    The legacy way is to upload the script and execute it over SSH. However,
+    if the cloud provider supports cloud-init, a cloud-config can be used as
+    a wrapper around the actual script. In this case, the `configure` lifecycle
+    operation of the blueprint is mostly skipped. More precisely, it just waits
+    to be signalled regarding cloud-init's result and exits immediately without
+    performing any additional actions.
+
+    Machines created in bulk by the scale up workflow are passed as the
+    `machine` parameter. Such machines are never configured by cloud-init.
+
+    """
+    # Imported here, since these are only required when creating a node.
+    from plugin.server import get_cloud_id
+    from plugin.server import create_machine
+    from plugin.connection import MistConnectionClient
+
+    conn = MistConnectionClient()
+    ctx.instance.runtime_properties['job_id'] = conn.job_id
+
+    # Create a copy of the node's immutable properties in order to update them.
+    node_properties = ctx.node.properties.copy()
+
+    # Override the node's properties with parameters passed from workflows.
+    for key in kwargs:
+        if key in constants.INSTANCE_REQUIRED_PROPERTIES + ('machine_id', ):
+            node_properties['parameters'][key] = kwargs[key]
+            ctx.logger.info('Added %s=%s to node parameters', key, kwargs[key])
+
+    # Generate a somewhat random machine name. NOTE that we need the name at
+    # this early point in order to be passed into cloud-init, if used, so that
+    # we may use it later on to match log entries.
+    name = generate_name(
+        get_stack_name(),
+        'master' if ctx.node.properties['master'] else 'worker'
+    )
+    node_properties['parameters']['name'] = name
+    ctx.instance.runtime_properties['machine_name'] = name
+
+    # Validate the specs of the master and of the workers before provisioning
+    # any machine, so that the installation fails right away, instead of
+    # once the first machine of an invalid spec is created.
+    if ctx.node.properties['master'] and not machine:
+        check_specs([node_properties['parameters'],
+                     ctx.node.properties.get('worker_parameters') or {}])
+
+    # Get the cloud provider based on the node's properties.
+    provider = get_provider(get_cloud_id(node_properties))
+
+    # Tune the node based on its machine's size.
+    store_tuning_profile(node_properties['parameters'])
+
+    # Generate cloud-init, if supported.
+    # TODO This is NOT going to work when use_external_resource is True. We
+    # are using cloud-init to configure the newly provisioned nodes in case
+    # the VMs are unreachable over SSH. If the VMs already exist, cloud-init
+    # is not an option. Perhaps, we should allow to toggle cloud-init on/off
+    # in some way after deciding if the VMs are accessible over the public
+    # internet.
+    if provider in constants.CLOUD_INIT_PROVIDERS and not machine:
+        if is_resource_external(node_properties):
+            raise NonRecoverableError('use_external_resource may not be set')
+        prepare_cloud_init(provider)
+        cloud_init = ctx.instance.runtime_properties.get('cloud_init', '')
+        node_properties['parameters']['cloud_init'] = cloud_init
+
+    # A highly available control plane is installed over SSH.
+    if ctx.node.properties['master'] and \
+            ctx.node.properties.get('master_count', 1) > 1:
+        if provider in constants.CLOUD_INIT_PROVIDERS:
+            raise NonRecoverableError(
+                'master_count may not be greater than 1 on %s, which uses '
+                'cloud-init' % provider)
+        if is_resource_external(node_properties):
+            raise NonRecoverableError(
+                'master_count may not be greater than 1 when using an '
+                'existing machine')
+        # Without a virtual IP, all nodes would reach the API through the
+        # master, which would remain a single point of failure.
+        if not ctx.node.properties.get('api_vip'):
+            raise NonRecoverableError(
+                'api_vip is required when master_count is greater than 1')
+
+    # Do not wait for post-deploy-steps to finish in case the configuration
+    # is done using a cloud-init script.
+    skip_post_deploy = provider in constants.CLOUD_INIT_PROVIDERS
+
+    # Create the nodes. Get the master node's IP address. NOTE that we prefer
+    # to use private IP addresses for master-worker communication. Public IPs
+    # are used mostly when connecting to the kubernetes API from the outside.
+    if machine:
+        adopt_machine(machine)
+    elif ctx.node.properties['master']:
+        create_machine(node_properties, skip_post_deploy, node_type='master')
+
+        ips = (ctx.instance.runtime_properties['info']['private_ips'] +
+               ctx.instance.runtime_properties['info']['public_ips'])
+        ips = filter(lambda ip: ':' not in ip, ips)
+        if not ips:
+            raise NonRecoverableError('No IPs associated with the machine')
+
+        ctx.instance.runtime_properties['master_ip'] = ips[0]
+        ctx.instance.runtime_properties['server_ip'] = ips[-1]
+
+        # Make sure the workers may reach the master at its IP, before the
+        # rest of the cluster is provisioned.
+        if ctx.node.properties.get('worker_parameters'):
+            check_specs([ctx.node.properties['worker_parameters']],
+                        master_ip=ips[0],
+                        master_spec=node_properties['parameters'])
+
+        # Create the rest of the control plane, if highly available, along
+        # with the master.
+        create_control_plane(dict(
+            (key, node_properties['parameters'][key])
+            for key in MACHINE_SPEC_KEYS
+            if key in node_properties['parameters']
+        ))
+        set_api_endpoint()
+    else:
+        create_machine(node_properties, skip_post_deploy, node_type='worker')
+
+    # Keep the spec of the machine, so that the heal workflow may replace it
+    # with an identical one, if it fails.
+    if not is_resource_external(node_properties):
+        ctx.instance.runtime_properties['machine_spec'] = dict(
+            (key, node_properties['parameters'][key])
+            for key in MACHINE_SPEC_KEYS
+            if key in node_properties['parameters']
+        )
+
+    # Cache the cloud's and the machine's metadata for later operations.
+    store_metadata(provider)
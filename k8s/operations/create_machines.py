@@ -0,0 +1,46 @@
+from cloudify import ctx
+
+from plugin import constants
+
+from k8s.connection import track_api_usage
+from k8s.machines import create_machines
+from k8s.machines import destroy_machine
+from k8s.metadata import get_provider
+
+
+def create_machines_in_bulk(groups, **kwargs):
+    """Create worker machines in bulk on behalf of the scale up workflow.
+
+    This operation runs on the kubernetes master. It is passed groups of
+    identical worker specs and creates the machines of each group with a
+    single request. The resulting machines are stored in the master's runtime
+    properties, keyed by group, so that the workflow may assign them to the
+    new node instances.
+
+    If any group fails, the machines of all groups are destroyed.
+
+    Groups of clouds, which use cloud-init, are skipped, since each machine's
+    cloud-init is specific to it. Their machines are created one by one by
+    each node instance's create operation.
+
+    """
+    with track_api_usage():
+        bulk_machines = {}
+        try:
+            for group, request in groups.items():
+                provider = get_provider(request['spec']['cloud_id'])
+                if provider in constants.CLOUD_INIT_PROVIDERS:
+                    ctx.logger.info('Skipping bulk creation on %s, which uses '
+                                    'cloud-init', provider)
+                    continue
+                bulk_machines[group] = create_machines(request['spec'],
+                                                       request['quantity'])
+        except Exception:
+            # The machines of the groups created so far would never be
+            # adopted by any node instance.
+            for machines in bulk_machines.values():
+                for machine in machines:
+                    destroy_machine(machine['cloud_id'],
+                                    machine['machine_id'])
+            raise
+        ctx.instance.runtime_properties['bulk_machines'] = bulk_machines
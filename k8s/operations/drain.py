@@ -0,0 +1,73 @@
+from cloudify import ctx
+
+from k8s.connection import track_api_usage
+from k8s.metadata import get_machine_ref
+from k8s.scripts import run_script
+
+
+def drain_nodes(hostnames, timeout=150, force=False):
+    """Drain and remove multiple nodes from the cluster at once.
+
+    Runs a single script, which cordons all nodes at once and then runs
+    `kubectl drain` and `kubectl delete nodes` concurrently for each one of
+    them. The script is executed on the kubernetes master in a single run.
+
+    If `force` is True, the nodes are removed without being drained and their
+    pods are deleted forcibly. This is meant for unreachable nodes, whose
+    pods may never be evicted gracefully.
+
+    Returns a dict of hostnames to their drain status, i.e. "ok", "failed",
+    or "unknown", if the script's output could not be retrieved.
+
+    """
+    cloud_id, machine_id = get_machine_ref()
+
+    ctx.logger.info('Draining %d node(s) on %s', len(hostnames),
+                    ctx.instance.runtime_properties.get('machine_name'))
+
+    # Allow some extra time for `kubectl delete` to run after the drain.
+    if force:
+        event = run_script(
+            cloud_id=cloud_id,
+            machine_id=machine_id,
+            name='remove-nodes.sh',
+            script_params=' '.join(["'%s'" % name for name in hostnames]),
+        )
+    else:
+        event = run_script(
+            cloud_id=cloud_id,
+            machine_id=machine_id,
+            name='drain-nodes.sh',
+            script_params=' '.join(
+                ["'%s'" % timeout] + ["'%s'" % name for name in hostnames]),
+            timeout=timeout + 60,
+        )
+
+    status = dict((hostname, 'unknown') for hostname in hostnames)
+    for line in (event or {}).get('stdout', '').splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == 'drain-status':
+            status[parts[1]] = parts[2]
+    return status
+
+
+def drain(hostnames, force=False, **kwargs):
+    """Drain and remove the specified worker nodes from the cluster.
+
+    This operation runs on the kubernetes master and is used by the scale
+    down workflow in order to remove all nodes with a single script run,
+    instead of one per node. The heal workflow sets `force` in order to
+    remove unreachable nodes without draining them.
+
+    """
+    with track_api_usage():
+        hostnames = [hostname.lower() for hostname in hostnames]
+        status = drain_nodes(hostnames, force=force)
+        for hostname in sorted(status):
+            if status[hostname] == 'ok':
+                ctx.logger.info('Node %s drained and removed', hostname)
+            else:
+                ctx.logger.warn('Draining node %s: %s', hostname,
+                                status[hostname])
+        ctx.instance.runtime_properties['drain_status'] = status
+        ctx.returns(status)
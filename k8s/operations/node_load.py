@@ -0,0 +1,49 @@
+import json
+
+from cloudify import ctx
+
+from k8s.connection import track_api_usage
+from k8s.load import rank_nodes
+from k8s.load import parse_node_load
+from k8s.metadata import get_machine_ref
+from k8s.scripts import run_script
+
+
+def get_node_load(hostnames):
+    """Get the load of multiple nodes with a single query.
+
+    Runs node-load.sh on the kubernetes master, which counts the pods of
+    each node, the pods blocked by pod disruption budgets or with local
+    storage, and the sum of their resource requests.
+
+    Returns a dict of hostnames to their load. Nodes, whose load could not
+    be retrieved, are missing.
+
+    """
+    cloud_id, machine_id = get_machine_ref()
+
+    ctx.logger.info('Getting the load of %d node(s)', len(hostnames))
+
+    event = run_script(
+        cloud_id=cloud_id,
+        machine_id=machine_id,
+        name='node-load.sh',
+        script_params=' '.join("'%s'" % name for name in hostnames),
+    )
+    return parse_node_load((event or {}).get('stdout', ''))
+
+
+def rank_by_load(hostnames, **kwargs):
+    """Rank worker nodes by the cost of draining them.
+
+    This operation runs on the kubernetes master and is used by the scale
+    down workflow in order to remove the nodes, which are the cheapest to
+    drain, first. The ranking is stored in the master's runtime properties.
+
+    """
+    with track_api_usage():
+        hostnames = [hostname.lower() for hostname in hostnames]
+        ranking = rank_nodes(hostnames, get_node_load(hostnames))
+        ctx.logger.info('Drain ranking: %s', json.dumps(ranking))
+        ctx.instance.runtime_properties['drain_ranking'] = ranking
+        ctx.returns(ranking)
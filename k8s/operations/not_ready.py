@@ -0,0 +1,46 @@
+from cloudify import ctx
+
+from k8s.autoscale import parse_metrics
+from k8s.connection import track_api_usage
+from k8s.metadata import get_machine_ref
+from k8s.scripts import run_script
+
+
+def get_not_ready_workers():
+    """Get the hostnames of all worker nodes, which are not ready.
+
+    Runs cluster-metrics.sh on the kubernetes master, which queries all
+    nodes of the cluster in a single run.
+
+    Returns None, if the nodes' state could not be retrieved.
+
+    """
+    cloud_id, machine_id = get_machine_ref()
+    event = run_script(cloud_id=cloud_id, machine_id=machine_id,
+                       name='cluster-metrics.sh')
+    metrics = parse_metrics((event or {}).get('stdout', ''))
+    if metrics is None:
+        return None
+    return sorted(hostname for hostname, node in metrics['nodes'].items()
+                  if node['worker'] and not node['ready'])
+
+
+def find_not_ready(**kwargs):
+    """Find the worker nodes, which are not ready, on behalf of heal_cluster.
+
+    This operation runs on the kubernetes master. The hostnames of the nodes
+    are stored in the master's runtime properties, so that the workflow may
+    replace the corresponding node instances.
+
+    """
+    with track_api_usage():
+        hostnames = get_not_ready_workers()
+        if hostnames is None:
+            ctx.logger.warn('Failed to get the state of the cluster nodes')
+            hostnames = []
+        elif hostnames:
+            ctx.logger.info('Node(s) not ready: %s', ', '.join(hostnames))
+        else:
+            ctx.logger.info('All nodes are ready')
+        ctx.instance.runtime_properties['not_ready_nodes'] = hostnames
+        ctx.returns(hostnames)
@@ -0,0 +1,21 @@
+from cloudify import ctx
+
+from k8s.connection import track_api_usage
+from k8s.preflight import check_specs
+
+
+def preflight(specs, **kwargs):
+    """Validate worker specs on behalf of the scale up workflow.
+
+    This operation runs on the kubernetes master, before any machine is
+    created. The IDs referred to by the `specs` are looked up at once and it
+    is checked that the new workers may reach the master at its IP. The
+    workflow fails right away, if any of the specs is invalid.
+
+    """
+    with track_api_usage():
+        properties = ctx.instance.runtime_properties
+        check_specs(specs, master_ip=properties.get('master_ip'),
+                    master_spec=properties.get('machine_spec') or {
+                        'cloud_id': properties.get('cloud_id'),
+                    })
@@ -0,0 +1,94 @@
+from cloudify import ctx
+
+from k8s.connection import track_api_usage
+from k8s.control_plane import destroy_control_plane
+from k8s.metadata import invalidate
+from k8s.metadata import get_machine_ref
+from k8s.pool import empty_pool
+from k8s.scripts import run_script
+from k8s.scripts import remove_scripts
+from k8s.scripts import get_master_instance
+
+
+def reset_kubeadm():
+    """Uninstall kubernetes on a node.
+
+    Runs `kubeadm reset` on the specified machine in order to remove the
+    kubernetes services and undo all configuration set by `kubeadm init`.
+
+    """
+    # Get worker.
+    cloud_id, machine_id = get_machine_ref()
+
+    ctx.logger.info('Running "kubeadm reset" on %s',
+                    ctx.instance.runtime_properties.get('machine_name'))
+
+    if run_script(cloud_id=cloud_id, machine_id=machine_id,
+                  name='reset-node.sh') is None:
+        invalidate()
+
+
+def drain_and_remove():
+    """Mark the node as unschedulable, evict all pods, and remove it.
+
+    Runs `kubectl drain` and `kubectl delete nodes` on the kubernetes
+    master in order to drain and afterwards remove the specified node
+    from the cluster.
+
+    """
+    if ctx.node.properties['master']:  # FIXME Is this necessary?
+        return
+
+    # Get master instance.
+    master = get_master_instance()
+
+    cloud_id, machine_id = get_machine_ref(master)
+
+    ctx.logger.info('Running "kubectl drain && kubectl delete" on %s',
+                    master.runtime_properties.get('machine_name'))
+
+    event = run_script(
+        cloud_id=cloud_id,
+        machine_id=machine_id,
+        name='drain-node.sh',
+        script_params="'%s'" % ctx.instance.runtime_properties.get(
+            'machine_name', '').lower(),
+    )
+    if event is None:
+        invalidate(master)
+
+
+def stop(drain=True, **kwargs):
+    """Remove the node from cluster and uninstall the kubernetes services
+
+    Initially, all resources will be drained from the kubernetes node and
+    afterwards the node will be removed from the cluster.
+
+    The `reset_kubeadm` method will only run in case an already existing
+    resource has been used in order to setup the kubernetes cluster. As
+    we do not destroy already existing resources, which have been used to
+    setup kubernetes, we opt for uninstall the corresponding kubernetes
+    services and undoing all configuration in order to bring the machines
+    to their prior state.
+
+    If `use_external_resource` is False, then this method is skipped and
+    the resources will be destroyed later on.
+
+    The draining step is skipped, if the `drain` parameter is set to False,
+    e.g. when the node has already been drained by the scale down workflow.
+
+    Finally, when the kubernetes master is stopped, the additional machines
+    of a highly available control plane and those of the warm pool are
+    destroyed, and the scripts registered for the cluster are removed from
+    mist.io.
+
+    """
+    with track_api_usage():
+        if drain:
+            drain_and_remove()
+        if ctx.instance.runtime_properties.get('use_external_resource'):
+            reset_kubeadm()
+        if ctx.node.properties['master']:
+            destroy_control_plane()
+            empty_pool()
+            remove_scripts()
@@ -0,0 +1,44 @@
+import time
+
+from cloudify import ctx
+
+from k8s.connection import track_api_usage
+from k8s.metadata import get_machine_ref
+from k8s.network import parse_throughput
+from k8s.scripts import run_script
+from k8s.scripts import get_master_instance
+
+
+def measure_throughput(duration=10, **kwargs):
+    """Measure the pod-to-pod throughput of the cluster's network.
+
+    This operation runs on a node of its own, which depends on the master
+    and the workers, so that it runs once the cluster is installed, as well
+    as on behalf of the `check_network_throughput` workflow. It runs iperf3
+    between pods on two nodes of the cluster by means of
+    network-throughput.sh on the master and stores the measured bandwidth in
+    the node's runtime properties, along with the CNI in use and the time of
+    the measurement. A failed measurement, e.g. if the cluster has less than
+    two nodes, is only logged.
+
+    """
+    with track_api_usage():
+        cloud_id, machine_id = get_machine_ref(get_master_instance())
+        duration = duration or 10
+        event = run_script(cloud_id=cloud_id, machine_id=machine_id,
+                           name='network-throughput.sh',
+                           script_params="'%d'" % duration,
+                           timeout=duration + 600)
+        throughput = parse_throughput((event or {}).get('stdout', ''))
+        if throughput is None:
+            ctx.logger.warn('Failed to measure the network throughput')
+        else:
+            throughput.update({
+                'cni': ctx.node.properties.get('cni') or 'flannel',
+                'time': int(time.time()),
+            })
+            ctx.logger.info('Pod-to-pod throughput between %s and %s: %s '
+                            'Mbit/s', throughput['server_node'],
+                            throughput['client_node'], throughput['mbps'])
+            ctx.instance.runtime_properties['network_throughput'] = \
+                throughput
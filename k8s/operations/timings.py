@@ -0,0 +1,62 @@
+import json
+
+from cloudify import ctx
+
+from k8s.events import JobError
+from k8s.events import wait_for_event
+from k8s.output import explain_failure
+from k8s.timings import summarize
+from k8s.timings import parse_timings
+from k8s.timings import to_prometheus
+
+
+def collect_timings(node_timings=None, prometheus_path='', **kwargs):
+    """Summarize the bootstrap timings of all nodes of the cluster.
+
+    This operation runs on the kubernetes master and is passed the bootstrap
+    timings of each node, as collected by the corresponding workflow. The
+    summary is stored in the master's runtime properties. Optionally, the
+    timings of all nodes are also dumped in the Prometheus text format.
+
+    """
+    node_timings = node_timings or {}
+
+    # The master's configure operation does not wait for its installation to
+    # finish. Get the master's own timings from its installation's result.
+    # A failed installation is reported along with the summary, since the
+    # rest of the nodes' timings are still worth summarizing.
+    install_event = ctx.instance.runtime_properties.get('install_event')
+    failures = {}
+    if install_event and 'bootstrap_timings' not in \
+            ctx.instance.runtime_properties:
+        try:
+            event = wait_for_event(**install_event)
+        except JobError as exc:
+            event = exc.event
+            failures[ctx.instance.runtime_properties['machine_name']] = \
+                explain_failure((event.get('stdout') or '').splitlines(),
+                                event['error'])
+        except Exception as exc:
+            event = None
+            failures[ctx.instance.runtime_properties['machine_name']] = \
+                'failed: %s' % exc
+        if event is not None:
+            ctx.instance.runtime_properties['bootstrap_timings'] = \
+                parse_timings(event.get('stdout') or event.get('timings'))
+    if ctx.instance.runtime_properties.get('bootstrap_timings'):
+        node_timings[ctx.instance.runtime_properties['machine_name']] = \
+            ctx.instance.runtime_properties['bootstrap_timings']
+
+    summary = summarize(node_timings)
+    if failures:
+        ctx.logger.warn('Kubernetes installation on %s',
+                        '; '.join('%s %s' % (node, failure)
+                                  for node, failure in failures.items()))
+        summary['failures'] = failures
+    ctx.logger.info('Bootstrap timings summary: %s', json.dumps(summary))
+    ctx.instance.runtime_properties['bootstrap_summary'] = summary
+    if prometheus_path:
+        with open(prometheus_path, 'w') as fobj:
+            fobj.write(to_prometheus(node_timings))
+        ctx.logger.info('Bootstrap timings written to %s',
+                        prometheus_path)
@@ -0,0 +1,40 @@
+from cloudify import ctx
+
+from plugin import constants
+
+from k8s.connection import track_api_usage
+from k8s.metadata import get_provider
+from k8s.pool import refill_pool
+from k8s.pool import release_to_pool
+from k8s.pool import take_from_pool
+
+
+def warm_pool(action, spec=None, count=0, size=0, machines=None,
+              **kwargs):
+    """Manage the warm pool of worker machines.
+
+    This operation runs on the kubernetes master on behalf of the scale up
+    and `refill_warm_pool` workflows. The `take` action removes up to `count`
+    ready machines from the pool, which are stored in the master's runtime
+    properties, so that the workflow may assign them to new node instances.
+    The `release` action puts back the `machines` a failed scale up has not
+    used, destroying any that may not be put back. The `refill` action
+    provisions and prepares machines, until the pool reaches `size`.
+
+    Clouds, which use cloud-init, are not supported, since the machines have
+    to be prepared over SSH.
+
+    """
+    with track_api_usage():
+        if action == 'take':
+            ctx.instance.runtime_properties['warm_pool_taken'] = \
+                take_from_pool(spec, count)
+        elif action == 'refill':
+            provider = get_provider(spec['cloud_id'])
+            if provider in constants.CLOUD_INIT_PROVIDERS:
+                ctx.logger.warn('Warm pool is not supported on %s, which '
+                                'uses cloud-init', provider)
+            else:
+                refill_pool(spec, size)
+        elif action == 'release':
+            release_to_pool(machines or [])
@@ -0,0 +1,65 @@
+import re
+import logging
+
+from cloudify import ctx
+
+
+# Known fatal errors in the output of the cluster's scripts, which are not
+# worth waiting for the script to time out or fail on its own.
+FATAL_PATTERNS = (
+    ('join token rejected', re.compile(
+        r'token id "\S+" is invalid|'
+        r"couldn't validate the identity of the API Server|"
+        r'cluster-info ConfigMap.*Unauthorized')),
+    ('apt lock held', re.compile(r'Could not get lock /var/lib/(dpkg|apt)')),
+    ('apt repository unavailable', re.compile(
+        r'^E: (Failed to fetch|Unable to locate package|The repository)')),
+    ('image pull failed', re.compile(
+        r'failed to pull image|ErrImagePull|ImagePullBackOff', re.I)),
+)
+
+
+def find_fatal_error(lines):
+    """Return the first known fatal error in `lines`, if any.
+
+    Returns a tuple of the error's description and the line it was found in,
+    or None.
+
+    """
+    for line in lines:
+        for description, pattern in FATAL_PATTERNS:
+            if pattern.search(line):
+                return description, line.strip()
+    return None
+
+
+def get_phase(lines, phase=None):
+    """Return the bootstrap phase reached by deploy-node.sh, as of `lines`.
+
+    That is the phase deploy-node.sh reports as failed on exit, if any, or
+    the last one it started. Defaults to `phase`.
+
+    """
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2 and parts[0] in ('bootstrap-phase',
+                                            'bootstrap-failed'):
+            phase = parts[1]
+    return phase
+
+
+def explain_failure(lines, error):
+    """Describe why a script failed, based on its output."""
+    fatal = find_fatal_error(lines)
+    if fatal:
+        error = '%s: %s' % fatal
+    phase = get_phase(lines)
+    if phase:
+        return 'failed in phase %s: %s' % (phase, error)
+    return 'failed: %s' % error
+
+
+def forward_output(lines, name, level=logging.INFO):
+    """Forward the output of a script to the log, prefixed by `name`."""
+    for line in lines:
+        ctx.logger.log(level, '[%s] %s', name, line)
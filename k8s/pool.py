@@ -0,0 +1,153 @@
+import time
+
+from cloudify import ctx
+
+from k8s.connection import get_connection
+from k8s.events import wait_for_event
+from k8s.machines import create_machines
+from k8s.machines import destroy_machine
+from k8s.scripts import get_script_id
+from k8s.scripts import register_scripts
+
+
+def get_pool(instance=None):
+    """Return the warm pool, as stored in the master's runtime properties.
+
+    The warm pool consists of worker machines, which have been provisioned
+    and have kubernetes installed, but have not joined the cluster. Each
+    machine is in one of the following states: "provisioning", while being
+    created and prepared, or "ready", once it may join the cluster.
+
+    """
+    instance = instance or ctx.instance
+    return instance.runtime_properties.get('warm_pool') or {
+        'size': 0, 'spec': None, 'machines': [],
+    }
+
+
+def _store_pool(pool):
+    ctx.instance.runtime_properties['warm_pool'] = pool
+    ctx.instance.update()
+
+
+def take_from_pool(spec, count):
+    """Take up to `count` ready machines of the given spec from the pool.
+
+    Returns the machines taken, which are removed from the pool.
+
+    """
+    pool = get_pool()
+    if pool['spec'] != spec:
+        return []
+    taken = [machine for machine in pool['machines']
+             if machine['state'] == 'ready'][:count]
+    pool['machines'] = [machine for machine in pool['machines']
+                        if machine not in taken]
+    _store_pool(pool)
+    ctx.logger.info('Took %d machine(s) from the warm pool', len(taken))
+    return taken
+
+
+def release_to_pool(machines):
+    """Put back the `machines`, which a failed scale up has not used.
+
+    Ready machines, which were taken from the pool, are put back, as long as
+    the pool has room for them. All other machines, e.g. the ones created in
+    bulk, which are not prepared, are destroyed.
+
+    """
+    pool = get_pool()
+    released = 0
+    for machine in machines:
+        if machine.get('state') == 'ready' and \
+                len(pool['machines']) < pool['size']:
+            pool['machines'].append(machine)
+            released += 1
+        else:
+            destroy_machine(machine['cloud_id'], machine['machine_id'])
+    _store_pool(pool)
+    ctx.logger.info('Put %d machine(s) back into the warm pool and destroyed '
+                    '%d', released, len(machines) - released)
+
+
+def empty_pool():
+    """Destroy all machines of the pool."""
+    pool = get_pool()
+    for machine in pool['machines']:
+        destroy_machine(machine['cloud_id'], machine['machine_id'])
+    pool['machines'] = []
+    _store_pool(pool)
+
+
+def refill_pool(spec, size, timeout=1800):
+    """Provision machines, so that the pool has `size` ready machines.
+
+    The missing machines are created in bulk. Kubernetes is installed on all
+    of them at once by running deploy-node.sh with the "pool" role, which
+    stops right before joining the cluster. Machines, which fail to be
+    prepared, are destroyed.
+
+    If the spec of the pool has changed, its current machines are destroyed.
+    So are any extra machines, if the pool has shrunk.
+
+    """
+    pool = get_pool()
+    if pool['spec'] != spec:
+        empty_pool()
+        pool = get_pool()
+
+    # Drop the machines left behind by an interrupted refill, if any.
+    for machine in pool['machines']:
+        if machine['state'] != 'ready':
+            destroy_machine(machine['cloud_id'], machine['machine_id'])
+    pool['machines'] = [machine for machine in pool['machines']
+                        if machine['state'] == 'ready']
+    pool.update({'size': size, 'spec': spec})
+    for machine in pool['machines'][size:]:
+        destroy_machine(machine['cloud_id'], machine['machine_id'])
+    pool['machines'] = pool['machines'][:size]
+    missing = size - len(pool['machines'])
+    _store_pool(pool)
+    if missing <= 0:
+        return
+
+    ctx.logger.info('Adding %d machine(s) to the warm pool', missing)
+    machines = create_machines(spec, missing)
+    for machine in machines:
+        machine['state'] = 'provisioning'
+    pool['machines'].extend(machines)
+    _store_pool(pool)
+
+    # Start installing kubernetes on all machines, then wait for all of them.
+    if not get_script_id('deploy-node.sh'):
+        register_scripts()
+    conn = get_connection()
+    jobs = {}
+    for machine in machines:
+        jobs[machine['machine_id']] = conn.client.run_script(
+            script_id=get_script_id('deploy-node.sh'), su=True,
+            machine_id=machine['machine_id'], cloud_id=machine['cloud_id'],
+            script_params="-n '%s' -r 'pool'" % machine['machine_name'],
+        )['job_id']
+    deadline = time.time() + timeout
+    for machine in machines:
+        try:
+            wait_for_event(
+                job_id=jobs[machine['machine_id']],
+                job_kwargs={
+                    'action': 'script_finished',
+                    'external_id': machine['machine_id'],
+                },
+                timeout=max(deadline - time.time(), 1),
+            )
+        except Exception as exc:
+            ctx.logger.warn('Failed to prepare machine %s: %s',
+                            machine['machine_name'], exc)
+            destroy_machine(machine['cloud_id'], machine['machine_id'])
+            pool['machines'].remove(machine)
+        else:
+            machine['state'] = 'ready'
+    _store_pool(pool)
+    ctx.logger.info('Warm pool has %d ready machine(s)', len(
+        [machine for machine in pool['machines']
+         if machine['state'] == 'ready']))
@@ -0,0 +1,216 @@
+import threading
+
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from k8s.connection import get_connection
+from k8s.metadata import get_cloud
+from k8s.metadata import list_keys
+from k8s.metadata import list_resources
+
+
+# The parameters of a machine's spec, which refer to resources of its cloud,
+# along with the kind of resources each one refers to.
+SPEC_RESOURCES = (
+    ('size_id', 'sizes'),
+    ('image_id', 'images'),
+    ('location_id', 'locations'),
+    ('networks', 'networks'),
+)
+
+
+def as_list(values):
+    """Return the value of a spec's parameter as a list, even if scalar."""
+    values = values or []
+    return values if isinstance(values, list) else [values]
+
+
+def collect_references(specs):
+    """Return the IDs referred to by machine `specs`, without duplicates.
+
+    Returns a dict of the IDs of clouds to a dict of the kinds of resources
+    referred to in each cloud to their IDs, the IDs of the keys, and the
+    existing machines, as (cloud_id, machine_id) pairs.
+
+    """
+    clouds, keys, machines = {}, set(), set()
+    for spec in specs:
+        cloud = clouds.setdefault(spec.get('cloud_id') or '', {})
+        if spec.get('machine_id'):
+            machines.add((spec.get('cloud_id') or '', spec['machine_id']))
+            continue
+        for parameter, kind in SPEC_RESOURCES:
+            cloud.setdefault(kind, set()).update(as_list(spec.get(parameter)))
+        if spec.get('key_id'):
+            keys.add(spec['key_id'])
+    return clouds, keys, machines
+
+
+def get_ids(resources):
+    """Return the IDs of the resources listed by mist.io.
+
+    Resources are either dicts or objects. Networks may also be grouped in
+    a dict of lists.
+
+    """
+    if isinstance(resources, dict):
+        resources = [resource for group in resources.values()
+                     for resource in (group if isinstance(group, list)
+                                      else [group])]
+    ids = set()
+    for resource in resources or []:
+        for attr in ('id', 'network_id', 'external_id'):
+            if isinstance(resource, dict):
+                value = resource.get(attr)
+            else:
+                value = getattr(resource, attr, None)
+            if value:
+                ids.add(value)
+    return ids
+
+
+def _lookup(results, key, func, *args):
+    try:
+        results[key] = func(*args)
+    except Exception as exc:
+        results[key] = exc
+
+
+def _run_lookups(results, lookups):
+    threads = []
+    for lookup in lookups:
+        thread = threading.Thread(target=_lookup, args=(results, ) + lookup)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+
+def find_invalid_references(specs):
+    """Look up all IDs referred to by `specs` at once.
+
+    Each cloud, the keys, and each existing machine are looked up in a thread
+    of their own. Then, each kind of resources of each cloud found is listed
+    in a thread of its own. The lookups are cached, so that each one of them,
+    including the cloud's, is made once per cloud, regardless of the number
+    of specs.
+
+    Returns a list of the errors found, if any.
+
+    """
+    clouds, keys, machines = collect_references(specs)
+    conn = get_connection()
+    results = {}
+    lookups = [(('cloud', cloud_id), get_cloud, cloud_id, conn)
+               for cloud_id in clouds]
+    lookups += [(('machine', ) + machine, conn.get_machine) + machine
+                for machine in machines]
+    if keys:
+        lookups.append((('keys', ), list_keys, conn))
+    _run_lookups(results, lookups)
+    _run_lookups(results, [
+        ((kind, cloud_id), list_resources, cloud_id, kind, conn)
+        for cloud_id in clouds for kind in clouds[cloud_id]
+        if clouds[cloud_id][kind] and
+        not isinstance(results[('cloud', cloud_id)], Exception)
+    ])
+
+    errors = []
+    for cloud_id in sorted(clouds):
+        if isinstance(results[('cloud', cloud_id)], Exception):
+            errors.append('cloud %r not found: %s' % (
+                cloud_id, results[('cloud', cloud_id)]))
+            continue
+        for kind in sorted(clouds[cloud_id]):
+            if not clouds[cloud_id][kind]:
+                continue
+            resources = results[(kind, cloud_id)]
+            if isinstance(resources, Exception):
+                ctx.logger.warn('Failed to list the %s of cloud %s, not '
+                                'checking them: %r', kind, cloud_id,
+                                resources)
+                continue
+            missing = clouds[cloud_id][kind] - get_ids(resources)
+            if missing:
+                errors.append('%s not found in cloud %s: %s' % (
+                    kind, cloud_id, ', '.join(sorted(missing))))
+    for cloud_id, machine_id in sorted(machines):
+        if isinstance(results[('machine', cloud_id, machine_id)], Exception):
+            errors.append('machine %s not found in cloud %s' % (
+                machine_id, cloud_id))
+    if keys:
+        if isinstance(results[('keys', )], Exception):
+            ctx.logger.warn('Failed to list the keys, not checking them: %r',
+                            results[('keys', )])
+        elif keys - get_ids(results[('keys', )]):
+            errors.append('keys not found: %s' % ', '.join(
+                sorted(keys - get_ids(results[('keys', )]))))
+    return errors
+
+
+def is_private(ip):
+    """Check whether `ip` is a private or shared IPv4 address."""
+    try:
+        octets = [int(octet) for octet in ip.split('.')]
+    except ValueError:
+        return False
+    return len(octets) == 4 and (
+        octets[0] == 10 or
+        (octets[0] == 172 and 16 <= octets[1] < 32) or
+        (octets[0] == 192 and octets[1] == 168) or
+        (octets[0] == 100 and 64 <= octets[1] < 128)
+    )
+
+
+def find_unreachable_master(master_ip, master_spec, specs):
+    """Check whether workers of `specs` may reach the master at `master_ip`.
+
+    The master's IP is private, whenever the master has one. In that case,
+    workers have to be in the same cloud as the master and, if both specify
+    networks, in at least one of the master's networks.
+
+    Returns a list of the errors found, if any.
+
+    """
+    if not master_ip or not is_private(master_ip):
+        return []
+    errors = []
+    master_networks = as_list(master_spec.get('networks'))
+    for spec in specs:
+        networks = as_list(spec.get('networks'))
+        if spec.get('cloud_id') != master_spec.get('cloud_id'):
+            error = ('workers of cloud %s may not reach the master at its '
+                     'private IP %s in cloud %s' % (
+                         spec.get('cloud_id'), master_ip,
+                         master_spec.get('cloud_id')))
+        elif networks and master_networks and \
+                not set(networks) & set(master_networks):
+            error = ('workers of networks %s may not reach the master at its '
+                     'private IP %s in networks %s' % (
+                         ', '.join(networks), master_ip,
+                         ', '.join(master_networks)))
+        else:
+            continue
+        if error not in errors:
+            errors.append(error)
+    return errors
+
+
+def check_specs(specs, master_ip=None, master_spec=None):
+    """Validate machine `specs` before provisioning any machine.
+
+    All IDs referred to by the specs are looked up at once. If the master's
+    IP is given, it is checked that the workers of the specs may reach it.
+    Raises a NonRecoverableError, which lists all errors found, if any.
+
+    """
+    errors = find_invalid_references(specs)
+    if master_ip:
+        errors += find_unreachable_master(master_ip, master_spec or {},
+                                          specs)
+    if errors:
+        raise NonRecoverableError('Preflight check failed: %s' %
+                                  '; '.join(errors))
+    ctx.logger.info('Preflight check of %d machine spec(s) passed',
+                    len(specs))
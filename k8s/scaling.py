@@ -0,0 +1,542 @@
+import json
+
+from cloudify.workflows import ctx as workctx
+
+from k8s.storage import clone_node_instances
+from k8s.storage import add_workflow_node_instances
+
+
+def get_operation_kwargs(worker_data):
+    """Return the kwargs of a new worker's create operation."""
+    if worker_data.get('machine_id'):
+        return {
+            'cloud_id': worker_data.get('cloud_id'),
+            'machine_id': worker_data['machine_id'],
+        }
+    return {
+        'key_id': worker_data.get('key_id', ''),
+        'size_id': worker_data.get('size_id', ''),
+        'image_id': worker_data.get('image_id', ''),
+        'cloud_id': worker_data.get('cloud_id', ''),
+        'machine_id': '',
+        'networks': worker_data.get('networks', []),
+        'location_id': worker_data.get('location_id', ''),
+    }
+
+
+def get_master():
+    """Return the kubernetes master's node instance."""
+    return [instance for instance in
+            workctx.get_node('kube_master').instances][0]
+
+
+def get_warm_pool_task(master):
+    """Return the task, which refills the warm pool, if any.
+
+    The warm pool is refilled with machines of the workers' spec, as defined
+    in the inputs section, up to the master's `warm_pool_size`.
+
+    """
+    size = workctx.get_node('kube_master').properties.get('warm_pool_size')
+    storage = workctx.internal.handler.storage
+    pool = storage.get_node_instance(
+        master.id).runtime_properties.get('warm_pool') or {}
+    if not size and not pool.get('machines'):
+        return None
+    spec = get_operation_kwargs(dict(
+        workctx.get_node('kube_worker').properties['parameters'],
+        machine_id=''))
+    return master.execute_operation(
+        operation='kubernetes.warm_pool',
+        kwargs={'action': 'refill', 'spec': spec, 'size': size or 0},
+    )
+
+
+def run_preflight(operation_kwargs_list):
+    """Validate the specs of the new workers before provisioning them.
+
+    The specs are validated by the master's `kubernetes.preflight` operation,
+    which runs in a graph of its own, so that the workflow fails before any
+    node instance is added or any machine is created.
+
+    """
+    specs = []
+    for kwargs in operation_kwargs_list:
+        if kwargs not in specs:
+            specs.append(kwargs)
+    graph = workctx.graph_mode()
+    graph.add_task(
+        get_master().execute_operation(
+            operation='kubernetes.preflight',
+            kwargs={'specs': specs},
+        )
+    )
+    graph.execute()
+
+
+def take_from_warm_pool(operation_kwargs_list):
+    """Take ready machines from the warm pool for the new node instances.
+
+    Only new node instances of the same spec as the pool's machines may take
+    machines from the pool. The machines are taken by the master's
+    `kubernetes.warm_pool` operation, which runs in a graph of its own.
+
+    Returns a list, parallel to `operation_kwargs_list`, of the machine to be
+    adopted by each new node instance, or None, if the pool has run out of
+    machines.
+
+    """
+    machines = [None] * len(operation_kwargs_list)
+    master = get_master()
+    storage = workctx.internal.handler.storage
+    pool = storage.get_node_instance(
+        master.id).runtime_properties.get('warm_pool') or {}
+    indices = [i for i, kwargs in enumerate(operation_kwargs_list)
+               if pool.get('spec') and kwargs == pool['spec']]
+    ready = [machine for machine in pool.get('machines', [])
+             if machine['state'] == 'ready']
+    if not indices or not ready:
+        return machines
+
+    graph = workctx.graph_mode()
+    graph.add_task(
+        master.execute_operation(
+            operation='kubernetes.warm_pool',
+            kwargs={
+                'action': 'take',
+                'spec': pool['spec'],
+                'count': min(len(indices), len(ready)),
+            },
+        )
+    )
+    graph.execute()
+
+    taken = storage.get_node_instance(
+        master.id).runtime_properties.get('warm_pool_taken', [])
+    for i, machine in zip(indices, taken):
+        machines[i] = machine
+    return machines
+
+
+def create_machines_in_bulk(operation_kwargs_list):
+    """Create the machines of identical worker specs in bulk.
+
+    Worker specs, which are identical, are grouped together and the machines
+    of each group are created with a single request by the master's
+    `kubernetes.create_machines` operation, which runs in a graph of its own.
+
+    Returns a list, parallel to `operation_kwargs_list`, of the machine to be
+    adopted by each new node instance, or None, if the node instance has to
+    create its own machine.
+
+    """
+    groups = {}
+    for i, kwargs in enumerate(operation_kwargs_list):
+        if not kwargs.get('machine_id') and not kwargs.get('machine'):
+            groups.setdefault(json.dumps(kwargs, sort_keys=True), []).append(i)
+    groups = [indices for indices in groups.values() if len(indices) > 1]
+    machines = [None] * len(operation_kwargs_list)
+    if not groups:
+        return machines
+
+    master = get_master()
+    graph = workctx.graph_mode()
+    graph.add_task(
+        master.execute_operation(
+            operation='kubernetes.create_machines',
+            kwargs={
+                'groups': dict(
+                    (str(group), {
+                        'spec': operation_kwargs_list[indices[0]],
+                        'quantity': len(indices),
+                    }) for group, indices in enumerate(groups)
+                ),
+            },
+        )
+    )
+    graph.execute()
+
+    storage = workctx.internal.handler.storage
+    bulk_machines = storage.get_node_instance(
+        master.id).runtime_properties.get('bulk_machines', {})
+    for group, indices in enumerate(groups):
+        for i, machine in zip(indices, bulk_machines.get(str(group), [])):
+            machines[i] = machine
+    return machines
+
+
+def graph_scale_up_workflow(delta, worker_data_list, max_parallel=0):
+    """Scale up the kubernetes cluster.
+
+    This method implements the scale up workflow using the Graph Framework.
+
+    Scaling is based on the `delta` input, which must be greater than 0 for
+    the workflow to run.
+
+    At most `max_parallel` nodes are provisioned and configured at the same
+    time. If `max_parallel` is 0, all nodes are added in parallel. NOTE that
+    machines of identical specs are created in bulk, before any node is
+    configured, regardless of `max_parallel`.
+
+    The specs of the new workers are validated before anything else, so that
+    the workflow fails without provisioning any machine, if any is invalid.
+
+    Machines are taken from the warm pool first, if any. The pool is not
+    refilled by this workflow, so that it returns as soon as the new nodes
+    have joined the cluster. It is refilled by the `refill_warm_pool`
+    workflow, which runs as an execution of its own. If the workflow fails,
+    the machines, which no new node instance has adopted, are released.
+
+    """
+    # Prepare the operations' kwargs and validate them up front.
+    operation_kwargs_list = [get_operation_kwargs(worker_data)
+                             for worker_data in worker_data_list]
+    run_preflight(operation_kwargs_list)
+
+    # Set the workflow to be in graph mode.
+    graph = workctx.graph_mode()
+
+    # Take machines from the warm pool, which only have to join the cluster.
+    # Create the rest of the identical machines in bulk, instead of one by
+    # one. Each new node instance's create operation adopts its machine.
+    machines, instances = [], []
+    try:
+        for get_machines in (take_from_warm_pool, create_machines_in_bulk):
+            for kwargs, machine in zip(operation_kwargs_list,
+                                       get_machines(operation_kwargs_list)):
+                if machine:
+                    kwargs['machine'] = machine
+                    machines.append(machine)
+
+        # Get an existing worker to use as a template for the new node
+        # instances.
+        node = workctx.get_node('kube_worker')
+        template = [instance for instance in node.instances][0]
+
+        # Clone all `delta` node instances in a single step, once their
+        # machines have been obtained, so that a failure to obtain them leaves
+        # no stray node instances behind. Since each node instance has its own
+        # runtime properties, the sequences below may safely operate on them
+        # at the same time.
+        instances = add_workflow_node_instances(
+            workctx, node.id,
+            clone_node_instances(workctx.internal.handler.storage,
+                                 template.id, count=delta)
+        )
+
+        # Setup events to denote the beginning and end of tasks. The events
+        # will be also used to control dependencies amongst tasks.
+        start_events, done_events = {}, {}
+
+        for i, instance in enumerate(instances):
+            start_events[i] = instance.send_event('Adding node to cluster')
+            done_events[i] = instance.send_event('Node added to cluster')
+
+        # Create `delta` number of TaskSequence objects. That way we are able
+        # to control the sequence of events and the dependencies amongst
+        # tasks. One graph sequence corresponds to a new node added to the
+        # cluster.
+        for i, instance in enumerate(instances):
+            sequence = graph.sequence()
+            sequence.add(
+                start_events[i],
+                instance.execute_operation(
+                    operation='cloudify.interfaces.lifecycle.create',
+                    kwargs=operation_kwargs_list[i],
+                ),
+                instance.execute_operation(
+                    operation='cloudify.interfaces.lifecycle.configure',
+                ),
+                instance.set_state('started'),
+                done_events[i],
+            )
+
+        # Bound the number of sequences running at the same time by making
+        # each sequence wait for the one `max_parallel` positions before it.
+        # That way the sequences are split into `max_parallel` lanes, which
+        # are executed in parallel, while the sequences in each lane run one
+        # after the other.
+        if max_parallel > 0:
+            for i in range(max_parallel, delta):
+                graph.add_dependency(start_events[i],
+                                     done_events[i - max_parallel])
+
+        # Start execution.
+        return graph.execute()
+    except Exception:
+        release_machines(machines, instances)
+        raise
+
+
+def release_machines(machines, instances):
+    """Release the `machines`, which none of `instances` has adopted.
+
+    Machines taken from the warm pool are put back, while machines created
+    in bulk are destroyed, by the master's `kubernetes.warm_pool` operation,
+    which runs in a graph of its own. Errors are logged, so that the error,
+    which caused the machines to be released, is the one reported.
+
+    """
+    storage = workctx.internal.handler.storage
+    adopted = set(storage.get_node_instance(
+        instance.id).runtime_properties.get('machine_id')
+        for instance in instances)
+    machines = [machine for machine in machines
+                if machine['machine_id'] not in adopted]
+    if not machines:
+        return
+    workctx.logger.warn('Releasing %d machine(s), which no node has adopted',
+                        len(machines))
+    try:
+        graph = workctx.graph_mode()
+        graph.add_task(
+            get_master().execute_operation(
+                operation='kubernetes.warm_pool',
+                kwargs={'action': 'release', 'machines': machines},
+            )
+        )
+        graph.execute()
+    except Exception as exc:
+        workctx.logger.error('Failed to release machine(s) %s: %r', ', '.join(
+            machine['machine_id'] for machine in machines), exc)
+
+
+def get_raw_instances(instances):
+    """Return the current raw node instances of `instances` from storage.
+
+    The workflow context takes a snapshot of all node instances when the
+    workflow starts. The snapshot is stale, once node instances are added or
+    removed by the workflow itself, e.g. by consecutive rounds of autoscaling.
+
+    Returns a dict of node instance IDs to raw node instances.
+
+    """
+    storage = workctx.internal.handler.storage
+    return dict((instance.id, storage.get_node_instance(instance.id))
+                for instance in instances)
+
+
+def rank_workers(instances, raw_instances):
+    """Rank worker node instances by the cost of draining them.
+
+    The load of all workers is fetched at once by the master's
+    `kubernetes.node_load` operation, which runs in a graph of its own and
+    stores the ranking in the master's runtime properties.
+
+    Returns the node instances, cheapest first. Node instances, which have
+    not been provisioned, come before all others.
+
+    """
+    unnamed, by_hostname = [], {}
+    for instance in instances:
+        hostname = raw_instances[instance.id].runtime_properties.get(
+            'machine_name', '').lower()
+        if hostname:
+            by_hostname[hostname] = instance
+        else:
+            unnamed.append(instance)
+    if not by_hostname:
+        return unnamed
+
+    master = get_master()
+    graph = workctx.graph_mode()
+    graph.add_task(
+        master.execute_operation(
+            operation='kubernetes.node_load',
+            kwargs={'hostnames': sorted(by_hostname)},
+        )
+    )
+    graph.execute()
+
+    storage = workctx.internal.handler.storage
+    ranking = storage.get_node_instance(
+        master.id).runtime_properties.get('drain_ranking', [])
+    for entry in ranking:
+        workctx.logger.info('Node %s: drain cost %s', entry['hostname'],
+                            entry['cost'])
+    return unnamed + [by_hostname[entry['hostname']] for entry in ranking
+                      if entry['hostname'] in by_hostname]
+
+
+def graph_scale_down_workflow(delta, batched=True):
+    """Scale down the kubernetes cluster.
+
+    A maximum number of `delta` nodes will be removed from the cluster. The
+    nodes, which are the cheapest to drain, in terms of pods, pods blocked by
+    pod disruption budgets, pods with local storage and requested resources,
+    are removed first. The ranking is stored in the master's runtime
+    properties and is included in the blueprint's outputs.
+
+    If `batched` is True, all nodes are drained and removed from the cluster
+    at once by a single script run on the kubernetes master. Afterwards, the
+    nodes are stopped and deleted in parallel.
+
+    """
+    # Get a maximum of `delta` number of workers, cheapest to drain first.
+    node = workctx.get_node('kube_worker')
+    raw_instances = get_raw_instances(node.instances)
+    instances = rank_workers([
+        instance for instance in node.instances
+        if raw_instances[instance.id].state != 'deleted'
+    ], raw_instances)[:delta]
+    return graph_remove_workers_workflow(instances, raw_instances, batched)
+
+
+def graph_remove_workers_workflow(instances, raw_instances, batched=True,
+                                  force=False):
+    """Remove the given worker node instances from the cluster.
+
+    If `batched` is True, all nodes are drained and removed from the cluster
+    at once by a single script run on the kubernetes master. Afterwards, the
+    nodes are stopped and deleted in parallel.
+
+    If `force` is True, the nodes are removed from the cluster without being
+    drained. This is meant for unreachable nodes and implies `batched`.
+
+    """
+    batched = batched or force
+
+    # Set the workflow to be in graph mode.
+    graph = workctx.graph_mode()
+
+    # Setup events to denote the beginning and end of tasks.
+    start_events, done_events = {}, {}
+
+    for i, instance in enumerate(instances):
+        start_events[i] = instance.send_event('Removing node cluster')
+        done_events[i] = instance.send_event('Node removed from cluster')
+
+    # Drain all nodes at once. Each node's sequence depends on the drain task,
+    # so that nodes are stopped only after they have been removed from the
+    # cluster.
+    if batched:
+        master = get_master()
+        hostnames = [
+            raw_instances[instance.id].runtime_properties.get(
+                'machine_name', '')
+            for instance in instances
+        ]
+        drained_event = master.send_event('Nodes removed from cluster')
+        sequence = graph.sequence()
+        sequence.add(
+            master.send_event('Draining %d node(s)' % len(instances)),
+            master.execute_operation(
+                operation='kubernetes.drain_nodes',
+                kwargs={'hostnames': hostnames, 'force': force},
+            ),
+            drained_event,
+        )
+        for i in range(len(instances)):
+            graph.add_dependency(start_events[i], drained_event)
+
+    # Create `delta` number of TaskSequence objects. That way we are able to
+    # control the sequence of events and the dependencies amongst tasks. One
+    # graph sequence corresponds to node being removed from the cluster.
+    for i, instance in enumerate(instances):
+        sequence = graph.sequence()
+        sequence.add(
+            start_events[i],
+            instance.execute_operation(
+                operation='cloudify.interfaces.lifecycle.stop',
+                kwargs={'drain': not batched},
+            ),
+            instance.execute_operation(
+                operation='cloudify.interfaces.lifecycle.delete',
+            ),
+            instance.set_state('deleted'),
+            done_events[i],
+        )
+
+    # Start execution.
+    return graph.execute()
+
+
+def graph_heal_workflow(max_parallel=0):
+    """Replace the worker nodes of the cluster, which are not ready.
+
+    The nodes, which are not ready, are found with a single query by the
+    master's `kubernetes.not_ready_nodes` operation, which runs in a graph of
+    its own. They are removed from the cluster at once, without waiting for
+    them to be drained, and their machines are destroyed. Finally, identical
+    machines are provisioned in parallel and join the cluster in their place.
+
+    Workers, which use existing machines, are not replaced, since their
+    machines are not destroyed.
+
+    Returns the hostnames of the replaced nodes.
+
+    """
+    node = workctx.get_node('kube_worker')
+    raw_instances = get_raw_instances(node.instances)
+    instances = [instance for instance in node.instances
+                 if raw_instances[instance.id].state == 'started']
+
+    master = get_master()
+    graph = workctx.graph_mode()
+    graph.add_task(
+        master.execute_operation(operation='kubernetes.not_ready_nodes')
+    )
+    graph.execute()
+
+    storage = workctx.internal.handler.storage
+    hostnames = storage.get_node_instance(
+        master.id).runtime_properties.get('not_ready_nodes', [])
+    failed = []
+    for instance in instances:
+        runtime_properties = raw_instances[instance.id].runtime_properties
+        if runtime_properties.get('machine_name', '').lower() not in hostnames:
+            continue
+        if runtime_properties.get('use_external_resource'):
+            workctx.logger.warn('Not replacing node %s, which uses an '
+                                'existing machine',
+                                runtime_properties['machine_name'])
+            continue
+        failed.append(instance)
+    if not failed:
+        return []
+
+    # New workers are created based on the failed workers' specs, falling
+    # back to the workers' spec, as defined in the inputs section.
+    default_spec = dict(node.properties['parameters'])
+    default_spec.pop('machine_id', None)
+    specs = [raw_instances[instance.id].runtime_properties.get(
+        'machine_spec') or default_spec for instance in failed]
+    replaced = [raw_instances[instance.id].runtime_properties['machine_name']
+                for instance in failed]
+
+    workctx.logger.info('Replacing %d node(s): %s', len(failed),
+                        ', '.join(replaced))
+    graph_remove_workers_workflow(failed, raw_instances, force=True)
+    graph_scale_up_workflow(len(specs), specs, max_parallel)
+    return replaced
+
+
+def graph_collect_timings_workflow(prometheus_path=''):
+    """Collect the bootstrap timings of all nodes on the kubernetes master.
+
+    Reads the bootstrap timings stored in the runtime properties of each node
+    instance and executes the master's `kubernetes.collect_timings` operation
+    in order to summarize them.
+
+    """
+    storage = workctx.internal.handler.storage
+    node_timings = {}
+    for instance in storage.get_node_instances():
+        if instance.state == 'deleted':
+            continue
+        runtime_properties = instance.runtime_properties or {}
+        if runtime_properties.get('bootstrap_timings'):
+            name = runtime_properties.get('machine_name', instance.id)
+            node_timings[name] = runtime_properties['bootstrap_timings']
+
+    graph = workctx.graph_mode()
+    graph.add_task(
+        get_master().execute_operation(
+            operation='kubernetes.collect_timings',
+            kwargs={
+                'node_timings': node_timings,
+                'prometheus_path': prometheus_path,
+            },
+        )
+    )
+    return graph.execute()
@@ -0,0 +1,287 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from plugin.utils import get_stack_name
+from plugin.utils import random_string
+
+from k8s.connection import get_connection
+from k8s.events import JobError
+from k8s.events import WaitTimeout
+from k8s.events import wait_for_event
+from k8s.events import get_event_waiter
+from k8s.output import get_phase
+from k8s.output import forward_output
+from k8s.output import explain_failure
+from k8s.output import find_fatal_error
+
+
+# The scripts, which are uploaded once per cluster and shared by all nodes.
+CLUSTER_SCRIPTS = (
+    'deploy-node.sh',
+    'reset-node.sh',
+    'drain-node.sh',
+    'drain-nodes.sh',
+    'remove-nodes.sh',
+    'node-load.sh',
+    'cluster-metrics.sh',
+    'bootstrap-log.sh',
+    'network-throughput.sh',
+)
+
+# The sha256 digest of each script, by name, once read in this process.
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def get_master_instance():
+    """Return the kubernetes master's node instance."""
+    if ctx.node.properties['master']:
+        return ctx.instance
+    return ctx.instance.relationships[0]._target.instance
+
+
+def get_account_digest():
+    """Return a digest identifying the mist.io account in use."""
+    mist_config = ctx.node.properties['mist_config']
+    return hashlib.sha256(
+        '%s:%s' % (mist_config['mist_uri'], mist_config['mist_token'])
+    ).hexdigest()
+
+
+def get_script(name):
+    """Return the content of script `name` and its sha256 digest."""
+    script = ctx.get_resource(os.path.join('scripts', name))
+    digest = hashlib.sha256(script).hexdigest()
+    with _digests_lock:
+        _digests[name] = digest
+    return script, digest
+
+
+def get_script_digest(name):
+    """Return the sha256 digest of script `name`.
+
+    The digest is cached per process, since the blueprint's resources do not
+    change, so that the script is not fetched and hashed again each time its
+    registered ID is looked up.
+
+    """
+    with _digests_lock:
+        digest = _digests.get(name)
+    return digest or get_script(name)[1]
+
+
+def register_scripts(names=CLUSTER_SCRIPTS):
+    """Upload the cluster's scripts to mist.io, unless already there.
+
+    The script registry maps the content hash of each script to the ID of the
+    corresponding script in mist.io. It is stored in the kubernetes master's
+    runtime properties, along with a digest of the mist.io account the scripts
+    have been uploaded to, so that the same scripts are shared by all nodes and
+    all scale operations of the cluster, instead of being uploaded and removed
+    each time a node is configured or stopped.
+
+    This method must run in the context of the kubernetes master.
+
+    """
+    registry = ctx.instance.runtime_properties.get('script_registry', {})
+    if registry.get('account') != get_account_digest():
+        registry = {'account': get_account_digest(), 'scripts': {}}
+    conn = get_connection()
+    for name in names:
+        script, digest = get_script(name)
+        if digest in registry['scripts']:
+            continue
+        ctx.logger.info('Uploading script %s', name)
+        script = conn.client.add_script(
+            name='%s_%s_%s' % (get_stack_name(), name[:-3].replace('-', '_'),
+                               digest[:8]),
+            script=script, location_type='inline', exec_type='executable'
+        )
+        registry['scripts'][digest] = script['id']
+    ctx.instance.runtime_properties['script_registry'] = registry
+
+
+def get_script_id(name):
+    """Return the ID of the registered script `name`, if any.
+
+    The registry is only consulted, if the scripts have been uploaded to the
+    same mist.io account and the registered content is still up-to-date.
+
+    """
+    registry = get_master_instance().runtime_properties.get(
+        'script_registry', {})
+    if registry.get('account') != get_account_digest():
+        return None
+    return registry['scripts'].get(get_script_digest(name))
+
+
+def remove_scripts():
+    """Remove all registered scripts from mist.io.
+
+    This is meant to be called when the kubernetes master is stopped, as part
+    of the uninstall workflow. If an error is raised, it's logged and the
+    workflow execution is carried on.
+
+    """
+    registry = ctx.instance.runtime_properties.pop('script_registry', {})
+    conn = get_connection()
+    for script_id in registry.get('scripts', {}).values():
+        try:
+            conn.client.remove_script(script_id)
+        except Exception as exc:
+            ctx.logger.warn('Failed to remove script %s: %r', script_id, exc)
+
+
+def run_script(cloud_id, machine_id, name, script_params='', timeout=180):
+    """Run script `name` on a machine and wait for it to exit.
+
+    The registered script is used, if available. Otherwise, the script is
+    uploaded, executed, and, finally, removed.
+
+    The script's output is forwarded to the log. If the script fails, the
+    known fatal error found in its output, if any, is logged.
+
+    Returns the `script_finished` log entry of the corresponding job, or None
+    if the script did not finish successfully.
+
+    """
+    conn = get_connection()
+
+    # Upload script, if not already registered.
+    script_id = get_script_id(name)
+    if not script_id:
+        script = conn.client.add_script(
+            name='%s_%s' % (name[:-3].replace('-', '_'),
+                            random_string(length=4)),
+            script=get_script(name)[0],
+            location_type='inline', exec_type='executable'
+        )
+
+    # Run the script.
+    job = conn.client.run_script(script_id=script_id or script['id'],
+                                 machine_id=machine_id, cloud_id=cloud_id,
+                                 script_params=script_params, su=True)
+
+    # Wait for the script to exit. The script should exit fairly quickly,
+    # thus we only wait for a couple of minutes for the corresponding log
+    # entry.
+    event = None
+    try:
+        event = wait_for_event(
+            job_id=job['job_id'],
+            job_kwargs={
+                'action': 'script_finished',
+                'external_id': machine_id,
+            },
+            timeout=timeout
+        )
+    except JobError as exc:
+        output = (exc.event.get('stdout') or '').splitlines()
+        forward_output(output, name)
+        ctx.logger.warn('Script %s %s', name,
+                        explain_failure(output, exc.event['error']))
+    except Exception as exc:
+        ctx.logger.warn('Script %s finished with errors: %s', name, exc)
+    else:
+        forward_output((event.get('stdout') or '').splitlines(), name,
+                       logging.DEBUG)
+        ctx.logger.info('Script %s finished successfully', name)
+
+    # Remove the script, if uploaded just for this run.
+    if not script_id:
+        try:
+            conn.client.remove_script(script['id'])
+        except Exception as exc:
+            ctx.logger.warn('Failed to remove script %s: %r', name, exc)
+
+    return event
+
+
+def get_bootstrap_log(cloud_id, machine_id, script_params):
+    """Run bootstrap-log.sh on a machine and return its output's lines."""
+    mist_config = ctx.node.properties['mist_config']
+    waiter = get_event_waiter(mist_config['mist_uri'],
+                              mist_config['mist_token'])
+    try:
+        job = get_connection().client.run_script(
+            script_id=get_script_id('bootstrap-log.sh'), su=True,
+            machine_id=machine_id, cloud_id=cloud_id,
+            script_params=script_params,
+        )
+        event = waiter.wait(job['job_id'], {
+            'action': 'script_finished',
+            'external_id': machine_id,
+        }, timeout=120)
+    except Exception as exc:
+        ctx.logger.debug('Failed to get the bootstrap log of %s: %r',
+                         machine_id, exc)
+        return []
+    return (event.get('stdout') or '').splitlines()
+
+
+def follow_bootstrap(cloud_id, machine_id, job_id, job_kwargs, timeout=1800,
+                     interval=120, max_interval=600):
+    """Wait for deploy-node.sh to finish, following its output, if slow.
+
+    mist.io reports a script's output only once the script has finished. The
+    bootstrap's job is waited upon by the process-wide EventWaiter, along
+    with the jobs of all other nodes. Each time `interval` seconds go by
+    without the bootstrap finishing, the output, which deploy-node.sh also
+    writes to a log on the machine, is fetched by bootstrap-log.sh. Since
+    that runs a script on the machine, the interval doubles each time, up to
+    `max_interval`. New lines are forwarded to the operation's logger and
+    checked for known fatal errors. If one shows up, the bootstrap is aborted
+    right away. If `interval` is 0, the output is not followed.
+
+    Returns the `script_finished` log entry of the bootstrap's job. Raises a
+    NonRecoverableError, which names the phase that failed, if any.
+
+    """
+    mist_config = ctx.node.properties['mist_config']
+    waiter = get_event_waiter(mist_config['mist_uri'],
+                              mist_config['mist_token'])
+    name = ctx.instance.runtime_properties.get('machine_name', machine_id)
+    follow = interval > 0 and bool(get_script_id('bootstrap-log.sh'))
+    deadline = time.time() + timeout
+    lines = []
+    while True:
+        wait = max(deadline - time.time(), 1)
+        try:
+            event = waiter.wait(job_id, job_kwargs,
+                                timeout=min(interval, wait) if follow
+                                else wait)
+        except JobError as exc:
+            output = (exc.event.get('stdout') or '').splitlines()
+            forward_output(output[len(lines):], name)
+            raise NonRecoverableError('Kubernetes installation %s' % (
+                explain_failure(output or lines, exc.event['error'])))
+        except WaitTimeout:
+            event = None
+        if event:
+            output = (event.get('stdout') or '').splitlines()
+            forward_output(output[len(lines):], name)
+            return event
+
+        if time.time() > deadline:
+            raise NonRecoverableError(
+                'Timed out waiting for kubernetes installation in phase %s' %
+                get_phase(lines, 'unknown')
+            )
+
+        output = get_bootstrap_log(cloud_id, machine_id, "'%d'" % len(lines))
+        forward_output(output, name)
+        lines.extend(output)
+        fatal = find_fatal_error(output)
+        if fatal:
+            get_bootstrap_log(cloud_id, machine_id, "'abort'")
+            raise NonRecoverableError(
+                'Kubernetes installation aborted in phase %s: %s: %s' % (
+                    (get_phase(lines, 'unknown'), ) + fatal)
+            )
+        interval = min(interval * 2, max_interval)
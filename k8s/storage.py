@@ -0,0 +1,92 @@
+import copy
+import uuid
+import threading
+
+
+# Guards the local-storage bookkeeping, i.e. the set of node instance IDs and
+# the storage's per-instance locks, while new node instances are being added.
+_clone_lock = threading.Lock()
+
+
+def clone_node_instances(storage, instance_id, count=1):
+    """Clone a node instance `count` times in cloudify's local storage.
+
+    This mimics - in a very simple, dummy way - the functionality of
+    Deployment Modification, which is not available for local deployments,
+    since it requires an active Cloudify Manager. More on Deployment
+    Modification here:
+    https://docs.cloudify.co/4.2.0/workflows/creating-your-own-workflow/.
+
+    Each clone is an exact copy of the specified node instance, including its
+    relationships, but starts off uninitialized and without any runtime
+    properties, so that the node's lifecycle operations may be executed on it
+    from scratch.
+
+    All clones are added in a single step, while holding a lock, so that the
+    workflow is free to operate on the new node instances in parallel.
+
+    Returns the list of the new (raw) node instances.
+
+    """
+    with _clone_lock:
+        instance = storage.get_node_instance(instance_id)
+        existing = set(_get_instance_ids(storage))
+        clones = []
+        for _ in range(count):
+            clone = copy.deepcopy(instance)
+            clone['id'] = _generate_instance_id(instance.node_id, existing)
+            clone['state'] = 'uninitialized'
+            clone['version'] = 0
+            clone['runtime_properties'] = {}
+            existing.add(clone.id)
+            clones.append(clone)
+        _add_node_instances(storage, clones)
+    return clones
+
+
+# NOTE that cloudify's FileStorage, which `cfy local` uses, has no public
+# means of adding node instances, nor of listing their IDs without loading
+# all of them. The following rely on its internals, as of cloudify 3.4.
+
+def _get_instance_ids(storage):
+    """Return the IDs of all node instances of a FileStorage."""
+    return storage._instance_ids()
+
+
+def _add_node_instances(storage, node_instances):
+    """Add new node instances to a FileStorage."""
+    for node_instance in node_instances:
+        storage._locks[node_instance.id] = threading.RLock()
+        storage._store_instance(node_instance)
+
+
+def add_workflow_node_instances(workctx, node_id, raw_instances):
+    """Make freshly cloned node instances visible to a running workflow.
+
+    The workflow context loads the deployment's node instances only once,
+    when the workflow starts. Node instances added to local storage later
+    on have to be registered explicitly in order for tasks to be scheduled
+    on them.
+
+    Returns the corresponding list of `CloudifyWorkflowNodeInstance`.
+
+    """
+    # Imported here, since this is only required by workflows.
+    from cloudify.workflows.workflow_context import (
+        CloudifyWorkflowNodeInstance
+    )
+    node = workctx.get_node(node_id)
+    instances = []
+    for raw_instance in raw_instances:
+        instance = CloudifyWorkflowNodeInstance(workctx, node, raw_instance,
+                                                workctx)
+        workctx._node_instances[instance.id] = instance
+        instances.append(instance)
+    return instances
+
+
+def _generate_instance_id(node_id, existing):
+    while True:
+        instance_id = '%s_%s' % (node_id, uuid.uuid4().hex[:5])
+        if instance_id not in existing:
+            return instance_id
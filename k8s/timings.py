@@ -0,0 +1,84 @@
+import math
+
+
+def parse_timings(text):
+    """Parse the bootstrap timings reported by deploy-node.sh.
+
+    The timings are reported as a comma-separated list of <phase>:<seconds>
+    pairs. If `text` is the script's entire output, the pairs are read from
+    the line prefixed by "phase-timings". Returns a dict of phases to their
+    durations.
+
+    """
+    lines = (text or '').strip().splitlines()
+    for line in lines:
+        if line.startswith('phase-timings '):
+            lines = [line.split(None, 1)[1]]
+    if len(lines) != 1:
+        return {}
+    timings = {}
+    for pair in lines[0].split(','):
+        phase, _, seconds = pair.partition(':')
+        if seconds.isdigit():
+            timings[phase] = int(seconds)
+    return timings
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of `values`."""
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(node_timings):
+    """Summarize the bootstrap timings of multiple nodes.
+
+    `node_timings` is a dict of node names to their bootstrap timings, as
+    returned by `parse_timings`. Returns the p50, p95 and max duration of each
+    phase across all nodes, as well as the slowest phase, i.e. the one with the
+    largest p95, and the slowest node in total.
+
+    """
+    phases = {}
+    for timings in node_timings.values():
+        for phase, seconds in timings.items():
+            phases.setdefault(phase, []).append(seconds)
+    summary = {
+        'nodes': len(node_timings),
+        'phases': dict(
+            (phase, {
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': max(values),
+            }) for phase, values in phases.items()
+        ),
+        'slowest_phase': None,
+        'slowest_node': None,
+    }
+    if phases:
+        summary['slowest_phase'] = max(
+            phases, key=lambda phase: summary['phases'][phase]['p95']
+        )
+        summary['slowest_node'] = max(
+            node_timings, key=lambda node: sum(node_timings[node].values())
+        )
+    return summary
+
+
+def to_prometheus(node_timings):
+    """Render the bootstrap timings of multiple nodes as Prometheus text."""
+    lines = [
+        '# HELP kubernetes_bootstrap_phase_seconds Duration of each node '
+        'bootstrap phase.',
+        '# TYPE kubernetes_bootstrap_phase_seconds gauge',
+    ]
+    for node in sorted(node_timings):
+        for phase in sorted(node_timings[node]):
+            lines.append(
+                'kubernetes_bootstrap_phase_seconds{node="%s",phase="%s"} %d' %
+                (node, phase, node_timings[node][phase])
+            )
+    return '\n'.join(lines) + '\n'
+
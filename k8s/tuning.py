@@ -0,0 +1,193 @@
+import gzip
+import base64
+import StringIO
+
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError
+
+from k8s.metadata import get_size
+
+
+# The tuning profiles of nodes. Each profile consists of the settings, which
+# are merged into the kubelet's configuration, set in containerd's
+# config.toml, and written to a sysctl drop-in, respectively.
+PROFILES = {
+    'small': {
+        'kubelet': {
+            'maxPods': 110,
+            'serializeImagePulls': True,
+            'kubeReserved': {'cpu': '100m', 'memory': '256Mi'},
+            'systemReserved': {'cpu': '100m', 'memory': '256Mi'},
+            'evictionHard': {
+                'memory.available': '100Mi',
+                'nodefs.available': '10%',
+                'nodefs.inodesFree': '5%',
+                'imagefs.available': '15%',
+            },
+        },
+        'containerd': {
+            'max_concurrent_downloads': 3,
+        },
+        'sysctl': {
+            'fs.file-max': 1048576,
+            'fs.inotify.max_user_instances': 512,
+            'fs.inotify.max_user_watches': 131072,
+            'net.core.somaxconn': 1024,
+            'net.netfilter.nf_conntrack_max': 131072,
+        },
+    },
+    'medium': {
+        'kubelet': {
+            'maxPods': 110,
+            'serializeImagePulls': False,
+            'kubeReserved': {'cpu': '200m', 'memory': '512Mi'},
+            'systemReserved': {'cpu': '200m', 'memory': '512Mi'},
+            'evictionHard': {
+                'memory.available': '200Mi',
+                'nodefs.available': '10%',
+                'nodefs.inodesFree': '5%',
+                'imagefs.available': '15%',
+            },
+        },
+        'containerd': {
+            'max_concurrent_downloads': 6,
+        },
+        'sysctl': {
+            'fs.file-max': 2097152,
+            'fs.inotify.max_user_instances': 1024,
+            'fs.inotify.max_user_watches': 524288,
+            'net.core.somaxconn': 4096,
+            'net.netfilter.nf_conntrack_max': 262144,
+        },
+    },
+    'large': {
+        'kubelet': {
+            'maxPods': 250,
+            'serializeImagePulls': False,
+            'kubeReserved': {'cpu': '500m', 'memory': '1Gi'},
+            'systemReserved': {'cpu': '500m', 'memory': '1Gi'},
+            'evictionHard': {
+                'memory.available': '500Mi',
+                'nodefs.available': '10%',
+                'nodefs.inodesFree': '5%',
+                'imagefs.available': '15%',
+            },
+        },
+        'containerd': {
+            'max_concurrent_downloads': 10,
+        },
+        'sysctl': {
+            'fs.file-max': 4194304,
+            'fs.inotify.max_user_instances': 8192,
+            'fs.inotify.max_user_watches': 1048576,
+            'net.core.netdev_max_backlog': 16384,
+            'net.core.somaxconn': 16384,
+            'net.netfilter.nf_conntrack_max': 1048576,
+        },
+    },
+}
+
+# The smallest size, in cpus and MB of ram, of each profile, largest first.
+# A size, whose number of cpus is unknown, is matched by its ram alone.
+PROFILE_SIZES = (
+    ('large', 16, 32768),
+    ('medium', 4, 8192),
+    ('small', 0, 0),
+)
+
+
+def resolve_profile(name, size=None):
+    """Return the name of the tuning profile of a node.
+
+    `name` is either the name of a profile, "auto", in order to choose the
+    profile based on the machine's `size`, as returned by `get_size`, or
+    "none", for no tuning at all, in which case None is returned.
+
+    """
+    if name == 'none':
+        return None
+    if name != 'auto':
+        if name not in PROFILES:
+            raise NonRecoverableError(
+                'Tuning profile %s is not supported. Choose one of auto, '
+                'none, %s' % (name, ', '.join(sorted(PROFILES))))
+        return name
+    size = size or {}
+    cpus, ram = size.get('cpus'), size.get('ram') or 0
+    for profile, min_cpus, min_ram in PROFILE_SIZES:
+        if (cpus is None or cpus >= min_cpus) and ram >= min_ram:
+            return profile
+    return PROFILE_SIZES[-1][0]
+
+
+def _render_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, basestring):
+        return '"%s"' % value
+    return str(value)
+
+
+def render_profile(profile):
+    """Render the tuning profile `profile` for deploy-node.sh.
+
+    Returns the settings of the kubelet, in YAML, of containerd, in TOML,
+    and the sysctl settings, under a [kubelet], [containerd] and [sysctl]
+    section, respectively.
+
+    """
+    settings = PROFILES[profile]
+    lines = ['[kubelet]']
+    for key, value in sorted(settings['kubelet'].items()):
+        if isinstance(value, dict):
+            lines.append('%s:' % key)
+            lines.extend('  %s: %s' % (name, _render_value(value[name]))
+                         for name in sorted(value))
+        else:
+            lines.append('%s: %s' % (key, _render_value(value)))
+    lines.append('[containerd]')
+    lines.extend('%s = %s' % (key, _render_value(value))
+                 for key, value in sorted(settings['containerd'].items()))
+    lines.append('[sysctl]')
+    lines.extend('%s = %s' % (key, value)
+                 for key, value in sorted(settings['sysctl'].items()))
+    return '\n'.join(lines) + '\n'
+
+
+def store_tuning_profile(parameters):
+    """Resolve the node's tuning profile and store it.
+
+    The profile is resolved based on the node's `tuning_profile` property
+    and the machine's size, as given by the machine's `parameters`, and is
+    stored in the instance's runtime properties. Machines of unknown size,
+    e.g. existing machines, get the smallest profile, if set to "auto".
+
+    """
+    name = ctx.node.properties.get('tuning_profile') or 'auto'
+    size = None
+    if name == 'auto' and parameters.get('size_id'):
+        try:
+            size = get_size(parameters['cloud_id'], parameters['size_id'])
+        except Exception as exc:
+            ctx.logger.warn('Failed to look up size %s: %r',
+                            parameters['size_id'], exc)
+    profile = resolve_profile(name, size)
+    ctx.logger.info('Using tuning profile %s', profile or 'none')
+    ctx.instance.runtime_properties['tuning_profile'] = profile
+
+
+def get_tuning_args(instance=None):
+    """Return the arguments of deploy-node.sh for the node's tuning.
+
+    The rendered profile is compressed, since it is part of the cloud-init
+    user-data of clouds, which use cloud-init, along with deploy-node.sh.
+
+    """
+    instance = instance or ctx.instance
+    profile = instance.runtime_properties.get('tuning_profile')
+    if not profile:
+        return ''
+    buf = StringIO.StringIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as fobj:
+        fobj.write(render_profile(profile))
+    return "-T '%s' " % base64.b64encode(buf.getvalue())
@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+# Usage: bootstrap-log.sh <offset>
+#        bootstrap-log.sh abort
+# Print the output of deploy-node.sh, as written so far, skipping its first
+# <offset> lines, or abort it along with the commands it is running.
+LOG=/var/log/kubernetes-bootstrap.log
+PID_FILE=/var/lib/kubernetes-bootstrap/pid
+if [ "$1" = "abort" ]; then
+    PID=$(cat $PID_FILE 2>/dev/null)
+    if [ -n "$PID" ] && kill -0 $PID 2>/dev/null; then
+        pkill -TERM -P $PID
+        kill -TERM $PID
+        echo "Aborted bootstrap $PID"
+    fi
+    exit 0
+fi
+tail -n +$(( ${1:-0} + 1 )) $LOG 2>/dev/null
+exit 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env bash
+set -e
+# Usage: cluster-metrics.sh
+# Report the pending pods and the utilization of each node with a single
+# query of all nodes and pods. Only pods, which the scheduler failed to fit
+# on any node for lack of resources, count as pending. Pods, which may not be
+# scheduled for other reasons, e.g. node selectors, taints or unbound
+# volumes, are only counted as unschedulable, since more nodes of the same
+# kind would not fit them either. The output is in the form of:
+# pending-pods <pods> <cpu requests in millicores> <memory requests in bytes>
+# unschedulable-pods <pods>
+# node-metrics <hostname> <worker> <ready> <cpu requests> <allocatable cpu>
+#              <memory requests> <allocatable memory>
+NODES=$(mktemp)
+PODS=$(mktemp)
+trap "rm -f $NODES $PODS" EXIT
+kubectl get nodes -o json > $NODES
+kubectl get pods --all-namespaces -o json \
+    --field-selector=status.phase!=Succeeded,status.phase!=Failed > $PODS
+python3 - $NODES $PODS <<'EOF'
+import sys
+import json
+
+UNITS = {'m': 0.001, 'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12,
+         'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40}
+ROLES = ('node-role.kubernetes.io/master',
+         'node-role.kubernetes.io/control-plane')
+
+
+def quantity(value):
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * UNITS[unit]
+    return float(value)
+
+
+# The scheduler's messages, which tell that nodes lack resources.
+INSUFFICIENT = ('Insufficient ', 'Too many pods')
+
+
+def lacks_resources(pod):
+    for condition in pod['status'].get('conditions') or []:
+        if condition['type'] == 'PodScheduled' and \
+                condition['status'] == 'False' and \
+                condition.get('reason') == 'Unschedulable':
+            return any(message in (condition.get('message') or '')
+                       for message in INSUFFICIENT)
+    return False
+
+
+def requests(pod):
+    cpu = memory = 0
+    for container in pod['spec'].get('containers') or []:
+        values = (container.get('resources') or {}).get('requests') or {}
+        cpu += int(quantity(values.get('cpu', '0')) * 1000)
+        memory += int(quantity(values.get('memory', '0')))
+    return cpu, memory
+
+
+nodes = {}
+for node in json.load(open(sys.argv[1]))['items']:
+    labels = node['metadata'].get('labels') or {}
+    conditions = node['status'].get('conditions') or []
+    allocatable = node['status'].get('allocatable') or {}
+    nodes[node['metadata']['name']] = [
+        0 if any(role in labels for role in ROLES) else 1,
+        1 if any(c['type'] == 'Ready' and c['status'] == 'True'
+                 for c in conditions) else 0,
+        0, int(quantity(allocatable.get('cpu', '0')) * 1000),
+        0, int(quantity(allocatable.get('memory', '0'))),
+    ]
+pending, unschedulable = [0, 0, 0], 0
+for pod in json.load(open(sys.argv[2]))['items']:
+    cpu, memory = requests(pod)
+    node = pod['spec'].get('nodeName')
+    if pod['status'].get('phase') == 'Pending' and not node:
+        if lacks_resources(pod):
+            pending[0] += 1
+            pending[1] += cpu
+            pending[2] += memory
+        elif pod['status'].get('conditions'):
+            unschedulable += 1
+    elif node in nodes:
+        nodes[node][2] += cpu
+        nodes[node][4] += memory
+print('pending-pods %d %d %d' % tuple(pending))
+print('unschedulable-pods %d' % unschedulable)
+for name in sorted(nodes):
+    print('node-metrics %s %s' % (name, ' '.join(map(str, nodes[name]))))
+EOF
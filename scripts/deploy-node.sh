@@ -1,12 +1,15 @@
 #!/usr/bin/env bash
 
 set -e
-while getopts "m:t:r:n:" OPTION
+while getopts "m:p:t:r:n:Re:k:c:v:i:N:P:M:T:" OPTION
 do
     case $OPTION in
         m)
           MASTER=$OPTARG
           ;;
+        p)
+          API_PORT=$OPTARG
+          ;;
         t)
           TOKEN=$OPTARG
           ;;
@@ -16,54 +19,317 @@ do
         n)
           NODE_NAME=$OPTARG
           ;;
+        R)
+          RESUME=1
+          ;;
+        e)
+          ENDPOINT=$OPTARG
+          ;;
+        k)
+          CERT_KEY=$OPTARG
+          ;;
+        c)
+          CONTROL_PLANE=$OPTARG
+          ;;
+        v)
+          VIP=$OPTARG
+          ;;
+        i)
+          MIRROR=$OPTARG
+          ;;
+        N)
+          CNI=$OPTARG
+          ;;
+        P)
+          POD_CIDR=$OPTARG
+          ;;
+        M)
+          MTU=$OPTARG
+          ;;
+        T)
+          TUNING=$OPTARG
+          ;;
         ?)
           exit
           ;;
     esac
 done
 
+# The port of the API server to join, i.e. either the master's API server or
+# the load balanced endpoint of a highly available control plane
+API_PORT=${API_PORT-443}
+# The host of the image mirror, which defaults to the API server to join
+MIRROR=${MIRROR-$MASTER}
+# The pod network installed by the master, i.e. "flannel" or "weave", the
+# pods' IP range, and the MTU of the pods' interfaces. If no MTU is given, it
+# is derived from the MTU of the node's interface by the CNI itself
+CNI=${CNI-flannel}
+POD_CIDR=${POD_CIDR-10.244.0.0/16}
+MTU=${MTU-}
+# The node's tuning profile, gzip-compressed and base64 encoded, i.e. the
+# settings of the kubelet, of containerd and the sysctl settings, under a
+# [kubelet], [containerd] and [sysctl] section, respectively. If not set, the
+# node is not tuned
+TUNING=${TUNING-}
+
+# The duration of each bootstrap phase, in seconds, as a comma-separated list
+# of <phase>:<seconds> pairs. It is printed on exit and saved on the node, so
+# that it may be collected, even if the bootstrap fails
+PHASE_TIMINGS=""
+PHASE_TIMINGS_FILE=/var/log/kubernetes-bootstrap-timings
+
+# The output of the bootstrap, as written so far, so that it may be followed
+# by bootstrap-log.sh while the bootstrap is still running
+BOOTSTRAP_LOG=/var/log/kubernetes-bootstrap.log
+
+# Mark the beginning of a bootstrap phase, ending the current one, if any
+phase() {
+phase_end
+PHASE=$1
+PHASE_STARTED=$(date +%s)
+echo "bootstrap-phase $PHASE"
+}
+
+# Record the duration of the current bootstrap phase
+phase_end() {
+if [ -n "$PHASE" ]; then
+    PHASE_TIMINGS="${PHASE_TIMINGS:+$PHASE_TIMINGS,}$PHASE:$(( $(date +%s) - PHASE_STARTED ))"
+    PHASE=""
+fi
+}
+
+# The bootstrap phases, which have completed, one per line, following the ID
+# of the bootstrap, i.e. a digest of its arguments. When resuming the same
+# bootstrap, completed phases are skipped
+CHECKPOINT_FILE=/var/lib/kubernetes-bootstrap/checkpoints
+
+# Start checkpointing the bootstrap's phases, unless resuming the same one
+init_checkpoints() {
+local ID
+ID=$(echo "$ROLE $MASTER $NODE_NAME $TOKEN" | sha256sum | head -c 16)
+mkdir -p $(dirname $CHECKPOINT_FILE)
+if [ -z "$RESUME" ] || [ "$(head -n 1 $CHECKPOINT_FILE 2>/dev/null)" != "bootstrap $ID" ]; then
+    echo "bootstrap $ID" > $CHECKPOINT_FILE
+else
+    echo "Resuming bootstrap after phases: $(tail -n +2 $CHECKPOINT_FILE | tr '\n' ' ')"
+fi
+}
+
+# Check whether a bootstrap phase has already completed
+completed() {
+tail -n +2 $CHECKPOINT_FILE | grep -qx "$1"
+}
+
+# Run a bootstrap phase, i.e. the given function, and checkpoint it, unless
+# it has already completed
+run_phase() {
+if completed $1; then
+    phase_end
+    echo "Skipping phase $1, which has already completed"
+    return
+fi
+phase $1
+$2
+checkpoint $1
+}
+
+# Mark a bootstrap phase as completed
+checkpoint() {
+echo "$1" >> $CHECKPOINT_FILE
+}
+
+# Report the bootstrap phases' timings, as well as the phase that failed, if
+# any
+report_timings() {
+local STATUS=$?
+if [ $STATUS -ne 0 ] && [ -n "$PHASE" ]; then
+    echo "bootstrap-failed $PHASE"
+fi
+phase_end
+echo "$PHASE_TIMINGS" > $PHASE_TIMINGS_FILE
+echo "phase-timings $PHASE_TIMINGS"
+}
+
+# Check whether all given packages are installed
+is_installed() {
+for PACKAGE in "$@"; do
+    dpkg-query -W -f='${Status}' $PACKAGE 2>/dev/null | grep -q "ok installed" || return 1
+done
+}
+
+# Check whether all given packages are held at their installed version
+is_held() {
+for PACKAGE in "$@"; do
+    apt-mark showhold | grep -qx $PACKAGE || return 1
+done
+}
+
+# Write stdin to the given file, unless its content is already the same. The
+# exit code denotes whether the file has changed
+write_if_changed() {
+local CONTENT
+CONTENT=$(cat)
+if [ -f "$1" ] && [ "$(cat $1)" = "$CONTENT" ]; then
+    return 1
+fi
+echo "$CONTENT" > $1
+}
+
+# Print the given section of the node's tuning profile
+tuning_section() {
+echo "$TUNING" | base64 -d | gunzip | awk -v SECTION="[$1]" '/^\[.*\]$/ {found = ($0 == SECTION); next} found'
+}
+
+# The port of the image mirror, i.e. the local registry run by the master
+MIRROR_PORT=${MIRROR_PORT-5000}
+# The registries, whose images nodes pull through the master's image mirror
+MIRRORED_REGISTRIES="registry.k8s.io k8s.gcr.io docker.io ghcr.io quay.io"
+
+# Return the path of an image in the image mirror, i.e. its name without the
+# registry. Images of Docker Hub are mirrored under library/, if official
+mirror_path() {
+local IMAGE=$1 REGISTRY=docker.io
+case ${IMAGE%%/*} in
+    *.*|*:*|localhost)
+        [[ $IMAGE == */* ]] && REGISTRY=${IMAGE%%/*} IMAGE=${IMAGE#*/}
+        ;;
+esac
+if [ $REGISTRY = "docker.io" ] && [[ $IMAGE != */* ]]; then
+    IMAGE=library/$IMAGE
+fi
+echo $IMAGE
+}
+
+# Return the address of the node's default route, i.e. its private address,
+# which kubeadm also advertises, unless the node only has a public one
+private_ip() {
+ip -o route get 1.1.1.1 | awk '{for (i = 1; i < NF; i++) if ($i == "src") print $(i + 1)}'
+}
+
+# Run the image mirror, i.e. a local registry, which keeps its images in a
+# volume of its own. It listens on the loopback interface, so that the master
+# may push to it, and on the master's private address, so that nodes may pull
+# from it, but is not exposed on any other interface. It is read-only, unless
+# "writable" is given, so that nodes may not replace the mirrored images
+run_image_mirror() {
+local READONLY=true ADDRESS
+ADDRESS=$(private_ip)
+if [ -z "$ADDRESS" ]; then
+    echo "Failed to find the master's private address"
+    return 1
+fi
+[ "$1" = "writable" ] && READONLY=false
+docker rm -f image-mirror > /dev/null 2>&1 || true
+docker run -d --restart=always --name image-mirror \
+    -v image-mirror:/var/lib/registry \
+    -p 127.0.0.1:$MIRROR_PORT:5000 -p $ADDRESS:$MIRROR_PORT:5000 \
+    -e REGISTRY_STORAGE_MAINTENANCE_READONLY="{\"enabled\": $READONLY}" \
+    registry:2
+}
+
+# Run a local registry on the master and push the images run by nodes into
+# it, i.e. the images of kubeadm and of the daemonsets of all namespaces,
+# e.g. flannel's, which runs in kube-flannel, so that nodes pull them from
+# the master, instead of from the upstream registries. The pause image is
+# pushed last, marking the image mirror as ready. Once seeded, the registry
+# is restarted read-only. Any images of earlier attempts are dropped, along
+# with their markers
+setup_image_mirror() {
+local IMAGES IMAGE MIRRORED
+docker rm -f image-mirror > /dev/null 2>&1 || true
+docker volume rm image-mirror > /dev/null 2>&1 || true
+run_image_mirror writable || return 1
+IMAGES=$( (kubeadm config images list && kubectl --kubeconfig \
+    /etc/kubernetes/admin.conf get daemonsets --all-namespaces \
+    -o jsonpath='{..image}') | tr ' ' '\n' | sort -u) || return 1
+for IMAGE in $(echo "$IMAGES" | grep -v /pause:) $(echo "$IMAGES" | grep /pause:); do
+    MIRRORED=localhost:$MIRROR_PORT/$(mirror_path $IMAGE)
+    docker pull $IMAGE && docker tag $IMAGE $MIRRORED && \
+        docker push $MIRRORED || return 1
+done
+run_image_mirror
+}
+
+# Mark the image mirror as failed by pushing an empty image, so that nodes
+# stop waiting for it and pull images from upstream right away
+mark_image_mirror_failed() {
+local MARKER=localhost:$MIRROR_PORT/mirror-failed
+run_image_mirror writable || return 1
+tar -c --files-from /dev/null | docker import - $MARKER && \
+    docker push $MARKER || return 1
+run_image_mirror
+}
+
+# Configure containerd to pull images through the master's image mirror,
+# falling back to the upstream registries, and wait for the mirror to be
+# ready. Nodes stop waiting, once the master marks the mirror as failed, or
+# once they time out, and pull images from upstream
+configure_image_mirror() {
+local CHANGED="" REGISTRY SERVER
+if grep -q 'config_path = ""' /etc/containerd/config.toml; then
+    sed -i -e 's|config_path = ""|config_path = "/etc/containerd/certs.d"|' \
+        /etc/containerd/config.toml
+    CHANGED=1
+fi
+for REGISTRY in $MIRRORED_REGISTRIES; do
+    SERVER=https://$REGISTRY
+    [ $REGISTRY = "docker.io" ] && SERVER=https://registry-1.docker.io
+    mkdir -p /etc/containerd/certs.d/$REGISTRY
+    if write_if_changed /etc/containerd/certs.d/$REGISTRY/hosts.toml <<EOF
+server = "$SERVER"
+
+[host."http://$MIRROR:$MIRROR_PORT"]
+  capabilities = ["pull", "resolve"]
+EOF
+    then
+        CHANGED=1
+    fi
+done
+if [ -n "$CHANGED" ]; then
+    systemctl restart containerd
+fi
+MIRROR_TIMEOUT=${MIRROR_TIMEOUT-600}
+until curl --output /dev/null --silent --fail http://$MIRROR:$MIRROR_PORT/v2/pause/tags/list; do
+    if curl --output /dev/null --silent --fail http://$MIRROR:$MIRROR_PORT/v2/mirror-failed/tags/list; then
+        echo "The image mirror failed to be set up, pulling from upstream"
+        break
+    fi
+    if [ $(( $(date +%s) - PHASE_STARTED )) -gt $MIRROR_TIMEOUT ]; then
+        echo "Timed out waiting for the image mirror, pulling from upstream"
+        break
+    fi
+    printf '.'
+    sleep 5
+done
+}
+
 ubuntu_main() {
 ################################################################################
 #
 #           UBUNTU
 #
 ################################################################################
+phase system
 # Disable swap
 swapoff -a
-# Load br_netfilter
-modprobe br_netfilter
-# Set iptables to correctly see bridged traffic
+# Load br_netfilter and overlay, which is also required by containerd
 cat <<EOF | tee /etc/modules-load.d/k8s.conf
 br_netfilter
+nf_conntrack
 EOF
-cat <<EOF | tee /etc/sysctl.d/k8s.conf
-net.bridge.bridge-nf-call-ip6tables = 1
-net.bridge.bridge-nf-call-iptables = 1
-EOF
-sysctl --system
-# Install kubeadm, kubelet and kubectl
-# Update the apt package index and install packages needed to use the Kubernetes apt repository:
-apt-get update
-apt-get install -y apt-transport-https ca-certificates curl
-# Download the Google Cloud public signing key:
-curl -fsSLo /usr/share/keyrings/kubernetes-archive-keyring.gpg https://packages.cloud.google.com/apt/doc/apt-key.gpg
-# Add the Kubernetes apt repository
-echo "deb [signed-by=/usr/share/keyrings/kubernetes-archive-keyring.gpg] https://apt.kubernetes.io/ kubernetes-xenial main" | tee /etc/apt/sources.list.d/kubernetes.list
-# Update apt package index, install kubelet, kubeadm and kubectl, and pin their version
-apt-get update
-apt-get install -y --allow-change-held-packages kubelet kubeadm kubectl
-apt-mark hold kubelet kubeadm kubectl
-systemctl enable kubelet
-# Configuring a cgroup driver
-# Use containerd as CRI runtime
-# Install and configure prerequisites
 cat <<EOF | tee /etc/modules-load.d/containerd.conf
 overlay
 br_netfilter
 EOF
 modprobe overlay
 modprobe br_netfilter
-# Setup required sysctl params, these persist across reboots.
+modprobe nf_conntrack
+# Set iptables to correctly see bridged traffic and setup required sysctl
+# params, these persist across reboots.
+cat <<EOF | tee /etc/sysctl.d/k8s.conf
+net.bridge.bridge-nf-call-ip6tables = 1
+net.bridge.bridge-nf-call-iptables = 1
+EOF
 cat <<EOF | tee /etc/sysctl.d/99-kubernetes-cri.conf
 net.bridge.bridge-nf-call-iptables  = 1
 net.ipv4.ip_forward                 = 1
@@ -71,35 +337,83 @@ net.bridge.bridge-nf-call-ip6tables = 1
 EOF
 # Apply sysctl params without reboot
 sysctl --system
-# Install containerd
-# Install Docker Engine (Ubuntu)
-# Uninstall old versions
-apt-get remove -y docker docker-engine docker.io containerd runc
-apt-get update
-apt-get install -y apt-transport-https ca-certificates curl gnupg lsb-release
-# Add Docker's official GPG key
-rm -f /usr/share/keyrings/docker-archive-keyring.gpg
-curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /usr/share/keyrings/docker-archive-keyring.gpg
-# Set up the stable repository (x86_64/amd64)
-echo \
-  "deb [arch=amd64 signed-by=/usr/share/keyrings/docker-archive-keyring.gpg] https://download.docker.com/linux/ubuntu \
-  $(lsb_release -cs) stable" | tee /etc/apt/sources.list.d/docker.list > /dev/null
-# Install the latest version of Docker Engine and containerd
-apt-get update
-apt-get install -y docker-ce docker-ce-cli containerd.io
-# Verify that Docker Enginer is installed
-docker run hello-world
-# Configure containerd
+run_phase apt install_packages_ubuntu
+run_phase runtime configure_runtime_ubuntu
+run_phase tuning tune_node_ubuntu
+phase reset
+reset_kubeadm_ubuntu
+
+if [ $ROLE = "master" ]; then
+    install_master_ubuntu
+elif [ $ROLE = "control-plane" ]; then
+    install_control_plane_ubuntu
+elif [ $ROLE = "node" ]; then
+    install_node_ubuntu
+elif [ $ROLE = "pool" ]; then
+    # Machines of the warm pool stop right before joining the cluster. They
+    # join later on as nodes, with installation being a no-op by then.
+    echo "Kubernetes installed, not joining the cluster"
+fi
+
+}
+
+install_packages_ubuntu() {
+# Install kubeadm, kubelet and kubectl, as well as containerd as CRI runtime,
+# unless they are already installed and pinned. That way, re-provisioning an
+# existing machine skips straight to configuration.
+if is_installed kubelet kubeadm kubectl docker-ce docker-ce-cli containerd.io && \
+   is_held kubelet kubeadm kubectl; then
+    echo "Kubernetes packages and containerd are already installed"
+else
+    # Install packages needed to use the Kubernetes and Docker apt repositories
+    if ! is_installed apt-transport-https ca-certificates curl gnupg lsb-release; then
+        apt-get update
+        apt-get install -y apt-transport-https ca-certificates curl gnupg lsb-release
+    fi
+    # Uninstall old versions of Docker Engine (Ubuntu)
+    for PACKAGE in docker docker-engine docker.io containerd runc; do
+        if is_installed $PACKAGE; then
+            apt-get remove -y $PACKAGE
+        fi
+    done
+    # Download the Google Cloud public signing key:
+    curl -fsSLo /usr/share/keyrings/kubernetes-archive-keyring.gpg https://packages.cloud.google.com/apt/doc/apt-key.gpg
+    # Add the Kubernetes apt repository
+    echo "deb [signed-by=/usr/share/keyrings/kubernetes-archive-keyring.gpg] https://apt.kubernetes.io/ kubernetes-xenial main" | tee /etc/apt/sources.list.d/kubernetes.list
+    # Add Docker's official GPG key
+    rm -f /usr/share/keyrings/docker-archive-keyring.gpg
+    curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /usr/share/keyrings/docker-archive-keyring.gpg
+    # Set up the stable repository (x86_64/amd64)
+    echo \
+      "deb [arch=amd64 signed-by=/usr/share/keyrings/docker-archive-keyring.gpg] https://download.docker.com/linux/ubuntu \
+      $(lsb_release -cs) stable" | tee /etc/apt/sources.list.d/docker.list > /dev/null
+    # Update the apt package index once for both repositories. Install kubelet,
+    # kubeadm and kubectl, and pin their version. Install the latest version of
+    # Docker Engine and containerd
+    apt-get update
+    apt-get install -y --allow-change-held-packages kubelet kubeadm kubectl docker-ce docker-ce-cli containerd.io
+    apt-mark hold kubelet kubeadm kubectl
+fi
+}
+
+configure_runtime_ubuntu() {
+systemctl enable kubelet
+# Verify that Docker Engine is installed
+docker version
+# Configure containerd to use the systemd cgroup driver, unless already done
 mkdir -p /etc/containerd
-containerd config default > /etc/containerd/config.toml
-sed -i -e 's/SystemdCgroup = false/SystemdCgroup = true/g' /etc/containerd/config.toml
-cat /etc/containerd/config.toml
-# Restart containerd
-systemctl restart containerd
+if ! grep -q "SystemdCgroup = true" /etc/containerd/config.toml 2>/dev/null; then
+    containerd config default > /etc/containerd/config.toml
+    sed -i -e 's/SystemdCgroup = false/SystemdCgroup = true/g' /etc/containerd/config.toml
+    cat /etc/containerd/config.toml
+    # Restart containerd
+    systemctl restart containerd
+fi
 # Configure docker systemd cgroup driver
 mkdir -p /etc/docker
 mkdir -p /etc/systemd/system/docker.service.d
-cat <<EOF | sudo tee /etc/docker/daemon.json
+systemctl enable docker
+if write_if_changed /etc/docker/daemon.json <<EOF
 {
   "exec-opts": ["native.cgroupdriver=systemd"],
   "log-driver": "json-file",
@@ -109,26 +423,105 @@ cat <<EOF | sudo tee /etc/docker/daemon.json
   "storage-driver": "overlay2"
 }
 EOF
-systemctl enable docker
-systemctl daemon-reload
-systemctl restart docker
-# Reset kubeadm in case it was already ran
-set -e
-rm -rf /etc/kubernetes/manifests/*.yaml
-rm -rf /var/lib/etcd
-rm -rf /etc/cni/net.d
-kubeadm reset -f
-iptables -F && iptables -t nat -F && iptables -t mangle -F && iptables -X
+then
+    systemctl daemon-reload
+    systemctl restart docker
+fi
+}
 
-if [ $ROLE = "master" ]; then
-    install_master_ubuntu
-elif [ $ROLE = "node" ]; then
-    install_node_ubuntu
+tune_node_ubuntu() {
+# Apply the sysctl and containerd settings of the node's tuning profile
+local CHANGED="" KEY VALUE
+if [ -z "$TUNING" ]; then
+    echo "No tuning profile, using the default settings"
+    return
+fi
+tuning_section sysctl | write_if_changed /etc/sysctl.d/90-kubernetes-tuning.conf || true
+sysctl -e -p /etc/sysctl.d/90-kubernetes-tuning.conf
+while read KEY VALUE; do
+    VALUE=${VALUE#= }
+    if grep -q "^\s*$KEY = $VALUE$" /etc/containerd/config.toml; then
+        continue
+    elif grep -q "^\s*$KEY = " /etc/containerd/config.toml; then
+        sed -i -e "s|^\(\s*\)$KEY = .*|\1$KEY = $VALUE|" /etc/containerd/config.toml
+        CHANGED=1
+    else
+        echo "Setting $KEY not found in containerd's config.toml, skipping"
+    fi
+done < <(tuning_section containerd)
+if [ -n "$CHANGED" ]; then
+    systemctl restart containerd
 fi
+}
 
+tune_kubelet_ubuntu() {
+# Merge the kubelet settings of the node's tuning profile into the kubelet's
+# configuration, as written by kubeadm, replacing the settings they override
+local CONFIG=/var/lib/kubelet/config.yaml KEYS
+if [ -z "$TUNING" ]; then
+    echo "No tuning profile, using the default kubelet configuration"
+    return
+fi
+KEYS=$(tuning_section kubelet | grep -o '^[A-Za-z]*' | paste -sd '|')
+if { awk -v KEYS="^($KEYS):" '/^[A-Za-z]/ {skip = ($0 ~ KEYS)} !skip' $CONFIG; tuning_section kubelet; } | \
+   write_if_changed $CONFIG; then
+    systemctl restart kubelet
+fi
+}
+
+reset_kubeadm_ubuntu() {
+# Reset kubeadm, only if it has already run on this machine, i.e. when an
+# existing machine is re-provisioned, or when the bootstrap being resumed
+# failed while initializing or joining the cluster. Resuming a bootstrap,
+# which has gone past that point, keeps the state of the cluster
+if completed kubeadm; then
+    echo "Kubeadm has already completed, not resetting"
+elif [ -n "$(ls -A /etc/kubernetes/pki /etc/kubernetes/manifests 2>/dev/null)" ] || \
+   [ -f /etc/kubernetes/kubelet.conf ] || [ -d /var/lib/etcd ]; then
+    rm -rf /etc/kubernetes/manifests/*.yaml
+    rm -rf /var/lib/etcd
+    rm -rf /etc/cni/net.d
+    kubeadm reset -f
+    iptables -F && iptables -t nat -F && iptables -t mangle -F && iptables -X
+else
+    echo "Kubeadm has not run on this machine, nothing to reset"
+fi
 }
 
 install_master_ubuntu() {
+if [ -n "$ENDPOINT" ]; then
+    run_phase lb setup_load_balancer_ubuntu
+fi
+run_phase images pull_images_master_ubuntu
+run_phase kubeadm init_master_ubuntu
+run_phase kubelet tune_kubelet_ubuntu
+run_phase cni install_cni_master_ubuntu
+run_phase mirror distribute_images_master_ubuntu
+}
+
+pull_images_master_ubuntu() {
+# Verify connectivity to the gcr.io container image registry
+kubeadm config images pull
+}
+
+init_master_ubuntu() {
+# A highly available control plane is reached through its load balanced
+# endpoint. Its certificates are uploaded to the cluster, encrypted with the
+# certificate key, so that the rest of the control plane nodes may join. Its
+# stacked etcd listens on the node's address, so that the etcd members of all
+# control plane nodes may reach one another
+if [ -n "$ENDPOINT" ]; then
+    INIT_CONFIG="certificateKey: \"$CERT_KEY\""
+    CLUSTER_CONFIG="controlPlaneEndpoint: \"$ENDPOINT\""
+    INIT_ARGS="--upload-certs"
+else
+    INIT_CONFIG=""
+    CLUSTER_CONFIG="etcd:
+  local:
+    extraArgs:
+      'listen-peer-urls': 'http://127.0.0.1:2380'"
+    INIT_ARGS=""
+fi
 cat <<EOF > /etc/kubernetes/kubeadm-config.yaml
 apiVersion: kubeadm.k8s.io/v1beta2
 kind: InitConfiguration
@@ -138,22 +531,20 @@ localAPIEndpoint:
   bindPort: 443
 bootstrapTokens:
 - token: "$TOKEN"
+$INIT_CONFIG
 ---
 apiVersion: kubeadm.k8s.io/v1beta2
 kind: ClusterConfiguration
-etcd:
-  local:
-    extraArgs:
-      'listen-peer-urls': 'http://127.0.0.1:2380'
+networking:
+  podSubnet: "$POD_CIDR"
+$CLUSTER_CONFIG
 ---
 kind: KubeletConfiguration
 apiVersion: kubelet.config.k8s.io/v1beta1
 cgroupDriver: systemd
 EOF
-# Verify connectivity to the gcr.io container image registry
-kubeadm config images pull
 # Initialize kubeadm
-kubeadm init --config /etc/kubernetes/kubeadm-config.yaml
+kubeadm init --config /etc/kubernetes/kubeadm-config.yaml $INIT_ARGS
 mkdir -p $HOME/.kube
 sudo cp /etc/kubernetes/admin.conf $HOME/.kube/config
 sudo chown $(id -u):$(id -g) $HOME/.kube/config
@@ -162,19 +553,401 @@ until $(curl --output /dev/null --silent --head --insecure https://localhost:443
     printf '.'
     sleep 5
 done
-# Initialize pod network (weave)
-kubever=$(kubectl --kubeconfig /etc/kubernetes/admin.conf version | base64 | tr -d '\n')
-kubectl apply -f "https://cloud.weave.works/k8s/net?k8s-version=$kubever"
+}
+
+install_cni_master_ubuntu() {
+# Initialize pod network. Flannel is rendered locally, while weave's manifest
+# is generated by weave's service at install time
+if [ $CNI = "flannel" ]; then
+    flannel_manifest | kubectl --kubeconfig /etc/kubernetes/admin.conf apply -f -
+elif [ $CNI = "weave" ]; then
+    kubever=$(kubectl --kubeconfig /etc/kubernetes/admin.conf version | base64 | tr -d '\n')
+    kubectl --kubeconfig /etc/kubernetes/admin.conf apply -f "https://cloud.weave.works/k8s/net?k8s-version=$kubever&env.IPALLOC_RANGE=$POD_CIDR${MTU:+&env.WEAVE_MTU=$MTU}"
+else
+    echo "CNI $CNI is not supported. Choose one of [flannel, weave]"
+    exit 1
+fi
+}
+
+flannel_manifest() {
+# Vendored from kube-flannel.yml of flannel v0.22.0. The vxlan backend routes
+# pod traffic natively between nodes of the same subnet, i.e. without
+# encapsulation, and only falls back to vxlan across subnets
+cat <<EOF
+apiVersion: v1
+kind: Namespace
+metadata:
+  labels:
+    k8s-app: flannel
+    pod-security.kubernetes.io/enforce: privileged
+  name: kube-flannel
+---
+apiVersion: v1
+kind: ServiceAccount
+metadata:
+  labels:
+    k8s-app: flannel
+  name: flannel
+  namespace: kube-flannel
+---
+apiVersion: rbac.authorization.k8s.io/v1
+kind: ClusterRole
+metadata:
+  labels:
+    k8s-app: flannel
+  name: flannel
+rules:
+- apiGroups:
+  - ""
+  resources:
+  - pods
+  verbs:
+  - get
+- apiGroups:
+  - ""
+  resources:
+  - nodes
+  verbs:
+  - get
+  - list
+  - watch
+- apiGroups:
+  - ""
+  resources:
+  - nodes/status
+  verbs:
+  - patch
+- apiGroups:
+  - networking.k8s.io
+  resources:
+  - clustercidrs
+  verbs:
+  - list
+  - watch
+---
+apiVersion: rbac.authorization.k8s.io/v1
+kind: ClusterRoleBinding
+metadata:
+  labels:
+    k8s-app: flannel
+  name: flannel
+roleRef:
+  apiGroup: rbac.authorization.k8s.io
+  kind: ClusterRole
+  name: flannel
+subjects:
+- kind: ServiceAccount
+  name: flannel
+  namespace: kube-flannel
+---
+apiVersion: v1
+data:
+  cni-conf.json: |
+    {
+      "name": "cbr0",
+      "cniVersion": "0.3.1",
+      "plugins": [
+        {
+          "type": "flannel",
+          "delegate": {
+            ${MTU:+\"mtu\": $MTU,}
+            "hairpinMode": true,
+            "isDefaultGateway": true
+          }
+        },
+        {
+          "type": "portmap",
+          "capabilities": {
+            "portMappings": true
+          }
+        }
+      ]
+    }
+  net-conf.json: |
+    {
+      "Network": "$POD_CIDR",
+      "Backend": {
+        "Type": "vxlan",
+        "DirectRouting": true
+      }
+    }
+kind: ConfigMap
+metadata:
+  labels:
+    app: flannel
+    k8s-app: flannel
+    tier: node
+  name: kube-flannel-cfg
+  namespace: kube-flannel
+---
+apiVersion: apps/v1
+kind: DaemonSet
+metadata:
+  labels:
+    app: flannel
+    k8s-app: flannel
+    tier: node
+  name: kube-flannel-ds
+  namespace: kube-flannel
+spec:
+  selector:
+    matchLabels:
+      app: flannel
+      k8s-app: flannel
+  template:
+    metadata:
+      labels:
+        app: flannel
+        k8s-app: flannel
+        tier: node
+    spec:
+      affinity:
+        nodeAffinity:
+          requiredDuringSchedulingIgnoredDuringExecution:
+            nodeSelectorTerms:
+            - matchExpressions:
+              - key: kubernetes.io/os
+                operator: In
+                values:
+                - linux
+      containers:
+      - args:
+        - --ip-masq
+        - --kube-subnet-mgr
+        command:
+        - /opt/bin/flanneld
+        env:
+        - name: POD_NAME
+          valueFrom:
+            fieldRef:
+              fieldPath: metadata.name
+        - name: POD_NAMESPACE
+          valueFrom:
+            fieldRef:
+              fieldPath: metadata.namespace
+        - name: EVENT_QUEUE_DEPTH
+          value: "5000"
+        image: docker.io/flannel/flannel:v0.22.0
+        name: kube-flannel
+        resources:
+          requests:
+            cpu: 100m
+            memory: 50Mi
+        securityContext:
+          capabilities:
+            add:
+            - NET_ADMIN
+            - NET_RAW
+          privileged: false
+        volumeMounts:
+        - mountPath: /run/flannel
+          name: run
+        - mountPath: /etc/kube-flannel/
+          name: flannel-cfg
+        - mountPath: /run/xtables.lock
+          name: xtables-lock
+      hostNetwork: true
+      initContainers:
+      - args:
+        - -f
+        - /flannel
+        - /opt/cni/bin/flannel
+        command:
+        - cp
+        image: docker.io/flannel/flannel-cni-plugin:v1.1.2
+        name: install-cni-plugin
+        volumeMounts:
+        - mountPath: /opt/cni/bin
+          name: cni-plugin
+      - args:
+        - -f
+        - /etc/kube-flannel/cni-conf.json
+        - /etc/cni/net.d/10-flannel.conflist
+        command:
+        - cp
+        image: docker.io/flannel/flannel:v0.22.0
+        name: install-cni
+        volumeMounts:
+        - mountPath: /etc/cni/net.d
+          name: cni
+        - mountPath: /etc/kube-flannel/
+          name: flannel-cfg
+      priorityClassName: system-node-critical
+      serviceAccountName: flannel
+      tolerations:
+      - effect: NoSchedule
+        operator: Exists
+      volumes:
+      - hostPath:
+          path: /run/flannel
+        name: run
+      - hostPath:
+          path: /opt/cni/bin
+        name: cni-plugin
+      - hostPath:
+          path: /etc/cni/net.d
+        name: cni
+      - configMap:
+          name: kube-flannel-cfg
+        name: flannel-cfg
+      - hostPath:
+          path: /run/xtables.lock
+          type: FileOrCreate
+        name: xtables-lock
+EOF
+}
+
+distribute_images_master_ubuntu() {
+# Distribute the images of the cluster to nodes through the master
+if ! setup_image_mirror; then
+    echo "Failed to set up the image mirror, nodes pull images from upstream"
+    mark_image_mirror_failed || echo "Failed to mark the image mirror as failed"
+fi
+}
+
+setup_load_balancer_ubuntu() {
+# Load balance the API servers of all control plane nodes with haproxy. If a
+# virtual IP is used as the endpoint, it is held by one of the control plane
+# nodes at a time, as decided by keepalived
+local PACKAGES="haproxy" IP ADDRESS INTERFACE PRIORITY=100 i=0
+if [ -n "$VIP" ]; then
+    PACKAGES="$PACKAGES keepalived"
+fi
+if ! is_installed $PACKAGES; then
+    apt-get update
+    apt-get install -y $PACKAGES
+fi
+if { cat <<EOF
+global
+    log /dev/log local0
+
+defaults
+    log global
+    mode tcp
+    option tcplog
+    timeout connect 5s
+    timeout client 1h
+    timeout server 1h
+
+frontend kube-apiserver
+    bind *:${ENDPOINT##*:}
+    default_backend kube-apiserver
+
+backend kube-apiserver
+    balance roundrobin
+EOF
+for IP in ${CONTROL_PLANE//,/ }; do
+    echo "    server control-plane-$i $IP:443 check"
+    i=$(( i + 1 ))
+done
+} | write_if_changed /etc/haproxy/haproxy.cfg; then
+    systemctl restart haproxy
+fi
+systemctl enable haproxy
+if [ -z "$VIP" ]; then
+    return
+fi
+INTERFACE=$(ip -o route get $VIP | awk '{for (i = 1; i < NF; i++) if ($i == "dev") print $(i + 1)}')
+ADDRESS=$(ip -o route get $VIP | awk '{for (i = 1; i < NF; i++) if ($i == "src") print $(i + 1)}')
+# The master is preferred as the holder of the virtual IP
+if [ $ROLE = "master" ]; then
+    PRIORITY=101
+fi
+if { cat <<EOF
+vrrp_script check_haproxy {
+    script "/bin/systemctl is-active --quiet haproxy"
+    interval 3
+    fall 2
+    rise 2
+}
+
+vrrp_instance kube_apiserver {
+    state BACKUP
+    interface $INTERFACE
+    virtual_router_id 51
+    priority $PRIORITY
+    advert_int 1
+    authentication {
+        auth_type PASS
+        auth_pass $(echo $TOKEN | sha256sum | head -c 8)
+    }
+    unicast_src_ip $ADDRESS
+    unicast_peer {
+EOF
+for IP in ${CONTROL_PLANE//,/ }; do
+    if [ $IP != $ADDRESS ]; then
+        echo "        $IP"
+    fi
+done
+cat <<EOF
+    }
+    virtual_ipaddress {
+        $VIP
+    }
+    track_script {
+        check_haproxy
+    }
+}
+EOF
+} | write_if_changed /etc/keepalived/keepalived.conf; then
+    systemctl restart keepalived
+fi
+systemctl enable keepalived
 }
 
 install_node_ubuntu() {
+phase master
+wait_for_master_ubuntu
+run_phase mirror configure_image_mirror
+run_phase kubeadm join_node_ubuntu
+run_phase kubelet tune_kubelet_ubuntu
+}
+
+install_control_plane_ubuntu() {
+run_phase lb setup_load_balancer_ubuntu
+phase master
+wait_for_master_ubuntu
+run_phase mirror configure_image_mirror
+run_phase kubeadm join_control_plane_ubuntu
+run_phase kubelet tune_kubelet_ubuntu
+}
+
+wait_for_master_ubuntu() {
+# Wait for the master's kube-apiserver to be up and running, since the master
+# may still be installing while this node is being prepared
+MASTER_TIMEOUT=${MASTER_TIMEOUT-1800}
+until $(curl --output /dev/null --silent --head --insecure https://$MASTER:$API_PORT); do
+    if [ $(( $(date +%s) - PHASE_STARTED )) -gt $MASTER_TIMEOUT ]; then
+        echo "Timed out waiting for kubernetes master $MASTER"
+        exit 1
+    fi
+    printf '.'
+    sleep 5
+done
+}
+
+join_node_ubuntu() {
 # Join cluster
-kubeadm join $MASTER:443 \
+kubeadm join $MASTER:$API_PORT \
   --discovery-token-unsafe-skip-ca-verification \
   --token $TOKEN \
   --node-name $NODE_NAME
 }
 
+join_control_plane_ubuntu() {
+# Join cluster as a control plane node, along with a member of stacked etcd.
+# The certificates of the control plane are downloaded from the cluster
+kubeadm join $MASTER:$API_PORT \
+  --control-plane \
+  --certificate-key $CERT_KEY \
+  --apiserver-bind-port 443 \
+  --discovery-token-unsafe-skip-ca-verification \
+  --token $TOKEN \
+  --node-name $NODE_NAME
+mkdir -p $HOME/.kube
+cp /etc/kubernetes/admin.conf $HOME/.kube/config
+}
+
 
 
 find_distro () {
@@ -219,12 +992,21 @@ TOKEN=${TOKEN-$pass}
 # Role must be provided
 if [ -z "$ROLE" ]
 then
-    echo "Role is not set. You must specify role [-r <master><node>]"
+    echo "Role is not set. You must specify role [-r <master><control-plane><node><pool>]"
     exit 1
 fi
 
 find_distro
 
+init_checkpoints
+
+# Keep a copy of the output, which is reported by mist.io only once the
+# bootstrap has finished
+echo $$ > $(dirname $CHECKPOINT_FILE)/pid
+exec > >(tee $BOOTSTRAP_LOG) 2> >(tee -a $BOOTSTRAP_LOG >&2)
+
+trap report_timings EXIT
+
 if [ $DISTRO = "Ubuntu" ] || [ $DISTRO = "Debian" ];then
     ubuntu_main
 fi
@@ -1,4 +1,4 @@
 #!/usr/bin/env bash
 set -ex
-kubectl drain {{hostname}} --delete-emptydir-data --force --ignore-daemonsets
-kubectl delete node {{hostname}}
+kubectl drain $1 --delete-emptydir-data --force --ignore-daemonsets --timeout=150s
+kubectl delete node $1
@@ -0,0 +1,24 @@
+#!/usr/bin/env bash
+set -x
+# Usage: drain-nodes.sh <timeout> <hostname>...
+TIMEOUT=$1
+shift
+NODES="$@"
+# Cordon all nodes at once, so that no pods get rescheduled on any of them.
+kubectl cordon $NODES
+# Drain all nodes concurrently.
+declare -A PIDS
+for NODE in $NODES; do
+    kubectl drain $NODE --delete-emptydir-data --force --ignore-daemonsets \
+        --timeout=${TIMEOUT}s &
+    PIDS[$NODE]=$!
+done
+# Remove each node from the cluster as soon as it has been drained. The status
+# of each node is reported back through stdout, instead of the exit code.
+for NODE in $NODES; do
+    if wait ${PIDS[$NODE]} && kubectl delete node $NODE; then
+        echo "drain-status $NODE ok"
+    else
+        echo "drain-status $NODE failed"
+    fi
+done
@@ -0,0 +1,68 @@
+#!/usr/bin/env bash
+set -e
+# Usage: network-throughput.sh [<seconds>]
+# Measure the pod-to-pod TCP throughput between two nodes with iperf3, for
+# the given number of seconds, in the form of:
+# network-throughput <bits per second> <server node> <client node>
+# Worker nodes are preferred. The rest of the nodes are only used, if there
+# are less than two workers.
+DURATION=${1-10}
+IMAGE=docker.io/networkstatic/iperf3
+NODES=$(kubectl get nodes -o jsonpath='{.items[*].metadata.name}' \
+    -l '!node-role.kubernetes.io/control-plane,!node-role.kubernetes.io/master')
+if [ $(echo $NODES | wc -w) -lt 2 ]; then
+    NODES=$(kubectl get nodes -o jsonpath='{.items[*].metadata.name}')
+fi
+if [ $(echo $NODES | wc -w) -lt 2 ]; then
+    echo "At least two nodes are required in order to measure the throughput"
+    exit 1
+fi
+SERVER=$(echo $NODES | cut -d ' ' -f 1)
+CLIENT=$(echo $NODES | cut -d ' ' -f 2)
+trap "kubectl delete pod throughput-server throughput-client \
+    --ignore-not-found --wait=false" EXIT
+
+# Run the pod of the given name and arguments on the given node
+run_pod() {
+kubectl apply -f - <<EOF
+apiVersion: v1
+kind: Pod
+metadata:
+  name: $1
+  labels:
+    app: network-throughput
+spec:
+  nodeName: $2
+  restartPolicy: Never
+  tolerations:
+  - operator: Exists
+  containers:
+  - name: iperf3
+    image: $IMAGE
+    args: [$3]
+EOF
+}
+
+kubectl delete pod throughput-server throughput-client --ignore-not-found
+run_pod throughput-server $SERVER '"-s"'
+kubectl wait --for=condition=Ready pod/throughput-server --timeout=300s
+IP=$(kubectl get pod throughput-server -o jsonpath='{.status.podIP}')
+run_pod throughput-client $CLIENT "\"-c\", \"$IP\", \"-t\", \"$DURATION\", \"-J\""
+for i in $(seq 60); do
+    PHASE=$(kubectl get pod throughput-client -o jsonpath='{.status.phase}')
+    if [ "$PHASE" = "Succeeded" ] || [ "$PHASE" = "Failed" ]; then
+        break
+    fi
+    sleep 5
+done
+if [ "$PHASE" != "Succeeded" ]; then
+    kubectl logs throughput-client || true
+    echo "Failed to measure the throughput: client pod is $PHASE"
+    exit 1
+fi
+BPS=$(kubectl logs throughput-client | python3 -c '
+import sys
+import json
+print(int(json.load(sys.stdin)["end"]["sum_received"]["bits_per_second"]))
+')
+echo "network-throughput $BPS $SERVER $CLIENT"
@@ -0,0 +1,75 @@
+#!/usr/bin/env bash
+set -e
+# Usage: node-load.sh <hostname>...
+# Report the load of each node with a single query of all pods and pod
+# disruption budgets. For each node, a line is printed in the form of:
+# node-load <hostname> <pods> <pdb-blocked pods> <pods with local storage>
+#           <cpu requests in millicores> <memory requests in bytes>
+# DaemonSet and mirror pods are not counted, since drain leaves them alone.
+PODS=$(mktemp)
+PDBS=$(mktemp)
+trap "rm -f $PODS $PDBS" EXIT
+kubectl get pods --all-namespaces -o json \
+    --field-selector=status.phase!=Succeeded,status.phase!=Failed > $PODS
+kubectl get pdb --all-namespaces -o json > $PDBS
+python3 - $PODS $PDBS "$@" <<'EOF'
+import sys
+import json
+
+UNITS = {'m': 0.001, 'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12,
+         'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40}
+
+
+def quantity(value):
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * UNITS[unit]
+    return float(value)
+
+
+def matches(selector, labels):
+    for key, value in (selector.get('matchLabels') or {}).items():
+        if labels.get(key) != value:
+            return False
+    for expr in selector.get('matchExpressions') or []:
+        key, op, values = expr['key'], expr['operator'], expr.get('values')
+        if op == 'In' and labels.get(key) not in values:
+            return False
+        if op == 'NotIn' and labels.get(key) in values:
+            return False
+        if op == 'Exists' and key not in labels:
+            return False
+        if op == 'DoesNotExist' and key in labels:
+            return False
+    return True
+
+
+pods = json.load(open(sys.argv[1]))['items']
+pdbs = [pdb for pdb in json.load(open(sys.argv[2]))['items']
+        if (pdb.get('status') or {}).get('disruptionsAllowed', 0) < 1]
+load = dict((node, [0, 0, 0, 0, 0]) for node in sys.argv[3:])
+for pod in pods:
+    meta, spec = pod['metadata'], pod['spec']
+    node = spec.get('nodeName')
+    if node not in load:
+        continue
+    owners = [ref['kind'] for ref in meta.get('ownerReferences') or []]
+    if 'DaemonSet' in owners or \
+            'kubernetes.io/config.mirror' in (meta.get('annotations') or {}):
+        continue
+    load[node][0] += 1
+    labels = meta.get('labels') or {}
+    if any(pdb['metadata']['namespace'] == meta['namespace'] and
+           matches(pdb['spec'].get('selector') or {}, labels)
+           for pdb in pdbs):
+        load[node][1] += 1
+    if any('emptyDir' in volume or 'hostPath' in volume
+           for volume in spec.get('volumes') or []):
+        load[node][2] += 1
+    for container in spec.get('containers') or []:
+        requests = (container.get('resources') or {}).get('requests') or {}
+        load[node][3] += int(quantity(requests.get('cpu', '0')) * 1000)
+        load[node][4] += int(quantity(requests.get('memory', '0')))
+for node in sys.argv[3:]:
+    print('node-load %s %s' % (node, ' '.join(str(n) for n in load[node])))
+EOF
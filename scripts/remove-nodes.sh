@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+set -x
+# Usage: remove-nodes.sh <hostname>...
+# Remove unreachable nodes from the cluster at once, without draining them.
+# Their pods are deleted forcibly, since the kubelet of an unreachable node
+# never confirms their termination, so that they get rescheduled right away.
+NODES="$@"
+kubectl cordon $NODES
+for NODE in $NODES; do
+    kubectl delete pods --all-namespaces --field-selector=spec.nodeName=$NODE \
+        --force --grace-period=0 --wait=false
+done
+# The status of each node is reported back through stdout, the same way as by
+# drain-nodes.sh.
+for NODE in $NODES; do
+    if kubectl delete node $NODE --wait=false; then
+        echo "drain-status $NODE ok"
+    else
+        echo "drain-status $NODE failed"
+    fi
+done
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.autoscale import autoscale
+
+
+if __name__ == '__main__':
+    autoscale(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.create_machines import create_machines_in_bulk
+
+
+if __name__ == '__main__':
+    create_machines_in_bulk(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.drain import drain
+
+
+if __name__ == '__main__':
+    drain(**params)
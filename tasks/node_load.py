@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.node_load import rank_by_load
+
+
+if __name__ == '__main__':
+    rank_by_load(**params)
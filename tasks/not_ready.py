@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.not_ready import find_not_ready
+
+
+if __name__ == '__main__':
+    find_not_ready(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.preflight import preflight
+
+
+if __name__ == '__main__':
+    preflight(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.throughput import measure_throughput
+
+
+if __name__ == '__main__':
+    measure_throughput(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.timings import collect_timings
+
+
+if __name__ == '__main__':
+    collect_timings(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.configure import wait_for_installation
+
+
+if __name__ == '__main__':
+    wait_for_installation(**params)
@@ -0,0 +1,7 @@
+from cloudify.state import ctx_parameters as params
+
+from k8s.operations.warm_pool import warm_pool
+
+
+if __name__ == '__main__':
+    warm_pool(**params)
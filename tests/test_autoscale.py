@@ -0,0 +1,147 @@
+import unittest
+
+from k8s.autoscale import decide
+from k8s.autoscale import parse_metrics
+
+
+GIB = 2 ** 30
+
+
+def make_metrics(workers, cpu_usage, pending=(0, 0, 0), unschedulable=0):
+    """Return the output of cluster-metrics.sh for a cluster of `workers`.
+
+    Each worker has 2 cpus and 4 GiB of memory, of which a `cpu_usage`
+    fraction of the cpu is requested. The master is not a worker.
+
+    """
+    lines = ['pending-pods %d %d %d' % pending,
+             'unschedulable-pods %d' % unschedulable,
+             'node-metrics master 0 1 1500 2000 %d %d' % (GIB, 4 * GIB)]
+    for i in range(workers):
+        lines.append('node-metrics worker-%d 1 1 %d 2000 %d %d' % (
+            i, int(cpu_usage * 2000), GIB, 4 * GIB))
+    return parse_metrics('\n'.join(lines))
+
+
+class ParseMetricsTest(unittest.TestCase):
+
+    def test_parse(self):
+        metrics = make_metrics(2, 0.5, pending=(1, 500, GIB),
+                               unschedulable=3)
+        self.assertEqual(metrics['pending_pods'], 1)
+        self.assertEqual(metrics['pending_cpu_millis'], 500)
+        self.assertEqual(metrics['pending_memory_bytes'], GIB)
+        self.assertEqual(metrics['unschedulable_pods'], 3)
+        self.assertEqual(sorted(metrics['nodes']),
+                         ['master', 'worker-0', 'worker-1'])
+        self.assertEqual(metrics['nodes']['worker-0']['cpu_millis'], 1000)
+
+    def test_incomplete(self):
+        self.assertIsNone(parse_metrics('node-metrics a 1 1 1 1 1 1'))
+        self.assertIsNone(parse_metrics(''))
+
+
+class DecideTest(unittest.TestCase):
+
+    policy = {
+        'min_workers': 1,
+        'max_workers': 10,
+        'scale_up_threshold': 0.8,
+        'scale_down_threshold': 0.4,
+        'scale_down_rounds': 3,
+        'cooldown': 600,
+        'max_step': 4,
+    }
+
+    def decide(self, metrics, workers, state=None, now=1000):
+        return decide(metrics, workers, self.policy, state, now)
+
+    def test_within_thresholds(self):
+        decision, _ = self.decide(make_metrics(3, 0.6), 3)
+        self.assertEqual(decision['delta'], 0)
+        self.assertEqual(decision['reason'], 'within thresholds')
+
+    def test_scale_up_above_threshold(self):
+        # 3 workers at 90% are sized for the target of 60%.
+        decision, state = self.decide(make_metrics(3, 0.9), 3)
+        self.assertEqual(decision['delta'], 2)
+        self.assertEqual(state['last_scaled'], 1000)
+
+    def test_scale_up_for_pending_pods(self):
+        # 3 cpus, i.e. 3000 millicores, at 60% of 2 cpus per worker.
+        decision, _ = self.decide(
+            make_metrics(2, 0.5, pending=(3, 3000, GIB)), 2)
+        self.assertEqual(decision['reason'], 'pending pods')
+        self.assertEqual(decision['delta'], 3)
+
+    def test_unschedulable_pods_do_not_scale_up(self):
+        decision, state = self.decide(
+            make_metrics(2, 0.5, unschedulable=5), 2)
+        self.assertEqual(decision['delta'], 0)
+        self.assertEqual(decision['unschedulable_pods'], 5)
+        self.assertIsNone(state['last_scaled'])
+
+    def test_scale_down_hysteresis(self):
+        metrics = make_metrics(4, 0.1)
+        state = None
+        for rounds in (1, 2):
+            decision, state = self.decide(metrics, 4, state)
+            self.assertEqual(decision['delta'], 0)
+            self.assertEqual(state['low_rounds'], rounds)
+        # The memory requests of 25% outweigh the cpu ones, so that 4
+        # workers at 25% are sized to 2 workers at the target of 60%.
+        decision, state = self.decide(metrics, 4, state)
+        self.assertEqual(decision['delta'], -2)
+        self.assertEqual(state['low_rounds'], 0)
+
+    def test_scale_down_hysteresis_resets(self):
+        decision, state = self.decide(make_metrics(4, 0.1), 4)
+        decision, state = self.decide(make_metrics(4, 0.1), 4, state)
+        decision, state = self.decide(make_metrics(4, 0.6), 4, state)
+        self.assertEqual(state['low_rounds'], 0)
+        decision, state = self.decide(make_metrics(4, 0.1), 4, state)
+        self.assertEqual(decision['delta'], 0)
+        self.assertEqual(state['low_rounds'], 1)
+
+    def test_cooldown(self):
+        state = {'last_scaled': 900, 'low_rounds': 0}
+        decision, new_state = self.decide(make_metrics(3, 0.9), 3, state)
+        self.assertEqual(decision['delta'], 0)
+        self.assertTrue(decision['reason'].endswith('cooling down'))
+        self.assertEqual(new_state['last_scaled'], 900)
+        decision, new_state = self.decide(make_metrics(3, 0.9), 3, state,
+                                          now=1500)
+        self.assertEqual(decision['delta'], 2)
+        self.assertEqual(new_state['last_scaled'], 1500)
+
+    def test_max_step(self):
+        decision, _ = self.decide(
+            make_metrics(2, 0.5, pending=(20, 20000, GIB)), 2)
+        self.assertEqual(decision['delta'], 4)
+
+    def test_max_workers(self):
+        decision, _ = self.decide(
+            make_metrics(9, 0.5, pending=(5, 5000, GIB)), 9)
+        self.assertEqual(decision['delta'], 1)
+
+    def test_min_workers(self):
+        state = {'last_scaled': None, 'low_rounds': 2}
+        decision, _ = self.decide(make_metrics(1, 0.0), 1, state)
+        self.assertEqual(decision['delta'], 0)
+
+    def test_out_of_bounds_ignores_cooldown(self):
+        state = {'last_scaled': 900, 'low_rounds': 0}
+        decision, _ = self.decide(make_metrics(12, 0.6), 12, state)
+        self.assertEqual(decision['reason'], 'out of bounds')
+        self.assertEqual(decision['delta'], -2)
+        decision, _ = self.decide(None, 0, state)
+        self.assertEqual(decision['delta'], 1)
+
+    def test_no_metrics(self):
+        decision, _ = self.decide(None, 3)
+        self.assertEqual(decision['delta'], 0)
+        self.assertEqual(decision['reason'], 'no metrics')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import threading
+import unittest
+
+import requests
+
+from cloudify.exceptions import NonRecoverableError
+
+from k8s.events import JobError
+from k8s.events import EventWaiter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+from fake_mist import FakeMist
+from fake_mist import serve
+
+
+class EventWaiterTest(unittest.TestCase):
+    """Run the EventWaiter against the fake mist.io API."""
+
+    def setUp(self):
+        self.fake = FakeMist()
+        self.server = serve(self.fake)
+        self.waiter = EventWaiter('http://%s:%d' % self.server.server_address,
+                                  'token', min_interval=0.05,
+                                  max_interval=0.2, session=requests.Session())
+        self.fetched = []
+        fetch_logs = self.waiter.fetch_logs
+
+        def record(job_id):
+            self.fetched.append(job_id)
+            return fetch_logs(job_id)
+        self.waiter.fetch_logs = record
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_events(self, delay, *events):
+        """Add log entries, which all show up `delay` seconds from now."""
+        visible = time.time() + delay
+        with self.fake.lock:
+            for event in events:
+                event.setdefault('error', False)
+                event['time'] = visible
+                self.fake.jobs[event['job_id']].append(event)
+
+    def wait_in_threads(self, *waits):
+        """Wait for each (job_id, job_kwargs) at the same time."""
+        results = [None] * len(waits)
+
+        def wait(i, job_id, job_kwargs):
+            try:
+                results[i] = self.waiter.wait(job_id, job_kwargs, timeout=10)
+            except Exception as exc:
+                results[i] = exc
+        threads = [threading.Thread(target=wait, args=(i, ) + args)
+                   for i, args in enumerate(waits)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_routes_events_to_waiters(self):
+        self.add_events(
+            0.3,
+            {'job_id': 'a', 'action': 'script_finished', 'external_id': '1'},
+            {'job_id': 'a', 'action': 'script_finished', 'external_id': '2'},
+            {'job_id': 'b', 'action': 'script_finished', 'external_id': '3'},
+        )
+        results = self.wait_in_threads(
+            ('a', {'action': 'script_finished', 'external_id': '1'}),
+            ('a', {'action': 'script_finished', 'external_id': '2'}),
+            ('b', {'action': 'script_finished', 'external_id': '3'}),
+        )
+        self.assertEqual([result['external_id'] for result in results],
+                         ['1', '2', '3'])
+
+    def test_fetches_each_job_once_per_round(self):
+        self.add_events(
+            0.3,
+            {'job_id': 'a', 'action': 'script_finished', 'external_id': '1'},
+            {'job_id': 'a', 'action': 'script_finished', 'external_id': '2'},
+            {'job_id': 'b', 'action': 'script_finished', 'external_id': '3'},
+        )
+        self.wait_in_threads(
+            ('a', {'action': 'script_finished', 'external_id': '1'}),
+            ('a', {'action': 'script_finished', 'external_id': '2'}),
+            ('b', {'action': 'script_finished', 'external_id': '3'}),
+        )
+        # Job a, which two operations wait upon, is fetched as many times as
+        # job b, i.e. once per round, give or take the first round, which may
+        # start before the operation waiting upon job b does.
+        self.assertLessEqual(self.fetched.count('a'),
+                             self.fetched.count('b') + 1)
+        self.assertEqual(self.fake.counters['get_job'], len(self.fetched))
+
+    def test_backs_off_while_idle(self):
+        self.add_events(1.5, {'job_id': 'a', 'action': 'script_finished'})
+        self.wait_in_threads(('a', {'action': 'script_finished'}))
+        # Polling every 0.05 seconds would take 30 requests.
+        self.assertLess(len(self.fetched), 15)
+
+    def test_raises_job_error(self):
+        self.add_events(0, {'job_id': 'a', 'action': 'script_finished',
+                            'error': 'exit code 1', 'stdout': 'output'})
+        with self.assertRaises(JobError) as raised:
+            self.waiter.wait('a', {'action': 'script_finished'}, timeout=10)
+        self.assertEqual(raised.exception.event['stdout'], 'output')
+
+    def test_times_out(self):
+        with self.assertRaises(NonRecoverableError):
+            self.waiter.wait('a', {'action': 'script_finished'}, timeout=0.3)
+
+    def test_find(self):
+        self.assertIsNone(self.waiter.find('a', {'action': 'done'}))
+        self.add_events(0, {'job_id': 'a', 'action': 'done'})
+        self.assertEqual(self.waiter.find('a', {'action': 'done'})['action'],
+                         'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
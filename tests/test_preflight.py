@@ -0,0 +1,77 @@
+import unittest
+
+from k8s.preflight import is_private
+from k8s.preflight import collect_references
+from k8s.preflight import find_unreachable_master
+
+
+class CollectReferencesTest(unittest.TestCase):
+
+    def test_references(self):
+        clouds, keys, machines = collect_references([
+            {'cloud_id': 'a', 'size_id': 's1', 'networks': ['n1', 'n2'],
+             'key_id': 'k'},
+            {'cloud_id': 'a', 'size_id': 's2', 'networks': 'n1'},
+            {'cloud_id': 'b', 'machine_id': 'm'},
+        ])
+        self.assertEqual(clouds['a']['sizes'], set(['s1', 's2']))
+        self.assertEqual(clouds['a']['networks'], set(['n1', 'n2']))
+        self.assertEqual(clouds['b'], {})
+        self.assertEqual(keys, set(['k']))
+        self.assertEqual(machines, set([('b', 'm')]))
+
+
+class IsPrivateTest(unittest.TestCase):
+
+    def test_private(self):
+        for ip in ('10.1.2.3', '172.16.0.1', '192.168.1.1', '100.64.0.1'):
+            self.assertTrue(is_private(ip), ip)
+
+    def test_public(self):
+        for ip in ('8.8.8.8', '172.32.0.1', '100.128.0.1', 'fe80::1', ''):
+            self.assertFalse(is_private(ip), ip)
+
+
+class FindUnreachableMasterTest(unittest.TestCase):
+
+    master_spec = {'cloud_id': 'a', 'networks': ['n1']}
+
+    def test_public_master(self):
+        self.assertEqual(find_unreachable_master(
+            '8.8.8.8', self.master_spec, [{'cloud_id': 'b'}]), [])
+
+    def test_other_cloud(self):
+        errors = find_unreachable_master(
+            '10.0.0.1', self.master_spec,
+            [{'cloud_id': 'b'}, {'cloud_id': 'b'}])
+        self.assertEqual(len(errors), 1)
+        self.assertIn('cloud b', errors[0])
+
+    def test_shared_network(self):
+        self.assertEqual(find_unreachable_master(
+            '10.0.0.1', self.master_spec,
+            [{'cloud_id': 'a', 'networks': ['n2', 'n1']},
+             {'cloud_id': 'a'}]), [])
+
+    def test_other_network(self):
+        errors = find_unreachable_master(
+            '10.0.0.1', self.master_spec,
+            [{'cloud_id': 'a', 'networks': ['n2', 'n3']}])
+        self.assertEqual(len(errors), 1)
+        self.assertIn('networks n2, n3', errors[0])
+
+    def test_scalar_networks(self):
+        master_spec = {'cloud_id': 'a', 'networks': 'n1'}
+        self.assertEqual(find_unreachable_master(
+            '10.0.0.1', master_spec,
+            [{'cloud_id': 'a', 'networks': 'n1'}]), [])
+        errors = find_unreachable_master(
+            '10.0.0.1', master_spec,
+            [{'cloud_id': 'a', 'networks': 'n12'}])
+        self.assertEqual(len(errors), 1)
+        self.assertIn('networks n12 may not reach', errors[0])
+        self.assertIn('in networks n1', errors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+from k8s.timings import summarize
+from k8s.timings import percentile
+from k8s.timings import parse_timings
+from k8s.timings import to_prometheus
+
+
+class ParseTimingsTest(unittest.TestCase):
+
+    def test_pairs(self):
+        self.assertEqual(parse_timings('packages:40,init:95\n'),
+                         {'packages': 40, 'init': 95})
+
+    def test_output(self):
+        output = '\n'.join(['Installing packages', 'phase-timings '
+                            'packages:40,join:12', 'Done'])
+        self.assertEqual(parse_timings(output), {'packages': 40, 'join': 12})
+
+    def test_invalid_pairs(self):
+        self.assertEqual(parse_timings('packages:40,init,join:-1,swap:x'),
+                         {'packages': 40})
+
+    def test_empty(self):
+        self.assertEqual(parse_timings(''), {})
+        self.assertEqual(parse_timings(None), {})
+
+    def test_output_without_timings(self):
+        self.assertEqual(parse_timings('Installing packages\nDone'), {})
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = [15, 20, 35, 40, 50]
+        self.assertEqual(percentile(values, 30), 20)
+        self.assertEqual(percentile(values, 40), 20)
+        self.assertEqual(percentile(values, 50), 35)
+        self.assertEqual(percentile(values, 100), 50)
+
+    def test_unsorted(self):
+        self.assertEqual(percentile([50, 15, 40, 20, 35], 50), 35)
+
+    def test_lowest(self):
+        self.assertEqual(percentile([3, 1, 2], 0), 1)
+
+    def test_single(self):
+        self.assertEqual(percentile([7], 95), 7)
+
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_summary(self):
+        summary = summarize({
+            'worker-0': {'packages': 40, 'join': 10},
+            'worker-1': {'packages': 60, 'join': 5},
+            'worker-2': {'packages': 50, 'join': 70},
+        })
+        self.assertEqual(summary['nodes'], 3)
+        self.assertEqual(summary['phases']['packages'], {
+            'count': 3, 'p50': 50, 'p95': 60, 'max': 60,
+        })
+        self.assertEqual(summary['phases']['join'], {
+            'count': 3, 'p50': 10, 'p95': 70, 'max': 70,
+        })
+        self.assertEqual(summary['slowest_phase'], 'join')
+        self.assertEqual(summary['slowest_node'], 'worker-2')
+
+    def test_partial_timings(self):
+        summary = summarize({
+            'worker-0': {'packages': 40, 'join': 10},
+            'worker-1': {'packages': 60},
+        })
+        self.assertEqual(summary['phases']['join']['count'], 1)
+        self.assertEqual(summary['phases']['packages']['count'], 2)
+
+    def test_empty(self):
+        self.assertEqual(summarize({}), {
+            'nodes': 0, 'phases': {}, 'slowest_phase': None,
+            'slowest_node': None,
+        })
+
+
+class ToPrometheusTest(unittest.TestCase):
+
+    def test_render(self):
+        text = to_prometheus({
+            'worker-1': {'packages': 60},
+            'worker-0': {'packages': 40, 'join': 10},
+        })
+        lines = text.splitlines()
+        self.assertTrue(text.endswith('\n'))
+        self.assertEqual(lines[1],
+                         '# TYPE kubernetes_bootstrap_phase_seconds gauge')
+        self.assertEqual(lines[2:], [
+            'kubernetes_bootstrap_phase_seconds{node="worker-0",'
+            'phase="join"} 10',
+            'kubernetes_bootstrap_phase_seconds{node="worker-0",'
+            'phase="packages"} 40',
+            'kubernetes_bootstrap_phase_seconds{node="worker-1",'
+            'phase="packages"} 60',
+        ])
+
+    def test_empty(self):
+        self.assertEqual(len(to_prometheus({}).splitlines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
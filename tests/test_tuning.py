@@ -0,0 +1,114 @@
+import gzip
+import base64
+import StringIO
+import unittest
+
+from cloudify.exceptions import NonRecoverableError
+
+from k8s.tuning import PROFILES
+from k8s.tuning import PROFILE_SIZES
+from k8s.tuning import render_profile
+from k8s.tuning import resolve_profile
+from k8s.tuning import get_tuning_args
+
+
+class Instance(object):
+
+    def __init__(self, **runtime_properties):
+        self.runtime_properties = runtime_properties
+
+
+class ResolveProfileTest(unittest.TestCase):
+
+    def test_thresholds(self):
+        for cpus, ram, profile in (
+            (16, 32768, 'large'),
+            (64, 262144, 'large'),
+            (15, 32768, 'medium'),
+            (16, 32767, 'medium'),
+            (4, 8192, 'medium'),
+            (3, 8192, 'small'),
+            (4, 8191, 'small'),
+            (1, 512, 'small'),
+        ):
+            self.assertEqual(resolve_profile('auto', {'cpus': cpus,
+                                                      'ram': ram}),
+                             profile, (cpus, ram))
+
+    def test_unknown_cpus(self):
+        # Sizes, whose number of cpus is unknown, are matched by ram alone.
+        self.assertEqual(resolve_profile('auto', {'ram': 32768}), 'large')
+        self.assertEqual(resolve_profile('auto', {'ram': 8192}), 'medium')
+        self.assertEqual(resolve_profile('auto', {'ram': 2048}), 'small')
+
+    def test_unknown_size(self):
+        self.assertEqual(resolve_profile('auto'), 'small')
+        self.assertEqual(resolve_profile('auto', {}), 'small')
+        self.assertEqual(resolve_profile('auto', {'cpus': 32}), 'small')
+
+    def test_none(self):
+        self.assertIsNone(resolve_profile('none', {'cpus': 32,
+                                                   'ram': 65536}))
+
+    def test_explicit(self):
+        for profile in PROFILES:
+            self.assertEqual(resolve_profile(profile, {'cpus': 1,
+                                                       'ram': 512}),
+                             profile)
+
+    def test_unsupported(self):
+        with self.assertRaises(NonRecoverableError):
+            resolve_profile('huge')
+
+    def test_profile_sizes(self):
+        self.assertEqual(sorted(profile for profile, _, _ in PROFILE_SIZES),
+                         sorted(PROFILES))
+
+
+class RenderProfileTest(unittest.TestCase):
+
+    def sections(self, text):
+        sections, section = {}, None
+        for line in text.splitlines():
+            if line.startswith('['):
+                section = sections.setdefault(line.strip('[]'), [])
+            else:
+                section.append(line)
+        return sections
+
+    def test_sections(self):
+        for profile in PROFILES:
+            sections = self.sections(render_profile(profile))
+            self.assertEqual(sorted(sections),
+                             ['containerd', 'kubelet', 'sysctl'])
+            self.assertEqual(len(sections['sysctl']),
+                             len(PROFILES[profile]['sysctl']))
+
+    def test_values(self):
+        sections = self.sections(render_profile('large'))
+        self.assertIn('maxPods: 250', sections['kubelet'])
+        self.assertIn('serializeImagePulls: false', sections['kubelet'])
+        self.assertIn('kubeReserved:', sections['kubelet'])
+        self.assertIn('  memory: "1Gi"', sections['kubelet'])
+        self.assertIn('max_concurrent_downloads = 10',
+                      sections['containerd'])
+        self.assertIn('net.netfilter.nf_conntrack_max = 1048576',
+                      sections['sysctl'])
+
+
+class GetTuningArgsTest(unittest.TestCase):
+
+    def test_no_profile(self):
+        self.assertEqual(get_tuning_args(Instance()), '')
+        self.assertEqual(get_tuning_args(Instance(tuning_profile=None)), '')
+
+    def test_round_trip(self):
+        args = get_tuning_args(Instance(tuning_profile='medium'))
+        self.assertTrue(args.startswith("-T '") and args.endswith("' "))
+        data = base64.b64decode(args[4:-2])
+        with gzip.GzipFile(fileobj=StringIO.StringIO(data)) as fobj:
+            self.assertEqual(fobj.read(), render_profile('medium'))
+
+
+if __name__ == '__main__':
+    unittest.main()
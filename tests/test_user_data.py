@@ -0,0 +1,70 @@
+import os
+import unittest
+
+import jinja2
+
+from k8s.operations.create import compress
+from k8s.operations.create import USER_DATA_LIMITS
+from k8s.tuning import PROFILES
+from k8s.tuning import get_tuning_args
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Instance(object):
+
+    def __init__(self, **runtime_properties):
+        self.runtime_properties = runtime_properties
+
+
+def read(*path):
+    with open(os.path.join(ROOT, *path)) as fobj:
+        return fobj.read()
+
+
+class UserDataTest(unittest.TestCase):
+    """Check that the cloud-init user-data fits every provider's limit.
+
+    The user-data inlines deploy-node.sh, compressed, along with its
+    arguments. It is rendered for the largest arguments of any node, i.e.
+    the master's, with the largest tuning profile, and with generous
+    lengths of names, tokens and IDs.
+
+    """
+
+    def render_user_data(self):
+        tuning = max((get_tuning_args(Instance(tuning_profile=profile))
+                      for profile in PROFILES), key=len)
+        arguments = "-n '%s' " % ('m' * 64)
+        arguments += "-t '%s.%s' " % ('t' * 6, 't' * 16)
+        arguments += "-m '%s' -p '6443' -i '255.255.255.255' " % ('h' * 64)
+        arguments += "-N 'flannel' -P '100.127.255.0/24' -M '65535' "
+        arguments += tuning
+        arguments += "-r 'control-plane' -R"
+        template = jinja2.Template(read('cloud-init', 'cloud-init.yml'))
+        return template.render(
+            deploy_node=compress(read('scripts', 'deploy-node.sh')),
+            ctx={
+                'node': {'properties': {'mist_config': {
+                    'mist_uri': 'https://%s.example.com' % ('u' * 64),
+                    'mist_token': 'k' * 64,
+                }}},
+                'instance': {'runtime_properties': {
+                    'cloud_init_arguments': arguments,
+                    'job_id': 'j' * 32,
+                    'machine_name': 'm' * 64,
+                }},
+            },
+        )
+
+    def test_fits_user_data_limits(self):
+        size = len(self.render_user_data())
+        for provider, limit in sorted(USER_DATA_LIMITS.items()):
+            self.assertLessEqual(
+                size, limit, 'cloud-init is %d bytes, exceeding the %d bytes '
+                'of user-data allowed by %s' % (size, limit, provider))
+
+
+if __name__ == '__main__':
+    unittest.main()
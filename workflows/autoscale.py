@@ -0,0 +1,73 @@
+import time
+import itertools
+
+from cloudify.workflows import ctx as workctx
+from cloudify.workflows import parameters as inputs
+from cloudify.workflows.workflow_api import has_cancel_request
+
+from k8s.autoscale import DEFAULT_POLICY
+from k8s.scaling import get_raw_instances
+from k8s.scaling import graph_scale_up_workflow
+from k8s.scaling import graph_scale_down_workflow
+
+
+def graph_autoscale_decision_workflow(policy):
+    """Decide by how many workers the kubernetes cluster should be scaled.
+
+    The decision is taken by the master's `kubernetes.autoscale` operation,
+    which gets the cluster's metrics with a single query, and is read back
+    from the master's runtime properties.
+
+    """
+    workers = [
+        instance for instance in workctx.get_node('kube_worker').instances
+    ]
+    raw_instances = get_raw_instances(workers)
+    master = [instance for instance in
+              workctx.get_node('kube_master').instances][0]
+    graph = workctx.graph_mode()
+    graph.add_task(
+        master.execute_operation(
+            operation='kubernetes.autoscale',
+            kwargs={
+                'policy': policy,
+                'workers': len([instance for instance in workers if
+                                raw_instances[instance.id].state not in
+                                ('deleted', 'uninitialized')]),
+            },
+        )
+    )
+    graph.execute()
+    storage = workctx.internal.handler.storage
+    return storage.get_node_instance(
+        master.id).runtime_properties['autoscale_decision']
+
+
+if __name__ == '__main__':
+    policy = dict((key, inputs[key]) for key in DEFAULT_POLICY
+                  if inputs.get(key) is not None)
+    rounds = int(inputs.get('rounds') or 0)
+    interval = int(inputs.get('interval') or 60)
+    max_parallel = int(inputs.get('max_parallel') or 0)
+
+    # New workers are created based on the workers' spec, as defined in the
+    # inputs section.
+    spec = dict(workctx.get_node('kube_worker').properties['parameters'])
+    spec.pop('machine_id', None)
+
+    for i in itertools.count(1):
+        decision = graph_autoscale_decision_workflow(policy)
+        workctx.logger.info(
+            'Autoscale round %d: %d worker(s), utilization %s, %d pending '
+            'pod(s), delta %d (%s)', i, decision['workers'],
+            decision['utilization'], decision['pending_pods'],
+            decision['delta'], decision['reason']
+        )
+        if decision['delta'] > 0:
+            graph_scale_up_workflow(decision['delta'],
+                                    [spec] * decision['delta'], max_parallel)
+        elif decision['delta'] < 0:
+            graph_scale_down_workflow(-decision['delta'])
+        if i == rounds or has_cancel_request():
+            break
+        time.sleep(interval)
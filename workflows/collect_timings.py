@@ -0,0 +1,9 @@
+from cloudify.workflows import ctx as workctx
+from cloudify.workflows import parameters as inputs
+
+from k8s.scaling import graph_collect_timings_workflow
+
+
+if __name__ == '__main__':
+    workctx.logger.info('Collecting bootstrap timings of kubernetes nodes')
+    graph_collect_timings_workflow(inputs.get('prometheus_path') or '')
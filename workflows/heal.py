@@ -0,0 +1,16 @@
+from cloudify.workflows import ctx as workctx
+from cloudify.workflows import parameters as inputs
+
+from k8s.scaling import graph_heal_workflow
+from k8s.scaling import graph_collect_timings_workflow
+
+
+if __name__ == '__main__':
+    max_parallel = int(inputs.get('max_parallel') or 0)
+    workctx.logger.info('Healing kubernetes cluster')
+    replaced = graph_heal_workflow(max_parallel)
+    if replaced:
+        workctx.logger.info('Replaced %d node(s)', len(replaced))
+        graph_collect_timings_workflow()
+    else:
+        workctx.logger.info('No nodes to replace')
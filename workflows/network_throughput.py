@@ -0,0 +1,16 @@
+from cloudify.workflows import ctx as workctx
+from cloudify.workflows import parameters as inputs
+
+
+if __name__ == '__main__':
+    workctx.logger.info('Measuring the network throughput of the cluster')
+    check = [instance for instance in
+             workctx.get_node('kube_network_check').instances][0]
+    graph = workctx.graph_mode()
+    graph.add_task(
+        check.execute_operation(
+            operation='kubernetes.network_throughput',
+            kwargs={'duration': inputs.get('duration') or 10},
+        )
+    )
+    graph.execute()
@@ -0,0 +1,13 @@
+from cloudify.workflows import ctx as workctx
+
+from k8s.scaling import get_master
+from k8s.scaling import get_warm_pool_task
+
+
+if __name__ == '__main__':
+    workctx.logger.info('Refilling the warm pool of kubernetes workers')
+    task = get_warm_pool_task(get_master())
+    if task:
+        graph = workctx.graph_mode()
+        graph.add_task(task)
+        graph.execute()